@@ -6,6 +6,20 @@ import uvicorn
 import numpy as np
 from PIL import Image
 import io
+import logging
+import os
+import time
+
+# all | breed | disease — only the frameworks the role needs are imported
+SERVING_ROLE = os.getenv("CATTLE_SERVING_ROLE", "all")
+# cores for each runtime (0 = framework default, i.e. every core for both); with
+# both models in one process, split the cores between them to avoid oversubscription
+BREED_THREADS = int(os.getenv("CATTLE_CPU_BREED_THREADS") or 0)
+DISEASE_THREADS = int(os.getenv("CATTLE_CPU_DISEASE_THREADS") or 0)
+INTEROP_THREADS = int(os.getenv("CATTLE_CPU_INTEROP_THREADS") or 0)
+STARTUP_TIMINGS = {}
+
+logger = logging.getLogger("uvicorn.error")
 
 # ============================================================
 #  FASTAPI INITIALIZATION
@@ -25,32 +39,55 @@ app.add_middleware(
 #  BREED MODEL (PyTorch)
 # ============================================================
 
-from cattle_model import load_model as load_breed_model
-from cattle_model import predict_bytes as predict_breed_bytes
-from cattle_model import CLASS_NAMES as BREED_CLASS_NAMES
-
 BREED_CHECKPOINT = "best_enhanced_model.pth"
-
-try:
-    breed_model, breed_device, breed_transform = load_breed_model(BREED_CHECKPOINT)
-except Exception as e:
-    raise RuntimeError(f"Failed to load breed model: {e}")
+breed_model = breed_device = breed_transform = None
+
+if SERVING_ROLE in ("all", "breed"):
+    _t = time.perf_counter()
+    from cattle_model import load_model as load_breed_model
+    from cattle_model import predict_bytes as predict_breed_bytes
+    STARTUP_TIMINGS["breed_import_s"] = time.perf_counter() - _t
+    if BREED_THREADS:
+        import torch
+        torch.set_num_threads(BREED_THREADS)
+        if INTEROP_THREADS:
+            torch.set_num_interop_threads(INTEROP_THREADS)
+
+    _t = time.perf_counter()
+    try:
+        breed_model, breed_device, breed_transform = load_breed_model(BREED_CHECKPOINT)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load breed model: {e}")
+    STARTUP_TIMINGS["breed_load_s"] = time.perf_counter() - _t
 
 
 # ============================================================
 #  DISEASE MODEL (TensorFlow)
 # ============================================================
 
-from tensorflow.keras.models import load_model as load_tf_model
-
 DISEASE_MODEL_PATH = "custom_model.h5"
 DISEASE_CLASS_NAMES = ["IBK", "FMD", "LSD"]
+disease_model = None
+
+if SERVING_ROLE in ("all", "disease"):
+    _t = time.perf_counter()
+    from tensorflow.keras.models import load_model as load_tf_model
+    STARTUP_TIMINGS["disease_import_s"] = time.perf_counter() - _t
+    if DISEASE_THREADS:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(DISEASE_THREADS)
+        if INTEROP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(INTEROP_THREADS)
+
+    _t = time.perf_counter()
+    try:
+        disease_model = load_tf_model(DISEASE_MODEL_PATH)
+        _, H, W, C = disease_model.input_shape
+    except Exception as e:
+        raise RuntimeError(f"Failed to load disease model: {e}")
+    STARTUP_TIMINGS["disease_load_s"] = time.perf_counter() - _t
 
-try:
-    disease_model = load_tf_model(DISEASE_MODEL_PATH)
-    _, H, W, C = disease_model.input_shape
-except Exception as e:
-    raise RuntimeError(f"Failed to load disease model: {e}")
+logger.info("Startup (%s): %s", SERVING_ROLE, ", ".join(f"{k} {v:.2f}s" for k, v in STARTUP_TIMINGS.items()))
 
 
 # ============================================================
@@ -218,6 +255,8 @@ def preprocess_disease(img_bytes):
 
 @app.post("/predict_breed", response_model=PredictionResponse)
 async def predict_breed(file: UploadFile = File(...)):
+    if breed_model is None:
+        raise HTTPException(404, f"Breed model not served by role '{SERVING_ROLE}'.")
     if not file.content_type.startswith("image/"):
         raise HTTPException(400, "File must be an image.")
 
@@ -246,6 +285,8 @@ async def predict_breed(file: UploadFile = File(...)):
 
 @app.post("/predict_disease", response_model=PredictionResponse)
 async def predict_disease(file: UploadFile = File(...)):
+    if disease_model is None:
+        raise HTTPException(404, f"Disease model not served by role '{SERVING_ROLE}'.")
     if not file.content_type.startswith("image/"):
         raise HTTPException(400, "File must be an image.")
 
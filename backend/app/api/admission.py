@@ -0,0 +1,67 @@
+# backend/app/api/admission.py
+# Admission middleware: admits or sheds each prediction request before its upload
+# is read, and tags the request with its lane (see app/core/admission.py).
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from ..core import admission, config
+from ..core.model_loader import models
+
+PRIORITY_HEADER = "X-Cattle-Priority"
+# routes that always run in the bulk lane
+BULK_SUFFIXES = ("/batch", "/herd", "/mating", "/index", "/video", "/stream")
+
+
+def lane_for(scope):
+    # clients may move a request down to bulk, never up to interactive
+    path = scope["path"].rstrip("/")
+    if path.endswith(BULK_SUFFIXES):
+        return admission.BULK
+    if Headers(scope=scope).get(PRIORITY_HEADER, "").strip().lower() == "bulk":
+        return admission.BULK
+    return admission.INTERACTIVE
+
+
+class AdmissionMiddleware:
+    """
+    routes maps a path prefix ("/predict_breed") to the model serving it, or to a
+    tuple of models for routes that need several ("/analyze").
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def _models(self, path):
+        for prefix, model in self.routes.items():
+            if path == prefix or path.startswith(prefix + "/"):
+                return (model,) if isinstance(model, str) else model
+        return ()
+
+    async def __call__(self, scope, receive, send):
+        names = self._models(scope["path"]) if scope["type"] == "http" else ()
+        if not names or scope["method"] != "POST" or not config.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        controllers = []
+        priority = lane_for(scope)
+        try:
+            for name in names:
+                models.admission[name].admit(priority)
+                controllers.append(models.admission[name])
+        except admission.Overloaded as e:
+            # shed as a whole: give back the slots already taken on the other models
+            for controller in controllers:
+                controller.release(priority)
+            response = JSONResponse(
+                {"detail": e.detail}, status_code=e.status, headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        token = admission.set_lane(priority)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.reset_lane(token)
+            for controller in controllers:
+                controller.release(priority)
@@ -0,0 +1,41 @@
+# backend/app/api/analyze.py
+from fastapi import APIRouter, UploadFile, File, HTTPException
+
+from ..core import metrics
+from ..core.model_loader import models
+from ..schemas import AnalyzeResponse
+from ..static_data import BREED_STATIC_DATA, DISEASE_STATIC_DATA
+from .metrics import TimedRoute
+
+
+router = APIRouter(route_class=TimedRoute)
+
+
+def _prediction(pred, static):
+    label, conf, _, version = pred
+    return {
+        "predicted_class": label,
+        "confidence": float(conf),
+        "static_data": static,
+        "model_version": version,
+    }
+
+@router.post("/", response_model=AnalyzeResponse)
+async def analyze(file: UploadFile = File(...)):
+    """Breed and disease for one upload, read and decoded once."""
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image.")
+    with metrics.stage("analyze", "read"):
+        content = await file.read()
+
+    try:
+        # both forward passes run concurrently, each in its own model's batcher
+        breed, disease = await models.analyze(content)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
+
+    return {
+        "filename": file.filename,
+        "breed": _prediction(breed, BREED_STATIC_DATA.get(breed[0].lower(), {})),
+        "disease": _prediction(disease, DISEASE_STATIC_DATA.get(disease[0], {})),
+    }
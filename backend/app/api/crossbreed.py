@@ -1,12 +1,42 @@
 # backend/app/api/crossbreed.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from starlette.concurrency import run_in_threadpool
 
+from .. import mating
+from ..core import config, metrics
 from ..core.model_loader import models
+from ..crossbreed_engine import get_engine
 from ..static_data import BREED_STATIC_DATA
-from .. import cattle_model
+from .metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+
+def _parent_info(upload, pred):
+    label, conf, _, version = pred
+    return {
+        "filename": upload.filename,
+        "predicted_class": label,
+        "confidence": float(conf),
+        "static_data": BREED_STATIC_DATA.get(label.lower(), {}),
+        "model_version": version,
+    }
+
+
+def _hybrid_info(engine, a_label, a_conf, a_probs, b_label, b_conf, b_probs):
+    # table row for the top-1 pair plus traits weighted over both full softmax vectors,
+    # so an uncertain parent prediction is reflected in the expected hybrid
+    return {
+        "cross_name": f"{a_label} x {b_label}",
+        "pair_info": engine.pair_info(a_label, b_label),
+        "expected_traits": engine.expected_traits(a_probs, b_probs),
+        "notes": f"Parent A: {a_label} ({a_conf:.2f}), Parent B: {b_label} ({b_conf:.2f}).",
+    }
 
-router = APIRouter()
 
 @router.post("/", response_model=dict)
 async def predict_crossbreed(
@@ -17,55 +47,147 @@ async def predict_crossbreed(
     if not parent_a.content_type.startswith("image/") or not parent_b.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Both files must be images.")
 
-    a_bytes = await parent_a.read()
-    b_bytes = await parent_b.read()
+    with metrics.stage("breed", "read"):
+        a_bytes, b_bytes = await asyncio.gather(parent_a.read(), parent_b.read())
 
     try:
-        # ensure breed model loaded
-        breed_model, breed_device, breed_transform = models.load_breed()
+        # both parents are decoded concurrently and classified in one batch of two
+        pred_a, pred_b = await models.predict_breed_many([a_bytes, b_bytes])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Crossbreed prediction failed: {e}")
+
+    return {
+        "parent_a": _parent_info(parent_a, pred_a),
+        "parent_b": _parent_info(parent_b, pred_b),
+        "crossbreed": _hybrid_info(get_engine(), *pred_a[:3], *pred_b[:3]),
+    }
+
+
+def _pairs(engine, sire_preds, dam_preds):
+    # expected yield for every pair in one (N, M) product
+    yields = engine.expected_numeric(
+        "estimated_milk_yield_l_per_year",
+        [p for _, _, p, _ in sire_preds],
+        [p for _, _, p, _ in dam_preds],
+    )
+    pairs = []
+    for i, (s_label, *_) in enumerate(sire_preds):
+        for j, (d_label, *_) in enumerate(dam_preds):
+            pairs.append({
+                "sire": i,
+                "dam": j,
+                "cross_name": f"{s_label} x {d_label}",
+                "pair_info": engine.pair_info(s_label, d_label),
+                "expected_milk_yield_l_per_year": None if np.isnan(yields[i, j]) else round(float(yields[i, j]), 1),
+            })
+    return pairs
 
-        # import predict function from cattle_model in runtime to avoid startup circular issues
-        from app import cattle_model
 
-        def _pred(bytes_):
-            return cattle_model.predict_bytes(breed_model, breed_device, breed_transform, bytes_)
+@router.post("/herd", response_model=dict)
+async def predict_herd_pairings(
+    sires: List[UploadFile] = File(...),
+    dams: List[UploadFile] = File(...),
+):
+    """
+    Pair every sire with every dam. Each animal is classified once, all in one
+    batched run, so N sires x M dams costs N + M images rather than 2 * N * M.
+    At most HERD_MAX_PAIRS pairs; /mating assigns larger herds without listing them.
+    """
+    # the multipart body is already spooled by now: this bounds inference and the
+    # pair list, not the upload itself
+    if len(sires) * len(dams) > config.HERD_MAX_PAIRS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(sires)} sires x {len(dams)} dams exceeds {config.HERD_MAX_PAIRS} pairs; "
+                   "use /predict_crossbreed/mating for large herds.",
+        )
+    uploads = list(sires) + list(dams)
+    if not all(u.content_type.startswith("image/") for u in uploads):
+        raise HTTPException(status_code=400, detail="All files must be images.")
 
-        # run both predictions off event loop
-        a_label, a_conf, a_extra = await run_in_threadpool(lambda: _pred(a_bytes))
-        b_label, b_conf, b_extra = await run_in_threadpool(lambda: _pred(b_bytes))
+    with metrics.stage("breed", "read"):
+        contents = await asyncio.gather(*[u.read() for u in uploads])
 
+    try:
+        preds = await models.predict_breed_many(contents)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Crossbreed prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Herd pairing prediction failed: {e}")
 
-    # normalize keys for static lookup
-    a_static = BREED_STATIC_DATA.get(a_label.lower(), {})
-    b_static = BREED_STATIC_DATA.get(b_label.lower(), {})
-
-    # Simple crossbreed logic (example): combine names and provide basic static info.
-    # You can change this to your domain logic: e.g., map pair -> expected hybrid characteristics.
-    cross_name = f"{a_label} x {b_label}"
-
-    # Example heuristics for combined fields (you can make this more complex or load from a crossbreed DB)
-    def combine_field(field):
-        a_val = a_static.get(field)
-        b_val = b_static.get(field)
-        if a_val and b_val:
-            # if numeric-like strings exist you might want to parse; for now prefer first then second
-            return f"{a_val} / {b_val}"
-        return a_val or b_val or "N/A"
-
-    hybrid_info = {
-        "cross_name": cross_name,
-        "expected_milk_type": combine_field("milk_type"),
-        "expected_average_milk_yield": combine_field("average_milk_yield"),
-        "expected_primary_color": combine_field("primary_color"),
-        "expected_size": combine_field("size"),
-        "expected_temperament": combine_field("temperament"),
-        "notes": f"Parent A: {a_label} ({a_conf:.2f}), Parent B: {b_label} ({b_conf:.2f}).",
+    sire_preds, dam_preds = preds[:len(sires)], preds[len(sires):]
+    # CPU-bound for large herds: keep it off the event loop
+    pairs = await run_in_threadpool(_pairs, get_engine(), sire_preds, dam_preds)
+
+    return {
+        "sires": [_parent_info(u, pred) for u, pred in zip(sires, sire_preds)],
+        "dams": [_parent_info(u, pred) for u, pred in zip(dams, dam_preds)],
+        "pairs": pairs,
     }
 
+
+@router.post("/mating", response_model=dict)
+async def plan_matings(
+    dams: List[UploadFile] = File(...),
+    sires: List[UploadFile] = File(...),
+    objective: str = Form("milk_yield"),
+    max_dams_per_sire: Optional[int] = Form(None),
+):
+    """
+    Assign one sire to every dam so the chosen objective is maximised over the whole
+    herd, e.g. objective="milk_yield:0.7,disease_resistance:0.3". Animals are
+    classified once in batches, scored as one (dams, sires) matrix and assigned by
+    the solver in app.mating, honouring max_dams_per_sire when given.
+    """
+    try:
+        weights = mating.parse_objective(objective)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if max_dams_per_sire is not None and max_dams_per_sire < 1:
+        raise HTTPException(status_code=400, detail="max_dams_per_sire must be at least 1.")
+    if max_dams_per_sire is not None and max_dams_per_sire * len(sires) < len(dams):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(sires)} sires x {max_dams_per_sire} dams each cannot cover {len(dams)} dams.",
+        )
+    uploads = list(dams) + list(sires)
+    if not all(u.content_type.startswith("image/") for u in uploads):
+        raise HTTPException(status_code=400, detail="All files must be images.")
+
+    with metrics.stage("breed", "read"):
+        contents = await asyncio.gather(*[u.read() for u in uploads])
+
+    try:
+        preds = await models.predict_breed_many(contents)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Mating prediction failed: {e}")
+
+    dam_preds, sire_preds = preds[:len(dams)], preds[len(dams):]
+    engine = get_engine()
+    dam_probs = np.array([p for _, _, p, _ in dam_preds], dtype=float)
+    sire_probs = np.array([p for _, _, p, _ in sire_preds], dtype=float)
+
+    def solve():
+        scores = mating.score_matrix(engine, dam_probs, sire_probs, weights)
+        choice, info = mating.assign(scores, max_dams_per_sire)
+        return scores, choice, info
+
+    # scoring and the assignment are CPU-bound: keep them off the event loop
+    scores, choice, info = await run_in_threadpool(solve)
+
+    assignments = []
+    for i, j in enumerate(choice.tolist()):
+        d_label, s_label = dam_preds[i][0], sire_preds[j][0]
+        assignments.append({
+            "dam": i,
+            "sire": j,
+            "cross_name": f"{d_label} x {s_label}",
+            "score": round(float(scores[i, j]), 4),
+        })
+
     return {
-        "parent_a": {"filename": parent_a.filename, "predicted_class": a_label, "confidence": float(a_conf), "static_data": a_static},
-        "parent_b": {"filename": parent_b.filename, "predicted_class": b_label, "confidence": float(b_conf), "static_data": b_static},
-        "crossbreed": hybrid_info
+        "objective": weights,
+        "max_dams_per_sire": max_dams_per_sire,
+        "solver": info,
+        "dams": [_parent_info(u, pred) for u, pred in zip(dams, dam_preds)],
+        "sires": [_parent_info(u, pred) for u, pred in zip(sires, sire_preds)],
+        "assignments": assignments,
     }
@@ -1,35 +1,49 @@
+from typing import List
+
 from fastapi import APIRouter, UploadFile, File, HTTPException
-import numpy as np
 
+from ..core import metrics
 from ..core.model_loader import models
 from ..schemas import PredictionResponse
-from ..static_data import DISEASE_STATIC_DATA, DISEASE_CLASS_NAMES
-from ..utils import preprocess_disease
+from ..static_data import DISEASE_STATIC_DATA
+from .metrics import TimedRoute
+from .stream import ndjson_predictions
 
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/", response_model=PredictionResponse)
 async def predict_disease(file: UploadFile = File(...)):
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image.")
-    img_bytes = await file.read()
+    with metrics.stage("disease", "read"):
+        img_bytes = await file.read()
 
     try:
-        disease_model, input_shape = models.load_disease()
-        arr = preprocess_disease(img_bytes, input_shape)
-        pred = disease_model.predict(arr)[0]
+        # decode off the event loop, then batch on the dedicated disease thread
+        label, conf, _, version = await models.predict_disease(img_bytes)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Disease prediction failed: {e}")
 
-    class_id = int(np.argmax(pred))
-    label = DISEASE_CLASS_NAMES[class_id]
-    conf = float(np.max(pred))
     static = DISEASE_STATIC_DATA.get(label, {})
 
     return {
         "filename": file.filename,
         "predicted_class": label,
         "confidence": conf,
-        "static_data": static
+        "static_data": static,
+        "model_version": version,
     }
+
+
+@router.post("/batch")
+async def predict_disease_batch(files: List[UploadFile] = File(...)):
+    """
+    Many images (or zip/tar archives of images) in one request. Streams NDJSON:
+    one PredictionResponse-shaped line per image, or {"filename", "error"}.
+    """
+    return ndjson_predictions(
+        files,
+        models.predict_disease,
+        lambda label: DISEASE_STATIC_DATA.get(label, {}),
+    )
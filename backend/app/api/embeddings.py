@@ -0,0 +1,191 @@
+# backend/app/api/embeddings.py
+# Breed-model embeddings and the similarity index behind them (see app/embeddings.py):
+# duplicate uploads, burst shots and re-identification of animals enrolled before.
+import hmac
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from .. import embeddings
+from ..core import config, metrics
+from ..core.model_loader import models
+from ..schemas import EmbeddingResponse
+from ..static_data import BREED_STATIC_DATA
+from .metrics import TimedRoute
+from .stream import iter_images
+
+router = APIRouter(route_class=TimedRoute)
+
+HEADER = "X-Cattle-Index-Token"
+
+
+def _require_token(x_cattle_index_token: Optional[str] = Header(None)):
+    # writes are refused outright, not opened up, when no token is configured
+    if not config.EMBED_INDEX_TOKEN:
+        raise HTTPException(status_code=404, detail="Index writes are off (set CATTLE_EMBED_INDEX_TOKEN).")
+    if not hmac.compare_digest((x_cattle_index_token or "").encode(), config.EMBED_INDEX_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail=f"{HEADER} header required.")
+
+
+def _search(vectors, k, version):
+    with metrics.stage("embeddings", "search"):
+        return embeddings.shared_index().search(vectors, k, model_version=version)
+
+
+def _row(filename, pred, neighbors, vector=None):
+    label, conf, _, version = pred
+    top = neighbors[0] if neighbors else None
+    row = {
+        "filename": filename,
+        "predicted_class": label,
+        "confidence": float(conf),
+        "static_data": BREED_STATIC_DATA.get(label.lower(), {}),
+        "model_version": version,
+        "neighbors": neighbors,
+        "duplicate_of": top if top and top["score"] >= config.DUPLICATE_THRESHOLD else None,
+    }
+    if vector is not None:
+        row["embedding"] = vector.tolist()
+    return row
+
+
+async def _embed(images):
+    try:
+        return await models.embed_many(images)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Embedding failed: {e}")
+
+
+@router.post("/", response_model=EmbeddingResponse)
+async def embed(
+    file: UploadFile = File(...),
+    k: int = Query(5, ge=0, le=100, description="nearest enrolled images to return"),
+    vector: bool = Query(False, description="include the embedding itself"),
+    enroll: Optional[str] = Query(None, description=f"also add the image to the index under this id ({HEADER})"),
+    x_cattle_index_token: Optional[str] = Header(None),
+):
+    """Embedding, breed and nearest enrolled images for one upload; duplicate_of is set above the threshold."""
+    if enroll is not None:
+        _require_token(x_cattle_index_token)
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image.")
+    with metrics.stage("embeddings", "read"):
+        content = await file.read()
+    vectors, preds, version = await _embed([content])
+    try:
+        # searched before enrolling, so an image never comes back as its own duplicate
+        neighbors = (await run_in_threadpool(_search, vectors, k, version))[0] if k else []
+        if enroll is not None:
+            meta = {"filename": file.filename, "predicted_class": preds[0][0]}
+            await run_in_threadpool(embeddings.shared_index().add, [enroll], vectors, [meta], version)
+            await run_in_threadpool(embeddings.build_when_due, embeddings.shared_index())
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _row(file.filename, preds[0], neighbors, vectors[0] if vector else None)
+
+
+@router.post("/batch")
+async def embed_batch(
+    files: List[UploadFile] = File(...),
+    k: int = Query(0, ge=0, le=100),
+    vector: bool = Query(False),
+):
+    """
+    Many images (or zip/tar archives). Streams NDJSON: one EmbeddingResponse-shaped
+    line per image plus "burst_of", the first earlier image in the same chunk of
+    BATCH_CHUNK_SIZE that it near-duplicates, or {"filename", "error"}.
+    """
+    async def lines(chunk):
+        valid = [(name, data) for name, data in chunk if data is not None]
+        rows = []
+        if valid:
+            try:
+                vectors, preds, version = await models.embed_many([data for _, data in valid])
+                neighbors = await run_in_threadpool(_search, vectors, k, version) if k else [[]] * len(valid)
+            except Exception as e:
+                rows = [{"filename": name, "error": f"Embedding failed: {e}"} for name, _ in valid]
+            else:
+                bursts = embeddings.first_duplicates(vectors, config.DUPLICATE_THRESHOLD)
+                for i, (name, _) in enumerate(valid):
+                    row = _row(name, preds[i], neighbors[i], vectors[i] if vector else None)
+                    row["burst_of"] = valid[bursts[i]][0] if bursts[i] >= 0 else None
+                    rows.append(row)
+        by_index = iter(rows)
+        out = []
+        for name, data in chunk:
+            row = next(by_index) if data is not None else {"filename": name, "error": "File must be an image."}
+            out.append(json.dumps(row) + "\n")
+        return out
+
+    async def generate():
+        chunk = []
+        async for item in iter_images(files):
+            chunk.append(item)
+            if len(chunk) >= config.BATCH_CHUNK_SIZE:
+                for line in await lines(chunk):
+                    yield line
+                chunk = []
+        if chunk:
+            for line in await lines(chunk):
+                yield line
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/index")
+async def index_info():
+    return await run_in_threadpool(embeddings.shared_index().info)
+
+
+@router.post("/index", dependencies=[Depends(_require_token)])
+async def enroll_images(files: List[UploadFile] = File(...), ids: Optional[str] = Form(None)):
+    """
+    Add images (or archives) to the index, BATCH_CHUNK_SIZE at a time. ids is a
+    comma-separated list in upload order (several photos may share one animal's
+    id); default: the file names. Non-image uploads are skipped.
+    """
+    keys = [i.strip() for i in ids.split(",")] if ids else None
+    index = embeddings.shared_index()
+    added, version = 0, None
+
+    async def flush(chunk):
+        nonlocal added, version
+        vectors, preds, version = await _embed([data for _, data in chunk])
+        names = [name for name, _ in chunk]
+        meta = [{"filename": n, "predicted_class": p[0]} for n, p in zip(names, preds)]
+        chunk_ids = keys[added:added + len(chunk)] if keys else names
+        try:
+            await run_in_threadpool(index.add, chunk_ids, vectors, meta, version)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=f"{e} ({added} images added first)")
+        added += len(chunk)
+
+    chunk = []
+    async for name, data in iter_images(files):
+        if data is not None:
+            chunk.append((name, data))
+        if len(chunk) >= config.BATCH_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+        if keys and added + len(chunk) > len(keys):
+            raise HTTPException(status_code=400, detail=f"More images than ids ({len(keys)}); {added} added.")
+    if chunk:
+        await flush(chunk)
+    if keys and added != len(keys):
+        raise HTTPException(status_code=400, detail=f"{len(keys)} ids for {added} images; all {added} were added.")
+    if not added:
+        raise HTTPException(status_code=400, detail="No images in the upload.")
+    building = await run_in_threadpool(embeddings.build_when_due, index)
+    return {"added": added, "rows": len(index), "model_version": version, "building": building}
+
+
+@router.post("/index/build", dependencies=[Depends(_require_token)])
+async def build_index(nlist: Optional[int] = Query(None, ge=1), iters: int = Query(10, ge=1, le=50)):
+    """Cluster the index for fast queries; takes a while on large indexes, and enrolment waits for it."""
+    try:
+        return await run_in_threadpool(embeddings.shared_index().build, nlist, iters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,32 @@
+# backend/app/api/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from ..core import config, cpu
+from ..core.model_loader import models
+
+
+router = APIRouter()
+
+@router.get("/healthz")
+async def healthz():
+    # liveness: the process is up and serving, whether or not models are warm
+    return {
+        "status": "ok",
+        "role": config.SERVING_ROLE,
+        "ready": models.ready,
+        "timings": models.timings,
+        "cache": models.cache.info(),
+        "admission": {name: c.info() for name, c in models.admission.items()},
+        "cpu": cpu.info(),
+        "models": {
+            task: models.task_registry(task).info() for task in ("breed", "disease") if config.serves(task)
+        },
+    }
+
+@router.get("/readyz")
+async def readyz():
+    body = {"ready": models.ready, "role": config.SERVING_ROLE, "timings": models.timings}
+    if models.startup_error:
+        body["error"] = models.startup_error
+    return JSONResponse(body, status_code=200 if models.ready else 503)
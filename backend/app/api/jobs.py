@@ -0,0 +1,87 @@
+# backend/app/api/jobs.py
+# Async scan jobs: uploads are spooled to disk and queued in the job database;
+# worker processes (app/jobs.py) do the classification.
+import os
+import threading
+from typing import List, Optional
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+
+from .. import jobs
+from .stream import iter_images
+
+router = APIRouter()
+_local = threading.local()
+
+
+def _get_store():
+    # one SQLite connection per threadpool thread
+    store = getattr(_local, "store", None)
+    if store is None:
+        store = _local.store = jobs.JobStore()
+    return store
+
+
+def _spool(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@router.post("", status_code=202)
+async def create_job(
+    files: Optional[List[UploadFile]] = File(None),
+    manifest: Optional[UploadFile] = File(None),
+    task: str = Form("breed"),
+):
+    """
+    Queue images (or zip/tar archives of images) and/or a manifest of server-side
+    paths. Returns the job id at once; poll GET /jobs/{id} for progress and results.
+    """
+    if task not in jobs.TASKS:
+        raise HTTPException(status_code=400, detail=f"task must be one of {', '.join(jobs.TASKS)}.")
+    if not files and manifest is None:
+        raise HTTPException(status_code=400, detail="Upload images, archives or a manifest.")
+
+    items = []
+    if manifest is not None:
+        try:
+            items.extend(jobs.manifest_paths((await manifest.read()).decode("utf-8")))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    job_id = jobs.new_job_id()
+    spool = jobs.job_dir(job_id)
+    await run_in_threadpool(os.makedirs, spool, exist_ok=True)
+    skipped = []
+    # archives are expanded one member at a time, so memory stays at one image
+    async for name, data in iter_images(files or []):
+        if data is None:
+            skipped.append(name)
+            continue
+        path = os.path.join(spool, f"{len(items):07d}{os.path.splitext(name or '')[1].lower()}")
+        await run_in_threadpool(_spool, path, data)
+        items.append((name, path))
+
+    job = await run_in_threadpool(lambda: _get_store().create(job_id, task, items))
+    return {**job, "skipped_non_images": skipped}
+
+
+@router.get("")
+async def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    return await run_in_threadpool(lambda: _get_store().list(limit))
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="first item (upload order) to return"),
+    limit: int = Query(100, ge=0, le=1000),
+):
+    job = await run_in_threadpool(lambda: _get_store().get(job_id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    results = await run_in_threadpool(lambda: _get_store().results(job_id, offset, limit))
+    # pages are fixed item ranges; unfinished items show their state until they complete
+    next_offset = offset + len(results) if offset + len(results) < job["total"] else None
+    return {**job, "results": results, "next_offset": next_offset}
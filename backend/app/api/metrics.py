@@ -0,0 +1,106 @@
+# backend/app/api/metrics.py
+# /metrics plus the HTTP side of the instrumentation: a middleware that opens the
+# per-request timing context and a route class that splits a request into body
+# parsing, endpoint and response validation/serialisation.
+import asyncio
+import time
+from functools import wraps
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+from ..core import config, metrics
+
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and, if enabled, adds a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        timings, token = metrics.start_request()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if config.SERVER_TIMING:
+                    timings.add("total", time.perf_counter() - start)
+                    headers = MutableHeaders(raw=message["headers"])
+                    headers.append("Server-Timing", timings.header())
+                    headers.append("Timing-Allow-Origin", "*")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.REQUEST_SECONDS.observe(
+                time.perf_counter() - start, timings.route, scope["method"], str(status)
+            )
+            metrics.end_request(token)
+
+
+def _timed_endpoint(endpoint):
+    if not asyncio.iscoroutinefunction(endpoint):
+        return endpoint
+
+    # wraps keeps the signature FastAPI reads the parameters from
+    @wraps(endpoint)
+    async def timed(*args, **kwargs):
+        timings = metrics.current()
+        if timings is None or timings.handler_start is None:
+            return await endpoint(*args, **kwargs)
+        start = time.perf_counter()
+        timings.add("parse", start - timings.handler_start)
+        metrics.HTTP_STAGE_SECONDS.observe(start - timings.handler_start, timings.route, "parse")
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            timings.add("endpoint", end - start)
+            metrics.HTTP_STAGE_SECONDS.observe(end - start, timings.route, "endpoint")
+            timings.endpoint_end = end
+
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that reports parse / endpoint / serialize time for each request."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def timed_handler(request):
+            timings = metrics.current()
+            if timings is None:
+                return await handler(request)
+            timings.route = route
+            timings.handler_start = time.perf_counter()
+            response = await handler(request)
+            if timings.endpoint_end is not None:
+                # response_model validation + JSON encoding happen after the endpoint returns
+                elapsed = time.perf_counter() - timings.endpoint_end
+                timings.add("serialize", elapsed)
+                metrics.HTTP_STAGE_SECONDS.observe(elapsed, route, "serialize")
+            return response
+
+        return timed_handler
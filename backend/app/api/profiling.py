@@ -0,0 +1,98 @@
+# backend/app/api/profiling.py
+# /debug endpoints for on-demand profiling, and the middleware that decides which
+# requests get profiled (see app/core/profiling.py).
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from ..core import config, profiling
+
+HEADER = "X-Cattle-Profile"
+# never profiled: the debug endpoints themselves and probes/scrapes
+_SKIP_PREFIXES = ("/debug/", "/metrics", "/healthz", "/readyz")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not config.PROFILING_ENABLED
+            or scope["type"] != "http"
+            or scope["path"].startswith(_SKIP_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+        header = Headers(scope=scope).get(HEADER)
+        profile = None
+        if profiling.should_profile(header):
+            profile = profiling.begin(scope["path"], scope["method"], "header" if header else "sampled")
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(raw=message["headers"]).append(f"{HEADER}-Id", profile.id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiling.detach(profile)
+            await run_in_threadpool(profiling.finish, profile, status)
+
+
+def _require_token(x_cattle_profile: Optional[str] = Header(None)):
+    if not config.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is off (set CATTLE_PROFILE_TOKEN).")
+    if not profiling.authorized(x_cattle_profile):
+        raise HTTPException(status_code=403, detail=f"{HEADER} header with the profiling token required.")
+
+
+router = APIRouter(dependencies=[Depends(_require_token)])
+
+
+class ProfilingSettings(BaseModel):
+    sample_rate: Optional[float] = Field(None, ge=0.0, le=1.0)
+    next: Optional[int] = Field(None, ge=0, description="profile the next N requests")
+
+
+@router.get("/profiling")
+async def get_settings():
+    return {**profiling.settings, "busy": profiling.busy(), "dir": config.PROFILE_DIR}
+
+
+@router.post("/profiling")
+async def update_settings(body: ProfilingSettings):
+    # per worker process: with several uvicorn workers, each one keeps its own settings
+    return profiling.configure(sample_rate=body.sample_rate, next=body.next)
+
+
+@router.get("/profiles")
+async def list_profiles():
+    return await run_in_threadpool(profiling.list_profiles)
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    meta = await run_in_threadpool(profiling.get_profile, profile_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return {**meta, "files": await run_in_threadpool(profiling.files, profile_id)}
+
+
+@router.get("/profiles/{profile_id}/{name:path}")
+async def get_profile_file(profile_id: str, name: str):
+    path = profiling.file_path(profile_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found.")
+    return FileResponse(path, filename=name.replace("/", "_"))
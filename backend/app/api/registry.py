@@ -0,0 +1,107 @@
+# backend/app/api/registry.py
+# Runtime model management: load, activate, shadow and retire checkpoint versions
+# (see app/core/registry.py). Per worker process, like the profiling settings.
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel, Field
+
+from ..core import config
+from ..core.model_loader import models
+
+HEADER = "X-Cattle-Admin-Token"
+
+
+def _require_token(x_cattle_admin_token: Optional[str] = Header(None)):
+    # refused outright, not opened up, when no token is configured
+    if not config.MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Model admin is off (set CATTLE_MODEL_ADMIN_TOKEN).")
+    if not hmac.compare_digest((x_cattle_admin_token or "").encode(), config.MODEL_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail=f"{HEADER} header required.")
+
+
+router = APIRouter(dependencies=[Depends(_require_token)])
+
+
+class LoadVersion(BaseModel):
+    path: str = Field(..., description="checkpoint file, relative to CATTLE_MODEL_DIR")
+    activate: bool = Field(False, description="swap it in once loaded and warmed")
+    shadow_rate: Optional[float] = Field(None, ge=0.0, le=1.0, description="mirror this share of traffic to it")
+
+
+class Activate(BaseModel):
+    version: str
+
+
+class Shadow(BaseModel):
+    version: Optional[str] = Field(None, description="null stops shadowing")
+    rate: float = Field(0.05, ge=0.0, le=1.0)
+
+
+def _registry(task):
+    if task not in ("breed", "disease") or not config.serves(task):
+        raise HTTPException(status_code=404, detail=f"{task} is not served here.")
+    return models.task_registry(task)
+
+
+def _checkpoint(path):
+    # only files under the model directory can be loaded
+    root = os.path.realpath(config.MODEL_DIR)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root or not os.path.isfile(full):
+        raise HTTPException(status_code=400, detail=f"No checkpoint {path!r} in the model directory.")
+    return full
+
+
+@router.get("")
+async def list_models():
+    return {task: models.task_registry(task).info() for task in ("breed", "disease") if config.serves(task)}
+
+
+@router.post("/{task}/versions", status_code=202)
+async def load_version(task: str, body: LoadVersion):
+    """Starts loading in the background; poll GET /models for its state."""
+    reg = _registry(task)
+    if body.activate and body.shadow_rate:
+        raise HTTPException(status_code=400, detail="A version is either activated or shadowed, not both.")
+    path = _checkpoint(body.path)
+    if reg.loads.get(path, {}).get("state") == "loading":
+        raise HTTPException(status_code=409, detail=f"{body.path} is already loading.")
+    models.start_load(task, path, activate=body.activate, shadow_rate=body.shadow_rate)
+    return {"task": task, "path": path, "state": "loading"}
+
+
+@router.post("/{task}/activate")
+async def activate(task: str, body: Activate):
+    reg = _registry(task)
+    try:
+        reg.activate(body.version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return reg.info()
+
+
+@router.post("/{task}/shadow")
+async def shadow(task: str, body: Shadow):
+    reg = _registry(task)
+    try:
+        reg.set_shadow(body.version, body.rate)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return reg.info()
+
+
+@router.delete("/{task}/versions/{version}")
+async def retire(task: str, version: str):
+    reg = _registry(task)
+    try:
+        reg.retire(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return reg.info()
@@ -0,0 +1,116 @@
+# backend/app/api/stream.py
+# Helpers shared by the /batch routes: iterate many uploads (or archives of images)
+# and stream one NDJSON line per image as each chunk of results comes back.
+import asyncio
+import json
+import os
+import tarfile
+import zipfile
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from ..core import config
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+ARCHIVE_TYPES = {
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+}
+
+
+def _is_image_name(name):
+    return os.path.splitext(name.lower())[1] in IMAGE_EXTENSIONS
+
+
+def _is_archive(upload):
+    name = (upload.filename or "").lower()
+    return name.endswith(ARCHIVE_SUFFIXES) or upload.content_type in ARCHIVE_TYPES
+
+
+def _iter_archive(upload):
+    # members are read one at a time, so only the current image is held in memory
+    upload.file.seek(0)
+    if zipfile.is_zipfile(upload.file):
+        upload.file.seek(0)
+        with zipfile.ZipFile(upload.file) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and _is_image_name(info.filename):
+                    yield info.filename, zf.read(info)
+        return
+    upload.file.seek(0)
+    with tarfile.open(fileobj=upload.file, mode="r:*") as tar:
+        for member in tar:
+            if member.isfile() and _is_image_name(member.name):
+                yield member.name, tar.extractfile(member).read()
+
+
+async def iter_images(files):
+    """
+    Yield (filename, bytes) for every image in the uploads. Archives are expanded
+    lazily; non-image uploads yield (filename, None) so they can be reported.
+    """
+    for upload in files:
+        if _is_archive(upload):
+            members = _iter_archive(upload)
+            while True:
+                item = await run_in_threadpool(next, members, None)
+                if item is None:
+                    break
+                yield item
+        elif upload.content_type and upload.content_type.startswith("image/"):
+            yield upload.filename, await upload.read()
+        else:
+            yield upload.filename, None
+
+
+async def _predict_chunk(chunk, predict, static_lookup):
+    # every image in the chunk is submitted at once so the batcher coalesces them
+    valid = [(name, data) for name, data in chunk if data is not None]
+    results = await asyncio.gather(
+        *[predict(data) for _, data in valid], return_exceptions=True
+    )
+    by_index = iter(results)
+    lines = []
+    for name, data in chunk:
+        if data is None:
+            row = {"filename": name, "error": "File must be an image."}
+        else:
+            result = next(by_index)
+            if isinstance(result, Exception):
+                row = {"filename": name, "error": f"Prediction failed: {result}"}
+            else:
+                label, conf, _, version = result
+                row = {
+                    "filename": name,
+                    "predicted_class": label,
+                    "confidence": float(conf),
+                    "static_data": static_lookup(label),
+                    "model_version": version,
+                }
+        lines.append(json.dumps(row) + "\n")
+    return lines
+
+
+def ndjson_predictions(files, predict, static_lookup):
+    """
+    StreamingResponse with one JSON object per image, in upload order. Images are
+    run in chunks of BATCH_CHUNK_SIZE so memory stays bounded by the chunk, not the upload.
+    """
+    async def generate():
+        chunk = []
+        async for item in iter_images(files):
+            chunk.append(item)
+            if len(chunk) >= config.BATCH_CHUNK_SIZE:
+                for line in await _predict_chunk(chunk, predict, static_lookup):
+                    yield line
+                chunk = []
+        if chunk:
+            for line in await _predict_chunk(chunk, predict, static_lookup):
+                yield line
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -0,0 +1,152 @@
+# backend/app/api/video.py
+# Video files and camera streams: frames are sampled, unchanged ones skipped and the
+# rest batched through the models; one NDJSON line per segment of video time comes
+# back as each segment completes (see app/video.py).
+import json
+import os
+import time
+from collections import Counter
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from .. import video
+from ..core import config
+from ..core.model_loader import models
+from ..static_data import BREED_STATIC_DATA, DISEASE_STATIC_DATA
+from .metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+STATIC = {
+    "breed": lambda label: BREED_STATIC_DATA.get(label.lower(), {}),
+    "disease": lambda label: DISEASE_STATIC_DATA.get(label, {}),
+}
+TOTALS = ("frames", "analysed", "sampled_out", "unchanged", "dropped", "corrupt")
+
+
+class Sampling(BaseModel):
+    # defaults and meaning: CATTLE_VIDEO_* in app/core/config.py
+    models: Optional[List[str]] = Field(None, description="breed and/or disease; default: every model served here")
+    sample_fps: float = Field(config.VIDEO_SAMPLE_FPS, ge=0.0)
+    threshold: float = Field(config.VIDEO_CHANGE_THRESHOLD, ge=0.0, le=1.0)
+    max_gap_s: float = Field(config.VIDEO_MAX_GAP_S, gt=0.0)
+    segment_s: float = Field(config.VIDEO_SEGMENT_S, gt=0.0)
+    fps: Optional[float] = Field(None, gt=0.0, description="frame rate of MJPEG files")
+
+
+class StreamSource(Sampling):
+    source: str = Field(..., description="camera URL or server-side file allowed by CATTLE_VIDEO_SOURCES")
+    realtime: bool = Field(False, description="play a file back at its frame rate, as a stand-in for a camera")
+
+
+def _sampling(
+    models: Optional[str] = Query(None, description="comma-separated: breed, disease"),
+    sample_fps: float = Query(config.VIDEO_SAMPLE_FPS, ge=0.0),
+    threshold: float = Query(config.VIDEO_CHANGE_THRESHOLD, ge=0.0, le=1.0),
+    max_gap_s: float = Query(config.VIDEO_MAX_GAP_S, gt=0.0),
+    segment_s: float = Query(config.VIDEO_SEGMENT_S, gt=0.0),
+    fps: Optional[float] = Query(None, gt=0.0),
+):
+    return Sampling(
+        models=[m.strip() for m in models.split(",") if m.strip()] if models else None,
+        sample_fps=sample_fps, threshold=threshold, max_gap_s=max_gap_s, segment_s=segment_s, fps=fps,
+    )
+
+
+def _tasks(names):
+    tasks = names or [m for m in ("breed", "disease") if config.serves(m)]
+    unknown = [t for t in tasks if t not in STATIC or not config.serves(t)]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Not served here: {', '.join(unknown)}.")
+    return list(dict.fromkeys(tasks))
+
+
+async def _min_size(tasks):
+    # JPEG frames are drafted down no further than the largest model input needs
+    sizes = [await models.input_size(task) for task in tasks]
+    return max(w for w, _ in sizes), max(h for _, h in sizes)
+
+
+def _allowed(source):
+    # camera URLs by prefix; files only when they resolve inside a listed directory
+    for prefix in config.VIDEO_SOURCES:
+        if "://" in prefix:
+            if source.startswith(prefix):
+                return True
+        elif "://" not in source:
+            root = os.path.realpath(prefix)
+            if os.path.commonpath([root, os.path.realpath(source)]) == root:
+                return True
+    return False
+
+
+def _ndjson(frames, params, tasks, min_size, live):
+    pipeline = video.FramePipeline(
+        frames, min_size, params.sample_fps, params.threshold, params.max_gap_s, params.segment_s,
+        live=live, queue_size=config.VIDEO_QUEUE_SIZE,
+    )
+
+    async def generate():
+        start = time.perf_counter()
+        totals = Counter()
+        pipeline.start()
+        try:
+            async for row in video.segments(pipeline, models.predict_images, tasks, config.BATCH_CHUNK_SIZE):
+                for task in tasks:
+                    if task in row:
+                        row[task]["static_data"] = STATIC[task](row[task]["predicted_class"])
+                totals.update({key: row[key] for key in TOTALS})
+                yield json.dumps(row) + "\n"
+            summary = {"done": True}
+        except Exception as e:
+            summary = {"done": False, "error": f"Video ingestion failed: {e}"}
+        finally:
+            # also runs when the client goes away mid-stream
+            pipeline.stop()
+        summary.update({key: totals[key] for key in TOTALS})
+        summary.update(video_s=pipeline.last_t, elapsed_s=time.perf_counter() - start)
+        yield json.dumps(summary) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post("/")
+async def ingest_video(file: UploadFile = File(...), params: Sampling = Depends(_sampling)):
+    """
+    A video file: MJPEG natively, anything FFmpeg reads when PyAV is installed.
+    Streams NDJSON: one line per segment, then a summary line with "done".
+    """
+    tasks = _tasks(params.models)
+    min_size = await _min_size(tasks)
+    try:
+        frames = await run_in_threadpool(video.open_upload, file.file, params.fps or config.VIDEO_MJPEG_FPS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _ndjson(frames, params, tasks, min_size, live=False)
+
+
+@router.post("/stream")
+async def ingest_stream(body: StreamSource):
+    """
+    A camera (http MJPEG, rtsp://) or a server-side file, read until it ends or the
+    client disconnects. Live sources drop the oldest waiting frames when the models
+    fall behind; files are read no faster than the models go.
+    """
+    if not config.VIDEO_SOURCES:
+        raise HTTPException(status_code=404, detail="Stream ingestion is off (set CATTLE_VIDEO_SOURCES).")
+    if not _allowed(body.source):
+        raise HTTPException(status_code=403, detail="Source not allowed by CATTLE_VIDEO_SOURCES.")
+    tasks = _tasks(body.models)
+    min_size = await _min_size(tasks)
+    try:
+        frames = await run_in_threadpool(
+            video.open_source, body.source, body.fps or config.VIDEO_MJPEG_FPS, body.realtime
+        )
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Cannot open {body.source}: {e}")
+    live = body.realtime or "://" in body.source
+    return _ndjson(frames, body, tasks, min_size, live)
@@ -0,0 +1,17 @@
+# backend/app/bench/__init__.py
+"""
+Reproducible benchmarks that run offline on CPU.
+
+    cd backend
+    python -m app.bench models --out /tmp/cattle-models       # random-weight checkpoints
+    python -m app.bench micro --model-dir /tmp/cattle-models -o micro.json
+    python -m app.bench load --model-dir /tmp/cattle-models --concurrency 16 -o load.json
+    python -m app.bench compare base.json micro.json
+
+synthetic   randomly initialised EnhancedCattleClassifier + Keras model of the served
+            shapes, and synthetic JPEGs in a configurable size mix
+micro       decode, preprocess_disease, predict_bytes and crossbreed lookups
+load        closed-loop load generator against app.main (RPS, p50/p95/p99)
+
+Every result file carries the git commit and environment it was measured on.
+"""
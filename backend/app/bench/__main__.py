@@ -0,0 +1,106 @@
+# backend/app/bench/__main__.py
+import argparse
+import sys
+
+from app.bench import load as load_bench
+from app.bench import micro as micro_bench
+from app.bench import results, synthetic
+
+DEFAULT_MODEL_DIR = "/tmp/cattle-bench-models"
+
+
+def _csv(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.bench", description="Offline CPU benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    models = sub.add_parser("models", help="write random-weight checkpoints")
+    models.add_argument("--out", default=DEFAULT_MODEL_DIR)
+    models.add_argument("--task", choices=("breed", "disease", "both"), default="both")
+    models.add_argument("--seed", type=int, default=0)
+    models.add_argument("--force", action="store_true", help="overwrite existing checkpoints")
+
+    micro = sub.add_parser("micro", help="microbenchmarks of decode / preprocess / predict / crossbreed")
+    micro.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    micro.add_argument("--only", type=_csv, default=list(micro_bench.GROUPS))
+    micro.add_argument("--sizes", default=synthetic.DEFAULT_SIZE_MIX, help="e.g. 640x480=2,4032x3024=1")
+    micro.add_argument("--min-time", type=float, default=1.0, help="seconds per case")
+    micro.add_argument("-o", "--output", default="-")
+
+    load = sub.add_parser("load", help="end-to-end load test of app.main")
+    load.add_argument("--url", help="drive this server instead of starting one")
+    load.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    load.add_argument("--endpoints", type=_csv, default=["breed"], help="breed,disease,crossbreed")
+    load.add_argument("--concurrency", type=lambda v: [int(c) for c in _csv(v)], default=[1, 8, 32])
+    load.add_argument("--duration", type=float, default=30.0, help="measured seconds per level")
+    load.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds per level")
+    load.add_argument("--sizes", default=synthetic.DEFAULT_SIZE_MIX)
+    load.add_argument("--pool", type=int, default=32, help="distinct images to cycle through")
+    load.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting a server")
+    load.add_argument("--port", type=int, default=8765)
+    load.add_argument("--cache", action="store_true", help="leave the prediction cache on")
+    load.add_argument("-o", "--output", default="-")
+
+    cmp_ = sub.add_parser("compare", help="flag regressions between two result files")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--metric", default="p50_ms")
+    cmp_.add_argument("--threshold", type=float, default=0.10, help="allowed relative change")
+    args = parser.parse_args(argv)
+
+    if args.command == "models":
+        for path in synthetic.build_models(args.out, seed=args.seed, task=args.task, force=args.force):
+            print(path)
+        return 0
+
+    if args.command == "micro":
+        unknown = set(args.only) - set(micro_bench.GROUPS)
+        if unknown:
+            parser.error(f"unknown groups {sorted(unknown)}; choose from {', '.join(micro_bench.GROUPS)}")
+        res = micro_bench.run(args.only, args.sizes, args.model_dir, args.min_time)
+        params = {"groups": args.only, "sizes": args.sizes, "min_time": args.min_time}
+        results.write(args.output, "micro", params, res)
+        return 0
+
+    if args.command == "load":
+        unknown = set(args.endpoints) - set(load_bench.ENDPOINTS)
+        if unknown:
+            parser.error(f"unknown endpoints {sorted(unknown)}")
+        params = {k: getattr(args, k) for k in (
+            "endpoints", "concurrency", "duration", "warmup", "sizes", "pool", "workers", "cache", "url",
+        )}
+
+        def bench(url):
+            return load_bench.run(
+                url, args.endpoints, args.concurrency, args.duration, args.warmup, args.sizes, args.pool,
+            )
+
+        if args.url:
+            res = bench(args.url)
+        else:
+            # crossbreed runs on the breed model; start only the roles the endpoints need
+            needed = {"disease" if e == "disease" else "breed" for e in args.endpoints}
+            task = "both" if len(needed) == 2 else needed.pop()
+            role = "all" if task == "both" else task
+            synthetic.build_models(args.model_dir, task=task)
+            with load_bench.Server(
+                args.model_dir, args.port, args.workers, args.cache, env={"CATTLE_SERVING_ROLE": role},
+            ) as server:
+                server.wait_ready()
+                res = bench(server.url)
+        results.write(args.output, "load", params, res)
+        return 0
+
+    rows = results.compare(args.base, args.new, args.metric, args.threshold)
+    regressed = 0
+    for case, a, b, ratio, worse in rows:
+        regressed += worse
+        print(f"{'REGRESSED' if worse else 'ok':9s} {case:48s} {a:10.2f} -> {b:10.2f}  x{ratio:.3f}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+# backend/app/bench/load.py
+"""
+Closed-loop load generator for app.main: `concurrency` clients each keep one
+request in flight over a keep-alive connection, cycling through a pool of
+synthetic images drawn from the size mix. Reports RPS and latency percentiles
+measured after a warm-up period.
+
+By default a uvicorn server is started on the synthetic models with the
+prediction cache off, so every request reaches the model; pass --url to drive
+an already running server instead.
+"""
+import http.client
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
+from app.bench import synthetic
+from app.bench.results import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# endpoint -> (path, multipart file fields)
+ENDPOINTS = {
+    "breed": ("/predict_breed/", ("file",)),
+    "disease": ("/predict_disease/", ("file",)),
+    "crossbreed": ("/predict_crossbreed/", ("parent_a", "parent_b")),
+}
+
+
+def multipart(files):
+    """[(field, filename, bytes)] -> (body, content type)"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, filename, data in files:
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+            f"filename=\"{filename}\"\r\nContent-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Server:
+    """uvicorn app.main:app in a subprocess, stopped on exit."""
+
+    def __init__(self, model_dir, port=8765, workers=1, cache=False, env=None):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.env = dict(os.environ, CATTLE_MODEL_DIR=os.path.abspath(model_dir), **(env or {}))
+        if not cache:
+            self.env["CATTLE_CACHE_MAX_ENTRIES"] = "0"
+        self.workers = workers
+        self.proc = None
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--host", "127.0.0.1", "--port", str(self.port),
+                "--workers", str(self.workers), "--log-level", "warning",
+            ],
+            cwd=BACKEND_DIR, env=self.env,
+        )
+        return self
+
+    def wait_ready(self, timeout=300.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.proc.returncode} before it was ready")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+                conn.request("GET", "/readyz")
+                if conn.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+def _bodies(endpoint, pool):
+    _, fields = ENDPOINTS[endpoint]
+    bodies = []
+    for i in range(len(pool)):
+        # consecutive pool images as the crossbreed parents
+        files = [(f, f"img{(i + k) % len(pool)}.jpg", pool[(i + k) % len(pool)][1]) for k, f in enumerate(fields)]
+        bodies.append(multipart(files))
+    return bodies
+
+
+def _client(host, port, path, bodies, counter, lock, stop_at, records):
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    while True:
+        with lock:
+            i = next(counter)
+        body, content_type = bodies[i % len(bodies)]
+        start = time.perf_counter()
+        if start >= stop_at:
+            break
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=120)
+            status = 0
+        records.append((start, time.perf_counter() - start, status))
+    conn.close()
+
+
+def run_level(url, endpoint, bodies, concurrency, duration_s, warmup_s):
+    parsed = urllib.parse.urlsplit(url)
+    path = parsed.path.rstrip("/") + ENDPOINTS[endpoint][0]
+    counter, lock = itertools.count(), threading.Lock()
+    begin = time.perf_counter()
+    measure_from, stop_at = begin + warmup_s, begin + warmup_s + duration_s
+    records = [[] for _ in range(concurrency)]
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(parsed.hostname, parsed.port or 80, path, bodies, counter, lock, stop_at, records[n]),
+            daemon=True,
+        )
+        for n in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # a request counts if it started inside the measurement window
+    window = [r for rs in records for r in rs if r[0] >= measure_from]
+    ok = [seconds for _, seconds, status in window if status == 200]
+    statuses = {}
+    for _, _, status in window:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    measured = max(max((s + d for s, d, _ in window), default=stop_at), stop_at) - measure_from
+    return {
+        "concurrency": concurrency,
+        "rps": round(len(ok) / measured, 2) if measured > 0 else 0.0,
+        "errors": len(window) - len(ok),
+        "statuses": statuses,
+        **summarize(ok),
+    }
+
+
+def run(url, endpoints=("breed",), concurrency=(1, 8, 32), duration_s=30.0, warmup_s=5.0,
+        size_mix=synthetic.DEFAULT_SIZE_MIX, pool_size=32, seed=0):
+    pool = synthetic.image_pool(synthetic.parse_size_mix(size_mix), pool_size, seed=seed)
+    results = {}
+    for endpoint in endpoints:
+        bodies = _bodies(endpoint, pool)
+        for c in concurrency:
+            results[f"{endpoint}@c{c}"] = run_level(url, endpoint, bodies, c, duration_s, warmup_s)
+    return results
@@ -0,0 +1,99 @@
+# backend/app/bench/micro.py
+"""
+Microbenchmarks for the hot functions of the serving path, called directly
+(no HTTP, no batcher, no cache).
+"""
+import os
+import time
+
+import numpy as np
+
+from app.bench import synthetic
+from app.bench.results import summarize
+
+GROUPS = ("decode", "preprocess_disease", "predict_bytes", "crossbreed")
+
+
+def timeit(fn, min_time=1.0, min_runs=5, warmup=2):
+    """Call fn until both min_time seconds and min_runs calls have passed; per-call seconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _bench_decode(images, min_time):
+    from app.preprocessing import BreedPreprocessor, disease_array
+
+    # what cattle_model.get_transform() returns, without importing torch
+    transform = BreedPreprocessor(size=300)
+    out = {}
+    for (w, h), data in images:
+        out[f"decode_breed[{w}x{h}]"] = summarize(timeit(lambda: transform.from_bytes(data), min_time))
+        out[f"decode_disease[{w}x{h}]"] = summarize(
+            timeit(lambda: disease_array(data, synthetic.DISEASE_INPUT_SHAPE), min_time)
+        )
+    return out
+
+
+def _bench_preprocess_disease(images, min_time):
+    from app.utils import preprocess_disease
+
+    return {
+        f"preprocess_disease[{w}x{h}]": summarize(
+            timeit(lambda: preprocess_disease(data, synthetic.DISEASE_INPUT_SHAPE), min_time)
+        )
+        for (w, h), data in images
+    }
+
+
+def _bench_predict_bytes(images, min_time, model_dir):
+    from app import cattle_model
+
+    synthetic.build_models(model_dir, task="breed")
+    model, device, transform = cattle_model.load_model(os.path.join(model_dir, synthetic.BREED_FILENAME))
+    return {
+        f"predict_bytes[{w}x{h}]": summarize(
+            timeit(lambda: cattle_model.predict_bytes(model, device, transform, data), min_time)
+        )
+        for (w, h), data in images
+    }
+
+
+def _bench_crossbreed(min_time, herd=(200, 50)):
+    from app.crossbreed_engine import get_engine
+
+    engine = get_engine()
+    K = len(engine.class_names)
+    rng = np.random.default_rng(0)
+    pa, pb = rng.dirichlet(np.ones(K)), rng.dirichlet(np.ones(K))
+    dams, sires = rng.dirichlet(np.ones(K), size=herd[0]), rng.dirichlet(np.ones(K), size=herd[1])
+    a, b = engine.class_names[0], engine.class_names[-1]
+    field = "estimated_milk_yield_l_per_year"
+    return {
+        "crossbreed_pair_info": summarize(timeit(lambda: engine.pair_info(a, b), min_time)),
+        "crossbreed_expected_traits": summarize(timeit(lambda: engine.expected_traits(pa, pb), min_time)),
+        f"crossbreed_herd_matrix[{herd[0]}x{herd[1]}]": summarize(
+            timeit(lambda: engine.expected_numeric(field, dams, sires), min_time)
+        ),
+    }
+
+
+def run(groups=GROUPS, size_mix=synthetic.DEFAULT_SIZE_MIX, model_dir=None, min_time=1.0):
+    # one image per distinct size: each case is a fixed input, comparable across runs
+    images = [(size, synthetic.synthetic_jpeg(size)) for size, _ in synthetic.parse_size_mix(size_mix)]
+    results = {}
+    if "decode" in groups:
+        results.update(_bench_decode(images, min_time))
+    if "preprocess_disease" in groups:
+        results.update(_bench_preprocess_disease(images, min_time))
+    if "predict_bytes" in groups:
+        results.update(_bench_predict_bytes(images, min_time, model_dir))
+    if "crossbreed" in groups:
+        results.update(_bench_crossbreed(min_time))
+    return results
@@ -0,0 +1,91 @@
+# backend/app/bench/results.py
+"""Result files: measurements plus the commit and environment they came from."""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+
+def summarize(samples_s):
+    """Latency samples in seconds -> summary in milliseconds."""
+    ms = np.asarray(samples_s, dtype="float64") * 1000.0
+    if not ms.size:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "n": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "min_ms": round(float(ms.min()), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def _git(*args):
+    try:
+        out = subprocess.run(
+            ["git", *args], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def environment():
+    env = {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "settings": {k: v for k, v in sorted(os.environ.items()) if k.startswith("CATTLE_")},
+    }
+    # only report frameworks this run actually used
+    for name in ("torch", "tensorflow", "PIL"):
+        module = sys.modules.get(name)
+        if module is not None:
+            env[name] = getattr(module, "__version__", None)
+    return env
+
+
+def write(path, kind, params, results):
+    doc = {"kind": kind, "environment": environment(), "params": params, "results": results}
+    text = json.dumps(doc, indent=2)
+    if path in (None, "-"):
+        print(text)
+    else:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    return doc
+
+
+def compare(base_path, new_path, metric="p50_ms", threshold=0.10):
+    """
+    Rows of (case, base, new, ratio, regressed) for cases present in both files.
+    Throughput (rps) regresses when it drops; latencies when they grow.
+    """
+    with open(base_path) as f:
+        base = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    rows = []
+    for case in base:
+        if case not in new:
+            continue
+        for key in (metric, "rps"):
+            a, b = base[case].get(key), new[case].get(key)
+            if not a or b is None:
+                continue
+            ratio = b / a
+            worse = ratio < 1 - threshold if key == "rps" else ratio > 1 + threshold
+            rows.append((f"{case} {key}", a, b, ratio, worse))
+    return rows
@@ -0,0 +1,124 @@
+# backend/app/bench/synthetic.py
+"""
+Random-weight models with the exact architectures and input shapes the server
+loads, plus synthetic JPEGs, so benchmarks need no real checkpoints or photos.
+Timings are representative; predictions are meaningless.
+"""
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+BREED_FILENAME = "best_enhanced_model.pth"
+DISEASE_FILENAME = "custom_model.h5"
+DISEASE_INPUT_SHAPE = (64, 64, 3)
+
+# (width, height) -> weight; phone photos dominate real uploads
+DEFAULT_SIZE_MIX = "640x480=2,1280x960=2,4032x3024=1"
+
+
+def build_breed_checkpoint(path, seed=0):
+    import torch
+    from app.cattle_model import CLASS_NAMES, EnhancedCattleClassifier
+
+    torch.manual_seed(seed)
+    model = EnhancedCattleClassifier(num_classes=len(CLASS_NAMES))
+    model.eval()
+    torch.save({"model_state_dict": model.state_dict()}, path)
+    return path
+
+
+def _disease_model():
+    # same layers as create_model() in cattle-disease-classification.ipynb
+    from tensorflow.keras import Sequential
+    from tensorflow.keras.layers import (
+        BatchNormalization, Conv2D, Dense, Dropout, Flatten, Input, MaxPooling2D,
+    )
+    from app.static_data import DISEASE_CLASS_NAMES
+
+    model = Sequential([Input(shape=DISEASE_INPUT_SHAPE)])
+    first = True
+    for filters, dropout in ((32, 0.3), (64, 0.3), (128, 0.5)):
+        model.add(Conv2D(filters, (3, 3), activation="relu", padding="valid" if first else "same"))
+        model.add(BatchNormalization())
+        model.add(Conv2D(filters, (3, 3), activation="relu", padding="same"))
+        model.add(BatchNormalization(axis=3))
+        model.add(MaxPooling2D(pool_size=(2, 2), padding="same"))
+        model.add(Dropout(dropout))
+        first = False
+    model.add(Flatten())
+    model.add(Dense(512, activation="relu"))
+    model.add(BatchNormalization())
+    model.add(Dropout(0.5))
+    model.add(Dense(128, activation="relu"))
+    model.add(Dropout(0.25))
+    model.add(Dense(len(DISEASE_CLASS_NAMES), activation="softmax"))
+    return model
+
+
+def build_disease_checkpoint(path, seed=0):
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+    _disease_model().save(path)
+    return path
+
+
+def build_models(out_dir, seed=0, task="both", force=False):
+    """Write synthetic checkpoints under out_dir (usable as CATTLE_MODEL_DIR); existing files are kept."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    if task in ("breed", "both"):
+        path = os.path.join(out_dir, BREED_FILENAME)
+        if force or not os.path.exists(path):
+            written.append(build_breed_checkpoint(path, seed))
+    if task in ("disease", "both"):
+        path = os.path.join(out_dir, DISEASE_FILENAME)
+        if force or not os.path.exists(path):
+            written.append(build_disease_checkpoint(path, seed))
+    return written
+
+
+# -------------------------------------------------
+# Images
+# -------------------------------------------------
+def parse_size_mix(spec):
+    """"640x480=2,4032x3024=1" -> [((640, 480), 2.0), ((4032, 3024), 1.0)]"""
+    mix = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        size, _, weight = part.partition("=")
+        w, h = (int(v) for v in size.lower().split("x"))
+        mix.append(((w, h), float(weight or 1)))
+    if not mix:
+        raise ValueError(f"Empty image size mix {spec!r}")
+    return mix
+
+
+def synthetic_jpeg(size, seed=0, quality=90):
+    """
+    A smooth gradient with mild noise: compresses and decodes like a photo, unlike
+    pure noise (far too large) or a flat colour (far too small).
+    """
+    w, h = size
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0.0, 1.0, h, dtype="float32")[:, None, None]
+    x = np.linspace(0.0, 1.0, w, dtype="float32")[None, :, None]
+    phase = rng.uniform(0, 2 * np.pi, size=3).astype("float32")
+    img = 127.5 + 100.0 * np.sin(3.0 * x + 2.0 * y + phase)
+    img = img + rng.normal(0.0, 8.0, size=(h, w, 3)).astype("float32")
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def image_pool(mix, count, seed=0):
+    """count distinct JPEGs drawn from the size mix; returns [(size, bytes)]."""
+    rng = np.random.default_rng(seed)
+    sizes = [size for size, _ in mix]
+    weights = np.array([weight for _, weight in mix], dtype="float64")
+    picks = rng.choice(len(sizes), size=count, p=weights / weights.sum())
+    return [(sizes[i], synthetic_jpeg(sizes[i], seed=seed + n)) for n, i in enumerate(picks)]
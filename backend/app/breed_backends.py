@@ -0,0 +1,149 @@
+# backend/app/breed_backends.py
+# Selectable CPU inference backends for EnhancedCattleClassifier.
+#
+#   eager        plain eval-mode module (reference)
+#   eager_opt    classifier-head BN folded into the Linears, channels-last input
+#   torchscript  eager_opt traced, frozen (folds backbone conv+BN) and optimize_for_inference
+#   onnx         eager_opt exported to ONNX and run through ONNX Runtime
+#
+# Every backend is a callable taking an NCHW float tensor and returning logits, so it
+# drops into cattle_model.predict_tensors unchanged.
+import copy
+import os
+
+import torch
+import torch.nn as nn
+
+BACKENDS = ("eager", "eager_opt", "torchscript", "onnx")
+INPUT_SIZE = 300
+
+
+def fold_linear_bn(linear, bn):
+    """Return a Linear equivalent to bn(linear(x)) in eval mode."""
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    fused = nn.Linear(linear.in_features, linear.out_features, bias=True)
+    with torch.no_grad():
+        fused.weight.copy_(linear.weight * scale[:, None])
+        bias = linear.bias if linear.bias is not None else torch.zeros_like(bn.running_mean)
+        fused.bias.copy_((bias - bn.running_mean) * scale + bn.bias)
+    return fused
+
+
+def fold_classifier_bn(model):
+    """Fold each Linear -> BatchNorm1d pair of model.classifier in place; Dropout becomes Identity."""
+    layers = list(model.classifier)
+    out = []
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        nxt = layers[i + 1] if i + 1 < len(layers) else None
+        if isinstance(layer, nn.Linear) and isinstance(nxt, nn.BatchNorm1d):
+            out.append(fold_linear_bn(layer, nxt))
+            i += 2
+            continue
+        out.append(nn.Identity() if isinstance(layer, nn.Dropout) else layer)
+        i += 1
+    model.classifier = nn.Sequential(*out)
+    return model
+
+
+class TorchBackend:
+    def __init__(self, module, name, channels_last=False):
+        self.module = module
+        self.name = name
+        self.channels_last = channels_last
+
+    def __call__(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        return self.module(x)
+
+
+class OnnxRuntimeBackend:
+    name = "onnx"
+
+    def __init__(self, onnx_path, intra_op_threads=0):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(onnx_path, opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        logits = self.session.run(None, {self.input_name: x.detach().cpu().numpy()})[0]
+        return torch.from_numpy(logits)
+
+
+def _optimized_eager(model):
+    opt = fold_classifier_bn(copy.deepcopy(model)).eval()
+    return opt.to(memory_format=torch.channels_last)
+
+
+def export_onnx(model, onnx_path):
+    example = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE)
+    torch.onnx.export(
+        model,
+        example,
+        onnx_path,
+        input_names=["image"],
+        output_names=["logits"],
+        dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+    return onnx_path
+
+
+def _stale(path, source_path):
+    if not os.path.exists(path):
+        return True
+    return source_path is not None and os.path.getmtime(path) < os.path.getmtime(source_path)
+
+
+def build_backend(name, model, device, onnx_path=None, source_path=None, threads=0):
+    """
+    Wrap an eval-mode EnhancedCattleClassifier in the named backend. For onnx, the
+    export is cached at onnx_path and redone when source_path (the checkpoint) is newer,
+    and threads (0 = runtime default) sizes its intra-op pool.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown breed backend {name!r}, expected one of {BACKENDS}")
+    if name == "eager":
+        return TorchBackend(model, name)
+    opt = _optimized_eager(model)
+    if name == "eager_opt":
+        return TorchBackend(opt, name, channels_last=True)
+    if name == "torchscript":
+        example = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE, device=device)
+        example = example.contiguous(memory_format=torch.channels_last)
+        with torch.no_grad():
+            traced = torch.jit.trace(opt, example)
+            frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+        return TorchBackend(frozen, name, channels_last=True)
+    if device.type != "cpu":
+        raise ValueError("The onnx breed backend only runs on CPU")
+    onnx_path = onnx_path or "breed_model.onnx"
+    if _stale(onnx_path, source_path):
+        export_onnx(opt, onnx_path)
+    return OnnxRuntimeBackend(onnx_path, intra_op_threads=threads)
+
+
+def parity_check(reference, backend, device, batch_size=4, atol=1e-3, seed=0):
+    """
+    Compare softmax probabilities of backend against the eager reference on random
+    inputs. Returns the max abs difference; raises RuntimeError above atol.
+    """
+    gen = torch.Generator().manual_seed(seed)
+    x = torch.randn(batch_size, 3, INPUT_SIZE, INPUT_SIZE, generator=gen).to(device)
+    with torch.no_grad():
+        ref = torch.softmax(reference(x), dim=1).cpu()
+        got = torch.softmax(backend(x), dim=1).cpu()
+    diff = float((ref - got).abs().max())
+    if diff > atol:
+        raise RuntimeError(
+            f"Breed backend {getattr(backend, 'name', backend)!r} drifts from eager model: "
+            f"max prob diff {diff:.2e} > {atol:.0e}"
+        )
+    return diff
@@ -0,0 +1,344 @@
+# backend/app/cascade.py
+"""
+Confidence-gated breed cascade: a MobileNetV3-Small student with the same
+CLASS_NAMES answers every image first, and only images whose top-1 probability
+falls below a threshold are escalated to EnhancedCattleClassifier. The student
+reads the same 300px tensor, so an escalation costs no second decode.
+
+    cd backend
+    python -m app.cascade distill --images /data/breeds --eval-images /data/breeds-val
+    python -m app.cascade report --images /data/breeds-val
+
+distill trains the student on the full model's soft labels (plus the true labels
+when the images sit in one folder per class) and writes, next to the checkpoint:
+    best_enhanced_model.student.pth               student weights
+    best_enhanced_model.student.pth.report.json   escalation rate vs accuracy per threshold
+report re-measures the curve for an existing student. With CATTLE_BREED_CASCADE=1
+the server only loads a student whose report is newer than both checkpoints.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.core import config, metrics
+from app.core.registry import file_version
+from app.preprocessing import BatchBuffer, BreedPreprocessor
+from app.quantization import _image_files, _read, report_path
+from app.static_data import BREED_CLASS_NAMES
+
+ARCH = "mobilenet_v3_small"
+DEFAULT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98)
+
+
+def student_path(checkpoint_path):
+    return f"{os.path.splitext(checkpoint_path)[0]}.student.pth"
+
+
+# -------------------------------------------------
+# Student model
+# -------------------------------------------------
+def build_student(imagenet_init=False):
+    import torch.nn as nn
+    from torchvision import models
+
+    model = models.mobilenet_v3_small(weights="IMAGENET1K_V1" if imagenet_init else None)
+    model.classifier[-1] = nn.Linear(model.classifier[-1].in_features, len(BREED_CLASS_NAMES))
+    return model
+
+
+def save_student(model, path):
+    import torch
+
+    torch.save(
+        {"arch": ARCH, "class_names": list(BREED_CLASS_NAMES), "model_state_dict": model.state_dict()},
+        path,
+    )
+
+
+def load_student(path, device):
+    import torch
+
+    ckpt = torch.load(path, map_location=device)
+    if ckpt.get("arch") != ARCH or ckpt.get("class_names") != list(BREED_CLASS_NAMES):
+        raise RuntimeError(f"{path} is not a {ARCH} student for {BREED_CLASS_NAMES}")
+    model = build_student()
+    model.load_state_dict(ckpt["model_state_dict"])
+    return model.to(device).eval()
+
+
+# -------------------------------------------------
+# Serving
+# -------------------------------------------------
+class Cascade:
+    """Called like cattle_model.predict_tensors with the full model as teacher."""
+
+    def __init__(self, student, threshold):
+        self.student = student
+        self.threshold = threshold
+
+    def __call__(self, teacher, device, tensors):
+        from app import cattle_model
+
+        results = cattle_model.predict_tensors(self.student, device, tensors, name="breed-student")
+        escalate = [i for i, (_, conf, _) in enumerate(results) if conf < self.threshold]
+        metrics.CASCADE_IMAGES.inc("accepted", amount=len(results) - len(escalate))
+        if escalate:
+            metrics.CASCADE_IMAGES.inc("escalated", amount=len(escalate))
+            full = cattle_model.predict_tensors(teacher, device, [tensors[i] for i in escalate])
+            for i, result in zip(escalate, full):
+                results[i] = result
+        return results
+
+
+def check_report(student, checkpoint):
+    """Return the student's report, or raise RuntimeError if it may not be served."""
+    path = report_path(student)
+    if not os.path.exists(student) or not os.path.exists(path):
+        raise RuntimeError(f"Cascade student {student} has no report; run python -m app.cascade distill")
+    if os.path.getmtime(path) < max(os.path.getmtime(student), os.path.getmtime(checkpoint)):
+        raise RuntimeError(
+            f"Cascade report for {student} is older than its checkpoints; run python -m app.cascade report"
+        )
+    with open(path) as f:
+        return json.load(f)
+
+
+def resolve_threshold(report, threshold=0.0):
+    if threshold:
+        return threshold
+    if report.get("recommended") is None:
+        raise RuntimeError(
+            f"No threshold in the cascade report reaches {report['min_agreement']:.3f} agreement; "
+            "set CATTLE_BREED_CASCADE_THRESHOLD"
+        )
+    return report["recommended"]["threshold"]
+
+
+def cascade_version(checkpoint, threshold=0.0):
+    """Version string for the cache and responses: both checkpoints plus the threshold."""
+    student = student_path(checkpoint)
+    threshold = resolve_threshold(check_report(student, checkpoint), threshold)
+    return f"{file_version(checkpoint)}+{file_version(student)}@{threshold:g}"
+
+
+def load_cascade(checkpoint, device, threshold=0.0):
+    """(Cascade, report) for the student next to checkpoint."""
+    student = student_path(checkpoint)
+    report = check_report(student, checkpoint)
+    return Cascade(load_student(student, device), resolve_threshold(report, threshold)), report
+
+
+# -------------------------------------------------
+# Escalation report
+# -------------------------------------------------
+def escalation_curve(teacher_probs, student_probs, labels=None, thresholds=DEFAULT_THRESHOLDS):
+    """One row per threshold: share of images escalated and what the cascade then gets right."""
+    teacher_top = teacher_probs.argmax(axis=1)
+    student_top = student_probs.argmax(axis=1)
+    student_conf = student_probs.max(axis=1)
+    rows = []
+    for threshold in thresholds:
+        escalated = student_conf < threshold
+        top = np.where(escalated, teacher_top, student_top)
+        row = {
+            "threshold": float(threshold),
+            "escalation_rate": float(escalated.mean()),
+            "agreement": float((top == teacher_top).mean()),
+        }
+        if labels is not None:
+            row["accuracy"] = float((top == labels).mean())
+        rows.append(row)
+    return rows
+
+
+def build_report(teacher_probs, student_probs, labels, timings, thresholds, min_agreement):
+    curve = escalation_curve(teacher_probs, student_probs, labels, thresholds)
+    student_ms, teacher_ms = timings["student_ms_per_image"], timings["teacher_ms_per_image"]
+    for row in curve:
+        # CPU per image relative to always running the full model
+        row["relative_cost"] = (student_ms + row["escalation_rate"] * teacher_ms) / teacher_ms
+    # lowest threshold (fewest escalations) that still agrees closely enough with the full model
+    passing = [row for row in curve if row["agreement"] >= min_agreement]
+    report = {
+        "model": "breed-cascade",
+        "arch": ARCH,
+        "n": int(len(teacher_probs)),
+        "labelled": labels is not None,
+        "student_agreement": float((student_probs.argmax(axis=1) == teacher_probs.argmax(axis=1)).mean()),
+        **timings,
+        "min_agreement": min_agreement,
+        "curve": curve,
+        "recommended": min(passing, key=lambda row: row["escalation_rate"]) if passing else None,
+    }
+    if labels is not None:
+        report["teacher_accuracy"] = float((teacher_probs.argmax(axis=1) == labels).mean())
+        report["student_accuracy"] = float((student_probs.argmax(axis=1) == labels).mean())
+    return report
+
+
+def _folder_labels(paths, root):
+    # one folder per class (ImageFolder layout) gives true labels; anything else doesn't
+    index = {name.lower(): i for i, name in enumerate(BREED_CLASS_NAMES)}
+    labels = []
+    for path in paths:
+        folder = os.path.relpath(path, root).split(os.sep)[0].lower()
+        if folder not in index:
+            return None
+        labels.append(index[folder])
+    return np.array(labels)
+
+
+def _batches(paths, batch_size, pre):
+    import torch
+
+    # one array reused for every batch: callers never keep a batch past its pass
+    buffer = BatchBuffer()
+    for i in range(0, len(paths), batch_size):
+        chunk = paths[i:i + batch_size]
+        out = buffer.take(len(chunk), (3, pre.size, pre.size))
+        yield torch.from_numpy(pre.batch([_read(p) for p in chunk], out=out))
+
+
+def evaluate(teacher, student, paths, batch_size):
+    """Softmax outputs of both models over paths, and their CPU time per image."""
+    import torch
+
+    pre = BreedPreprocessor(size=300)
+    teacher_probs, student_probs = [], []
+    spent = {"teacher": 0.0, "student": 0.0}
+    with torch.no_grad():
+        for x in _batches(paths, batch_size, pre):
+            for name, model, out in (("teacher", teacher, teacher_probs), ("student", student, student_probs)):
+                start = time.perf_counter()
+                out.append(torch.softmax(model(x), dim=1).numpy())
+                spent[name] += time.perf_counter() - start
+    n = max(len(paths), 1)
+    timings = {f"{name}_ms_per_image": 1000.0 * spent[name] / n for name in spent}
+    return np.concatenate(teacher_probs), np.concatenate(student_probs), timings
+
+
+# -------------------------------------------------
+# Distillation
+# -------------------------------------------------
+def distill(teacher, student, paths, labels=None, epochs=10, batch_size=32, lr=1e-3,
+            temperature=4.0, alpha=0.3, seed=0):
+    """
+    Train student to match teacher's temperature-softened outputs; with labels, alpha
+    of the loss is cross-entropy on the true class.
+    """
+    import torch
+    import torch.nn.functional as F
+
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    pre = BreedPreprocessor(size=300)
+    # teacher outputs are computed once; images are decoded again every epoch
+    with torch.no_grad():
+        teacher_logits = torch.cat([teacher(x) for x in _batches(paths, batch_size, pre)])
+    targets = torch.from_numpy(labels) if labels is not None else None
+
+    steps = epochs * max(1, len(paths) // batch_size)
+    opt = torch.optim.AdamW(student.parameters(), lr=lr, weight_decay=1e-4)
+    sched = torch.optim.lr_scheduler.OneCycleLR(opt, max_lr=lr, total_steps=steps)
+    buffer = BatchBuffer()
+    for epoch in range(epochs):
+        student.train()
+        order = rng.permutation(len(paths))
+        total, seen = 0.0, 0
+        for i in range(0, len(order) - batch_size + 1, batch_size):
+            idx = torch.from_numpy(order[i:i + batch_size])
+            out = buffer.take(len(idx), (3, pre.size, pre.size))
+            x = torch.from_numpy(pre.batch([_read(paths[j]) for j in idx.tolist()], out=out))
+            # horizontal flips don't change the breed, so the teacher's labels still hold
+            flip = torch.from_numpy(rng.random(len(idx)) < 0.5)
+            x[flip] = x[flip].flip(-1)
+            logits = student(x)
+            t = temperature
+            loss = F.kl_div(
+                F.log_softmax(logits / t, dim=1), F.softmax(teacher_logits[idx] / t, dim=1),
+                reduction="batchmean",
+            ) * t * t
+            if targets is not None:
+                loss = (1 - alpha) * loss + alpha * F.cross_entropy(logits, targets[idx])
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            sched.step()
+            total += float(loss) * len(idx)
+            seen += len(idx)
+        print(f"epoch {epoch + 1}/{epochs}: loss {total / max(seen, 1):.4f}", file=sys.stderr)
+    return student.eval()
+
+
+def _write_report(student, report):
+    with open(report_path(student), "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def main(argv=None):
+    from app import cattle_model
+    from app.core.model_loader import BREED_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Build and evaluate the breed cascade's student model")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help in (("distill", "train the student from the full model"),
+                       ("report", "measure escalation rate vs accuracy for an existing student")):
+        cmd = sub.add_parser(name, help=help)
+        cmd.add_argument("--images", required=True, help="folder of images (one folder per class adds true labels)")
+        cmd.add_argument("--checkpoint", default=BREED_MODEL_PATH, help="full breed model")
+        cmd.add_argument("--student", default=None, help="default: <checkpoint>.student.pth")
+        cmd.add_argument("--limit", type=int, default=0, help="max images (0 = all)")
+        cmd.add_argument("--batch-size", type=int, default=32)
+        cmd.add_argument("--thresholds", default=",".join(f"{t:g}" for t in DEFAULT_THRESHOLDS))
+        cmd.add_argument("--min-agreement", type=float, default=config.CASCADE_MIN_AGREEMENT)
+        if name == "distill":
+            cmd.add_argument("--eval-images", default=None, help="held-out folder for the report (default: --images)")
+            cmd.add_argument("--epochs", type=int, default=10)
+            cmd.add_argument("--lr", type=float, default=1e-3)
+            cmd.add_argument("--temperature", type=float, default=4.0)
+            cmd.add_argument("--alpha", type=float, default=0.3, help="weight of the true-label loss")
+            cmd.add_argument("--init", choices=("imagenet", "random"), default="imagenet",
+                             help="student starting weights (imagenet downloads torchvision's)")
+            cmd.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    student_file = args.student or student_path(args.checkpoint)
+    thresholds = [float(t) for t in args.thresholds.split(",") if t.strip()]
+    teacher, _, _ = cattle_model.load_model(args.checkpoint)
+    teacher = teacher.cpu()
+
+    if args.command == "distill":
+        paths = _image_files(args.images, args.limit)
+        if len(paths) < args.batch_size:
+            parser.error(f"need at least --batch-size ({args.batch_size}) images under {args.images}")
+        student = distill(
+            teacher, build_student(imagenet_init=args.init == "imagenet"), paths,
+            _folder_labels(paths, args.images), args.epochs, args.batch_size, args.lr,
+            args.temperature, args.alpha, args.seed,
+        )
+        save_student(student, student_file)
+        eval_root = args.eval_images or args.images
+    else:
+        student = load_student(student_file, "cpu")
+        eval_root = args.images
+
+    eval_paths = _image_files(eval_root, args.limit)
+    if not eval_paths:
+        parser.error(f"no images found under {eval_root}")
+    teacher_probs, student_probs, timings = evaluate(teacher, student, eval_paths, args.batch_size)
+    report = build_report(
+        teacher_probs, student_probs, _folder_labels(eval_paths, eval_root), timings,
+        thresholds, args.min_agreement,
+    )
+    report.update({"checkpoint": os.path.basename(args.checkpoint), "student": os.path.basename(student_file)})
+    _write_report(student_file, report)
+    print(f"{student_file}\n{json.dumps(report, indent=2)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
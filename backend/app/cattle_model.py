@@ -4,7 +4,11 @@ from torchvision import models, transforms
 from PIL import Image
 import io
 
-CLASS_NAMES = ["ayshire", "brown_swiss", "holstein", "jersey", "RedDane"]
+from .core import metrics, profiling
+from .preprocessing import BreedPreprocessor, IMAGENET_MEAN, IMAGENET_STD
+from .static_data import BREED_CLASS_NAMES
+
+CLASS_NAMES = BREED_CLASS_NAMES
 
 class EnhancedCattleClassifier(nn.Module):
     def __init__(self, num_classes):
@@ -34,6 +38,13 @@ class EnhancedCattleClassifier(nn.Module):
         return x
 
 def get_transform():
+    # fused draft-decode/resize/crop/normalize pipeline. It approximates
+    # get_reference_transform() without matching it bit for bit: JPEG draft decoding
+    # and resampling from the crop box move pixel values slightly, so use the
+    # reference transform where exact parity with training-time preprocessing matters
+    return BreedPreprocessor(size=300, mean=IMAGENET_MEAN, std=IMAGENET_STD)
+
+def get_reference_transform():
     return transforms.Compose([
         transforms.Resize(300),
         transforms.CenterCrop(300),
@@ -44,27 +55,73 @@ def get_transform():
         ),
     ])
 
-def load_model(checkpoint_path):
+def load_model(checkpoint_path, mmap=False):
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    ckpt = torch.load(checkpoint_path, map_location=device)
-    if isinstance(ckpt, dict) and "model_state_dict" in ckpt:
-        state_dict = ckpt["model_state_dict"]
+    if checkpoint_path.endswith(".safetensors"):
+        from .weights import load_safetensors
+        state_dict = load_safetensors(checkpoint_path)
+        mmap = True
     else:
-        state_dict = ckpt
+        ckpt = torch.load(checkpoint_path, map_location=device, mmap=mmap)
+        if isinstance(ckpt, dict) and "model_state_dict" in ckpt:
+            state_dict = ckpt["model_state_dict"]
+        else:
+            state_dict = ckpt
     model = EnhancedCattleClassifier(num_classes=len(CLASS_NAMES))
-    model.load_state_dict(state_dict)
+    # assign keeps the mapped tensors as the parameters instead of copying them in
+    model.load_state_dict(state_dict, assign=mmap)
     model.to(device)
     model.eval()
     transform = get_transform()
     return model, device, transform
 
+def preprocess_bytes(transform, image_bytes):
+    with metrics.stage("breed", "decode"):
+        if hasattr(transform, "from_bytes"):
+            return torch.from_numpy(transform.from_bytes(image_bytes))
+        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        return transform(img)
+
+def predict_tensors(model, device, tensors, name="breed"):
+    # tensors: list of preprocessed (C, H, W) images, or one (N, C, H, W) tensor, run as
+    # one batch; name labels the stage metrics (the cascade's student reports as
+    # "breed-student")
+    # torch.profiler trace only when the current request is being profiled
+    with profiling.torch_profile(f"{name}-forward"):
+        with torch.no_grad(), metrics.stage(name, "forward"):
+            x = _batch(tensors).to(device)
+            logits = model(x)
+        with torch.no_grad(), metrics.stage(name, "softmax"):
+            probs = torch.softmax(logits, dim=1)
+            confs, idxs = torch.max(probs, dim=1)
+    return _results(name, confs, idxs, probs)
+
+def _batch(tensors):
+    return tensors if torch.is_tensor(tensors) else torch.stack(tensors)
+
+def _results(name, confs, idxs, probs):
+    with metrics.stage(name, "postprocess"):
+        results = []
+        for conf, idx, p in zip(confs.tolist(), idxs.tolist(), probs.cpu().tolist()):
+            label = CLASS_NAMES[idx] if idx < len(CLASS_NAMES) else str(idx)
+            results.append((label, float(conf), p))
+    return results
+
+def embed_tensors(model, device, tensors):
+    # model: an eager EnhancedCattleClassifier. The pooled backbone features (1536-d
+    # for B3) are returned L2-normalised as a float32 (N, D) array, together with
+    # the breed predictions the classifier head makes from them in the same pass
+    with profiling.torch_profile("breed-embed"):
+        with torch.no_grad(), metrics.stage("breed", "embed"):
+            x = _batch(tensors).to(device)
+            features = model.backbone(x)
+            logits = model.classifier(features)
+            embeddings = torch.nn.functional.normalize(features, dim=1).float().cpu().numpy()
+        with torch.no_grad(), metrics.stage("breed", "softmax"):
+            probs = torch.softmax(logits, dim=1)
+            confs, idxs = torch.max(probs, dim=1)
+    return embeddings, _results("breed", confs, idxs, probs)
+
 def predict_bytes(model, device, transform, image_bytes):
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    x = transform(img).unsqueeze(0).to(device)
-    with torch.no_grad():
-        logits = model(x)
-        probs = torch.softmax(logits, dim=1)[0]
-    conf, idx = torch.max(probs, dim=0)
-    idx = idx.item()
-    label = CLASS_NAMES[idx] if idx < len(CLASS_NAMES) else str(idx)
-    return label, float(conf.item()), probs.cpu().tolist()
+    x = preprocess_bytes(transform, image_bytes)
+    return predict_tensors(model, device, [x])[0]
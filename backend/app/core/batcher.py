@@ -0,0 +1,143 @@
+# backend/app/core/batcher.py
+import asyncio
+import itertools
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core import admission, metrics
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into a single call of a blocking batch function.
+
+    batch_fn takes a list of items and returns a list of results in the same order.
+    A batch is flushed when it reaches max_batch_size or when the oldest item has
+    waited max_wait_ms, whichever comes first. If an executor is given, batches run
+    there (e.g. a dedicated thread that owns the model) instead of the shared threadpool.
+    name labels the queue-wait / batch-size metrics.
+
+    Items carry a priority (lower first, default: the current request's admission
+    lane); within a priority they are served in arrival order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=10.0, executor=None, name="model"):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.executor = executor
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = None
+        self._worker = None
+        self._seq = itertools.count()
+        self._queued = [0] * len(admission.LANES)
+        self.in_batch = 0
+        # smoothed wall time of one batch call, for admission's queue-wait estimate
+        self.batch_seconds = 0.0
+
+    def _ensure_worker(self):
+        # queue and worker are bound to the running loop, so create them lazily
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.PriorityQueue()
+            self._queued = [0] * len(admission.LANES)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def queued(self, priority):
+        """Items waiting that would be served before a new item of this priority."""
+        return sum(self._queued[:priority + 1])
+
+    async def submit(self, item, priority=None):
+        self._ensure_worker()
+        if priority is None:
+            priority = admission.current_priority()
+        fut = asyncio.get_running_loop().create_future()
+        # [enqueued, batch started, batch finished], filled in by the worker
+        meta = [time.perf_counter(), None, None]
+        self._queued[priority] += 1
+        await self._queue.put((priority, next(self._seq), item, fut, meta))
+        try:
+            return await fut
+        finally:
+            if meta[1] is not None:
+                metrics.add_timing(f"{self.name}-queue", meta[1] - meta[0])
+                if meta[2] is not None:
+                    metrics.add_timing(f"{self.name}-batch", meta[2] - meta[1])
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _call(self, items):
+        if self.executor is None:
+            return await run_in_threadpool(self.batch_fn, items)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.batch_fn, items)
+
+    async def _run(self):
+        # the worker is created inside the first request's context; don't keep timing into it
+        metrics.detach()
+        while True:
+            batch = await self._collect()
+            for priority, *_ in batch:
+                self._queued[priority] -= 1
+            # drop callers that went away while queued (client disconnects)
+            batch = [entry[2:] for entry in batch if not entry[3].done()]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            for _, _, meta in batch:
+                meta[1] = start
+                metrics.QUEUE_WAIT_SECONDS.observe(start - meta[0], self.name)
+            metrics.BATCH_SIZE.observe(len(batch), self.name)
+            self.in_batch = len(batch)
+            try:
+                results = await self._call([item for item, _, _ in batch])
+            except Exception as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            finally:
+                end = time.perf_counter()
+                self.in_batch = 0
+                self.batch_seconds = (
+                    end - start if not self.batch_seconds else 0.8 * self.batch_seconds + 0.2 * (end - start)
+                )
+                metrics.BATCH_SECONDS.observe(end - start, self.name)
+                for _, _, meta in batch:
+                    meta[2] = end
+            if len(results) != len(batch):
+                # a short (or long) answer can't be matched to callers: fail them all
+                # rather than leave some waiting forever
+                error = RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} items")
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(error)
+                continue
+            for (_, fut, _), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
@@ -0,0 +1,160 @@
+# backend/app/core/cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    LRU cache of (label, confidence, probs) results keyed by a hash of the raw
+    upload bytes plus the model version, with an optional SQLite tier so warm
+    results survive restarts.
+
+    max_entries <= 0 disables the cache; ttl_s <= 0 means entries never expire.
+    The SQLite tier holds at most disk_max_entries rows (default: 10 * max_entries):
+    once a write takes it over, expired rows and then the oldest written are
+    deleted down to 90% of that, so trimming runs once per many writes.
+    """
+
+    def __init__(self, max_entries=10000, ttl_s=0.0, disk_path=None, disk_max_entries=None):
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s)
+        self.disk_max_entries = max(1, int(disk_max_entries or 10 * self.max_entries))
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_rows = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if disk_path and self.enabled:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS predictions_created ON predictions (created)")
+            self._db.commit()
+            self._disk_rows = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            if self._disk_rows > self.disk_max_entries:
+                self._trim_disk()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(image_bytes, model_version):
+        digest = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+        return f"{model_version}:{digest}"
+
+    def _expired(self, created):
+        return self.ttl_s > 0 and time.time() - created > self.ttl_s
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._mem.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM predictions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    value = tuple(json.loads(row[0]))
+                    self._remember(key, value, row[1])
+                    self.stats["disk_hits"] += 1
+                    return value
+            self.stats["misses"] += 1
+            return None
+
+    def lookup(self, image_bytes, model_version):
+        """Hash the upload and return (key, cached value or None)."""
+        key = self.key(image_bytes, model_version)
+        return key, self.get(key)
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        if not self.enabled or not items:
+            return
+        created = time.time()
+        items = [(key, tuple(value)) for key, value in items]
+        with self._lock:
+            for key, value in items:
+                self._remember(key, value, created)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predictions (key, value, created) VALUES (?, ?, ?)",
+                    [(key, json.dumps(value), created) for key, value in items],
+                )
+                self._db.commit()
+                # an upper bound: replaced keys and other workers' deletes aren't counted
+                self._disk_rows += len(items)
+                if self._disk_rows > self.disk_max_entries:
+                    self._trim_disk()
+
+    def _remember(self, key, value, created):
+        self._mem[key] = (created, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _trim_disk(self):
+        # caller holds the lock (or is __init__)
+        if self.ttl_s > 0:
+            self._db.execute("DELETE FROM predictions WHERE created < ?", (time.time() - self.ttl_s,))
+        rows = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        excess = rows - int(0.9 * self.disk_max_entries) if rows > self.disk_max_entries else 0
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY created LIMIT ?)",
+                (excess,),
+            )
+            self.stats["disk_evictions"] += excess
+        self._db.commit()
+        self._disk_rows = rows - max(excess, 0)
+
+    def purge_expired(self):
+        if self.ttl_s <= 0:
+            return
+        cutoff = time.time() - self.ttl_s
+        with self._lock:
+            for key in [k for k, (created, _) in self._mem.items() if created < cutoff]:
+                del self._mem[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions WHERE created < ?", (cutoff,))
+                self._db.commit()
+                self._disk_rows = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+                self._disk_rows = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._mem),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "disk": self._db is not None,
+                "disk_max_entries": self.disk_max_entries,
+                **self.stats,
+            }
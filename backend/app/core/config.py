@@ -0,0 +1,264 @@
+# backend/app/core/config.py
+# Runtime knobs for the inference stack, read once from the environment so
+# deployments can tune them without code changes.
+import os
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int_list(name, default):
+    value = os.getenv(name)
+    if value in (None, ""):
+        return list(default)
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+# -------------------------------------------------
+# Serving role: all | breed | disease
+# -------------------------------------------------
+# breed serves /predict_breed and /predict_crossbreed; only the frameworks a role
+# needs are imported, so breed and disease pods can be scaled independently
+SERVING_ROLE = os.getenv("CATTLE_SERVING_ROLE", "all")
+if SERVING_ROLE not in ("all", "breed", "disease"):
+    raise ValueError(f"CATTLE_SERVING_ROLE must be all, breed or disease, got {SERVING_ROLE!r}")
+
+
+def serves(model):
+    return SERVING_ROLE in ("all", model)
+
+
+# -------------------------------------------------
+# Model checkpoints
+# -------------------------------------------------
+# directory holding best_enhanced_model.pth and custom_model.h5 (and any converted or
+# quantised artifacts next to them); `python -m app.bench models` writes synthetic ones
+MODEL_DIR = os.getenv(
+    "CATTLE_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "models"),
+)
+
+# -------------------------------------------------
+# Breed micro-batching
+# -------------------------------------------------
+BREED_MAX_BATCH_SIZE = _env_int("CATTLE_BREED_MAX_BATCH_SIZE", 16)
+BREED_MAX_WAIT_MS = _env_float("CATTLE_BREED_MAX_WAIT_MS", 10.0)
+
+# -------------------------------------------------
+# Breed inference backend: eager | eager_opt | torchscript | onnx (see app/breed_backends.py)
+# -------------------------------------------------
+BREED_BACKEND = os.getenv("CATTLE_BREED_BACKEND", "eager")
+# max allowed softmax drift vs. the eager model before the backend is rejected at load
+BREED_PARITY_ATOL = _env_float("CATTLE_BREED_PARITY_ATOL", 1e-3)
+
+# -------------------------------------------------
+# INT8 serving (artifacts built by `python -m app.quantization`)
+# -------------------------------------------------
+BREED_QUANTIZATION = os.getenv("CATTLE_BREED_QUANTIZATION", "none")  # none | dynamic | static
+DISEASE_QUANTIZATION = os.getenv("CATTLE_DISEASE_QUANTIZATION", "none")  # none | tflite_int8
+# minimum top-1 agreement with the float model for a quantised artifact to be served
+QUANT_MIN_AGREEMENT = _env_float("CATTLE_QUANT_MIN_AGREEMENT", 0.98)
+
+# -------------------------------------------------
+# Breed cascade (student built by `python -m app.cascade distill`)
+# -------------------------------------------------
+# a small student answers first; only low-confidence images run the full breed model
+BREED_CASCADE = _env_bool("CATTLE_BREED_CASCADE", False)
+# escalate below this student top-1 probability; 0 = the threshold its report recommends
+BREED_CASCADE_THRESHOLD = _env_float("CATTLE_BREED_CASCADE_THRESHOLD", 0.0)
+# top-1 agreement with the full model a threshold needs to be recommended
+CASCADE_MIN_AGREEMENT = _env_float("CATTLE_CASCADE_MIN_AGREEMENT", 0.98)
+
+# -------------------------------------------------
+# Weight loading: native (.pth / .h5) | mmap (files from `python -m app.weights convert`)
+# -------------------------------------------------
+WEIGHTS_FORMAT = os.getenv("CATTLE_WEIGHTS_FORMAT", "native")
+
+# -------------------------------------------------
+# Disease executor
+# -------------------------------------------------
+DISEASE_MAX_BATCH_SIZE = _env_int("CATTLE_DISEASE_MAX_BATCH_SIZE", 16)
+DISEASE_MAX_WAIT_MS = _env_float("CATTLE_DISEASE_MAX_WAIT_MS", 10.0)
+
+# -------------------------------------------------
+# Admission control (see app/core/admission.py)
+# -------------------------------------------------
+ADMISSION_ENABLED = _env_bool("CATTLE_ADMISSION_ENABLED", True)
+# requests in flight per model and lane; more are refused with 429
+ADMISSION_MAX_PENDING_INTERACTIVE = _env_int("CATTLE_ADMISSION_MAX_PENDING_INTERACTIVE", 64)
+ADMISSION_MAX_PENDING_BULK = _env_int("CATTLE_ADMISSION_MAX_PENDING_BULK", 4)
+# refuse with 503 when the estimated queue wait exceeds the lane's deadline
+ADMISSION_DEADLINE_MS_INTERACTIVE = _env_float("CATTLE_ADMISSION_DEADLINE_MS_INTERACTIVE", 2000.0)
+ADMISSION_DEADLINE_MS_BULK = _env_float("CATTLE_ADMISSION_DEADLINE_MS_BULK", 60000.0)
+# worker threads for run_in_threadpool (decode, cache, uploads); anyio's default is 40
+THREADPOOL_SIZE = _env_int("CATTLE_THREADPOOL_SIZE", 40)
+
+# -------------------------------------------------
+# CPU budget (see app/core/cpu.py)
+# -------------------------------------------------
+# size the torch / TF pools to a share of the cores instead of all of them each
+CPU_PARTITION = _env_bool("CATTLE_CPU_PARTITION", True)
+# cores per share; 0 = split the usable cores automatically for the serving role
+CPU_BREED_THREADS = _env_int("CATTLE_CPU_BREED_THREADS", 0)
+CPU_DISEASE_THREADS = _env_int("CATTLE_CPU_DISEASE_THREADS", 0)
+CPU_DECODE_THREADS = _env_int("CATTLE_CPU_DECODE_THREADS", 0)
+# shared by the job worker processes the API starts (CATTLE_JOBS_WORKERS)
+CPU_JOBS_THREADS = _env_int("CATTLE_CPU_JOBS_THREADS", 0)
+# inter-op pool of both runtimes; each model runs one batch at a time, so 1 is enough
+CPU_INTEROP_THREADS = _env_int("CATTLE_CPU_INTEROP_THREADS", 1)
+# pin each model's thread to its cores and request threads to the decode cores (Linux)
+CPU_PIN = _env_bool("CATTLE_CPU_PIN", False)
+
+# -------------------------------------------------
+# Model registry (see app/core/registry.py)
+# -------------------------------------------------
+# loaded versions kept per task, active and shadow included
+MODEL_MAX_VERSIONS = _env_int("CATTLE_MODEL_MAX_VERSIONS", 2)
+# /models endpoints for loading, activating and shadowing versions at runtime
+MODEL_ADMIN_ENABLED = _env_bool("CATTLE_MODEL_ADMIN", False)
+# the /models endpoints require X-Cattle-Admin-Token with this value; unset, they answer 404
+MODEL_ADMIN_TOKEN = os.getenv("CATTLE_MODEL_ADMIN_TOKEN", "")
+# mirrored requests allowed in flight per task; more are dropped, never queued
+SHADOW_MAX_PENDING = _env_int("CATTLE_SHADOW_MAX_PENDING", 4)
+
+# -------------------------------------------------
+# Metrics (/metrics, Server-Timing)
+# -------------------------------------------------
+METRICS_ENABLED = _env_bool("CATTLE_METRICS_ENABLED", True)
+# per-stage Server-Timing header on every response (visible to clients)
+SERVER_TIMING = _env_bool("CATTLE_SERVER_TIMING", False)
+
+# -------------------------------------------------
+# On-demand profiling (see app/core/profiling.py)
+# -------------------------------------------------
+# the X-Cattle-Profile header and /debug endpoints must carry this value; profiling
+# is only available while it is set (then armed at runtime, no redeploy needed)
+PROFILE_TOKEN = os.getenv("CATTLE_PROFILE_TOKEN", "")
+# CATTLE_PROFILING=0 turns profiling off even with a token
+PROFILING_ENABLED = _env_bool("CATTLE_PROFILING", True) and bool(PROFILE_TOKEN)
+PROFILE_DIR = os.getenv("CATTLE_PROFILE_DIR", "/tmp/cattle-profiles")
+# fraction of requests profiled at startup; changed at runtime via POST /debug/profiling
+PROFILE_SAMPLE_RATE = _env_float("CATTLE_PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_MAX_TRACES = _env_int("CATTLE_PROFILE_MAX_TRACES", 50)  # oldest are deleted
+PROFILE_INTERVAL_MS = _env_float("CATTLE_PROFILE_INTERVAL_MS", 5.0)  # Python stack sampling period
+
+# -------------------------------------------------
+# Bulk /batch endpoints
+# -------------------------------------------------
+# images read and submitted per step; bounds memory for arbitrarily large uploads
+BATCH_CHUNK_SIZE = _env_int("CATTLE_BATCH_CHUNK_SIZE", max(BREED_MAX_BATCH_SIZE, DISEASE_MAX_BATCH_SIZE))
+
+# -------------------------------------------------
+# Startup warm-up
+# -------------------------------------------------
+def _powers_of_two(limit):
+    sizes, n = [], 1
+    while n < limit:
+        sizes.append(n)
+        n *= 2
+    sizes.append(limit)
+    return sizes
+
+
+WARMUP_ENABLED = _env_bool("CATTLE_WARMUP_ENABLED", True)
+WARMUP_PASSES = _env_int("CATTLE_WARMUP_PASSES", 2)
+# batch sizes the batchers can produce; default 1, 2, 4, ... up to the max batch size
+BREED_WARMUP_BATCH_SIZES = _env_int_list(
+    "CATTLE_BREED_WARMUP_BATCH_SIZES", _powers_of_two(BREED_MAX_BATCH_SIZE)
+)
+DISEASE_WARMUP_BATCH_SIZES = _env_int_list(
+    "CATTLE_DISEASE_WARMUP_BATCH_SIZES", _powers_of_two(DISEASE_MAX_BATCH_SIZE)
+)
+
+# -------------------------------------------------
+# Prediction cache
+# -------------------------------------------------
+CACHE_MAX_ENTRIES = _env_int("CATTLE_CACHE_MAX_ENTRIES", 10000)  # 0 disables the cache
+CACHE_TTL_S = _env_float("CATTLE_CACHE_TTL_S", 0.0)  # 0 = no expiry
+CACHE_DISK_PATH = os.getenv("CATTLE_CACHE_DISK_PATH", "")  # e.g. /var/cache/cattle/predictions.sqlite
+CACHE_DISK_MAX_ENTRIES = _env_int("CATTLE_CACHE_DISK_MAX_ENTRIES", 0)  # 0 = 10 * CATTLE_CACHE_MAX_ENTRIES
+
+# -------------------------------------------------
+# Async scan jobs (see app/jobs.py)
+# -------------------------------------------------
+JOBS_DIR = os.getenv(
+    "CATTLE_JOBS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "jobs"),
+)
+JOBS_DB_PATH = os.getenv("CATTLE_JOBS_DB_PATH", os.path.join(JOBS_DIR, "jobs.sqlite"))
+# worker processes started with the server; 0 = run `python -m app.jobs worker` separately
+JOBS_WORKERS = _env_int("CATTLE_JOBS_WORKERS", 0)
+JOBS_BATCH_SIZE = _env_int("CATTLE_JOBS_BATCH_SIZE", 32)
+# a leased batch not finished within this time is handed to another worker
+JOBS_LEASE_S = _env_float("CATTLE_JOBS_LEASE_S", 600.0)
+# images whose batch keeps crashing workers are failed after this many leases
+JOBS_MAX_ATTEMPTS = _env_int("CATTLE_JOBS_MAX_ATTEMPTS", 3)
+# manifests of server-side paths are accepted only when set, and only for paths under it
+JOBS_MANIFEST_ROOT = os.getenv("CATTLE_JOBS_MANIFEST_ROOT", "")
+
+# -------------------------------------------------
+# Embeddings and similarity index (see app/embeddings.py)
+# -------------------------------------------------
+# keep the eager breed model next to a torchscript / onnx / int8 backend for its
+# backbone features; off saves its memory and disables /embeddings
+EMBEDDINGS_ENABLED = _env_bool("CATTLE_EMBEDDINGS", True)
+EMBED_INDEX_DIR = os.getenv(
+    "CATTLE_EMBED_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "embeddings"),
+)
+EMBED_INDEX_DTYPE = os.getenv("CATTLE_EMBED_INDEX_DTYPE", "float16")  # float16 | int8 (half the size)
+# centroid groups scanned per query once the index is built
+EMBED_NPROBE = _env_int("CATTLE_EMBED_NPROBE", 16)
+# cosine similarity at or above which two photos count as the same shot
+DUPLICATE_THRESHOLD = _env_float("CATTLE_DUPLICATE_THRESHOLD", 0.97)
+# enrolment builds the index in the background from this many rows (and rebuilds
+# once over a quarter are unindexed); 0 leaves building to POST /embeddings/index/build
+EMBED_AUTO_BUILD_ROWS = _env_int("CATTLE_EMBED_AUTO_BUILD_ROWS", 20000)
+# required in X-Cattle-Index-Token to enrol into or build the index; unset, both are off
+EMBED_INDEX_TOKEN = os.getenv("CATTLE_EMBED_INDEX_TOKEN", "")
+
+# -------------------------------------------------
+# Video ingestion (see app/video.py)
+# -------------------------------------------------
+# frames per second of video looked at; 0 = every frame
+VIDEO_SAMPLE_FPS = _env_float("CATTLE_VIDEO_SAMPLE_FPS", 2.0)
+# mean absolute difference (0..1) of 32x32 grey thumbnails below which a frame is
+# treated as unchanged and skipped
+VIDEO_CHANGE_THRESHOLD = _env_float("CATTLE_VIDEO_CHANGE_THRESHOLD", 0.03)
+# analyse a frame at least this often, changed or not
+VIDEO_MAX_GAP_S = _env_float("CATTLE_VIDEO_MAX_GAP_S", 10.0)
+# predictions are aggregated per this much video time
+VIDEO_SEGMENT_S = _env_float("CATTLE_VIDEO_SEGMENT_S", 10.0)
+# kept frames waiting for the models; live sources drop the oldest beyond this
+VIDEO_QUEUE_SIZE = _env_int("CATTLE_VIDEO_QUEUE_SIZE", 32)
+# MJPEG files carry no timestamps: frame i is at i / this
+VIDEO_MJPEG_FPS = _env_float("CATTLE_VIDEO_MJPEG_FPS", 25.0)
+# comma-separated prefixes of the camera URLs and server-side paths /video/stream may
+# open (e.g. "rtsp://10.1.,/data/cameras/"); empty disables it
+VIDEO_SOURCES = [p.strip() for p in os.getenv("CATTLE_VIDEO_SOURCES", "").split(",") if p.strip()]
+
+# -------------------------------------------------
+# Crossbreed table
+# -------------------------------------------------
+_REPO_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+CROSS_INFO_PATH = os.getenv(
+    "CATTLE_CROSS_INFO_PATH", os.path.join(_REPO_DIR, "breed_cross_info.json")
+)
+# /predict_crossbreed/herd lists every sire x dam pair; larger herds belong in /mating
+HERD_MAX_PAIRS = _env_int("CATTLE_HERD_MAX_PAIRS", 10000)
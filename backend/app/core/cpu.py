@@ -0,0 +1,157 @@
+# backend/app/core/cpu.py
+"""
+Core budget for the model runtimes sharing this process.
+
+Left alone, PyTorch and TensorFlow each size their intra-op and inter-op pools to
+every core, and the request threadpool decodes on top of both; under mixed
+breed and disease traffic the machine is oversubscribed several times over.
+plan() splits the usable cores between the models this role serves and the
+decode threadpool, and configure_torch / configure_tf size each runtime to its
+share before it starts. With CATTLE_CPU_PIN, each model's executor thread (and
+the pools it spawns) is pinned to its own cores and request threads to the rest.
+Job worker processes started by the API (CATTLE_JOBS_WORKERS) get a "jobs" share
+of their own, split between them (see app/jobs.py).
+
+    CATTLE_CPU_BREED_THREADS=6 CATTLE_CPU_DISEASE_THREADS=2 python -m app.bench load ...
+"""
+import logging
+import os
+
+from app.core import config
+
+logger = logging.getLogger("uvicorn.error")
+
+SHARES = ("breed", "disease", "decode", "jobs")
+
+_plan = None
+_applied = {}
+
+
+def available_cores():
+    """Cores this process may run on (respects taskset / cgroup cpusets)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan(role=None, cores=None):
+    """
+    {"breed": [core ids], "disease": [...], "decode": [...], "jobs": [...]} for the
+    serving role. Explicit CATTLE_CPU_*_THREADS win; the rest is split automatically:
+    a quarter of the cores for job workers when this process starts any, a quarter
+    of the remainder for decoding, a third of what is left for the (much smaller)
+    disease model, everything else for breed. Shares only overlap when there are
+    fewer cores than shares.
+    """
+    role = role or config.SERVING_ROLE
+    cores = list(cores if cores is not None else available_cores())
+    n = len(cores)
+    jobs = config.CPU_JOBS_THREADS or (max(1, n // 4) if config.JOBS_WORKERS else 0)
+    rest = max(1, n - jobs)
+    decode = config.CPU_DECODE_THREADS or rest // 4
+    breed = disease = 0
+    if role in ("all", "disease"):
+        disease = config.CPU_DISEASE_THREADS or (
+            max(1, (rest - decode) // 3) if role == "all" else max(1, rest - decode)
+        )
+    if role in ("all", "breed"):
+        breed = config.CPU_BREED_THREADS or max(1, rest - decode - disease)
+
+    split, start = {}, 0
+    for name, count in zip(SHARES, (breed, disease, decode, jobs)):
+        split[name] = [cores[(start + i) % n] for i in range(count)]
+        start += count
+    return split
+
+
+def current_plan():
+    global _plan
+    if _plan is None:
+        _plan = plan()
+    return _plan
+
+
+def slices(cores, n):
+    """n near-equal runs of cores, one per worker process; they overlap when n > len(cores)."""
+    cores = list(cores)
+    if not cores:
+        return [[] for _ in range(n)]
+    if n >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(n)]
+    bounds = [len(cores) * i // n for i in range(n + 1)]
+    return [cores[bounds[i]:bounds[i + 1]] for i in range(n)]
+
+
+def assign(cores):
+    """
+    Plan of a job worker process: its models and decoding take turns on one thread,
+    so every share is the worker's own slice. Pins the process with CATTLE_CPU_PIN.
+    """
+    global _plan
+    _plan = {share: list(cores) for share in SHARES}
+    pin("jobs")
+
+
+def threads(share):
+    """Intra-op threads for a share; None when partitioning is off."""
+    if not config.CPU_PARTITION:
+        return None
+    return max(1, len(current_plan()[share]))
+
+
+def configure_torch(intra=None):
+    """Size torch's pools once. Call after importing torch, before the first forward pass."""
+    import torch
+
+    intra = intra or threads("breed")
+    if intra is None or "torch" in _applied:
+        return
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(config.CPU_INTEROP_THREADS)
+    except RuntimeError:
+        # only settable before any inter-op work; keep whatever is already running
+        pass
+    _applied["torch"] = {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()}
+
+
+def configure_tf(intra=None):
+    """Size TF's pools once. Call after importing tensorflow, before loading a model."""
+    import tensorflow as tf
+
+    intra = intra or threads("disease")
+    if intra is None or "tensorflow" in _applied:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+        tf.config.threading.set_inter_op_parallelism_threads(config.CPU_INTEROP_THREADS)
+    except RuntimeError:
+        # the runtime is already initialised (e.g. a model was loaded earlier)
+        logger.warning("TensorFlow was already initialised; its thread pools keep their size")
+    _applied["tensorflow"] = {
+        "intra_op": tf.config.threading.get_intra_op_parallelism_threads(),
+        "inter_op": tf.config.threading.get_inter_op_parallelism_threads(),
+    }
+
+
+def pin(share):
+    """
+    Pin the calling thread to the share's cores (Linux: affinity is per thread, and
+    threads it starts afterwards inherit it). Used as the executor thread initializer.
+    """
+    if not (config.CPU_PARTITION and config.CPU_PIN) or not hasattr(os, "sched_setaffinity"):
+        return
+    cores = current_plan()[share]
+    if cores:
+        os.sched_setaffinity(0, cores)
+        _applied.setdefault("pinned", {})[share] = cores
+
+
+def info():
+    return {
+        "partition": config.CPU_PARTITION,
+        "pin": config.CPU_PIN,
+        "cores": len(available_cores()),
+        "plan": current_plan() if config.CPU_PARTITION else None,
+        "applied": _applied,
+    }
@@ -0,0 +1,243 @@
+# backend/app/core/metrics.py
+"""
+In-process latency metrics for the prediction path: per-stage histograms, queue
+wait, batch sizes, cache hits and model-load timings, rendered in Prometheus text
+format at /metrics, plus the per-request entries behind the Server-Timing header.
+
+Recording is a bisect and a few adds under a lock, cheap enough to leave on in
+production. Stages timed inside run_in_threadpool still land on the right request
+because the threadpool runs with a copy of the request's context.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from app.core import config
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_REGISTRY = []
+_COLLECTORS = []
+
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def inc(self, *label_values, amount=1.0):
+        if not config.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def lines(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labels, lv)} {_fmt(v)}" for lv, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        _REGISTRY.append(self)
+
+    def observe(self, value, *label_values):
+        if not config.METRICS_ENABLED:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def lines(self):
+        with self._lock:
+            items = [(lv, list(counts), total) for lv, (counts, total) in self._series.items()]
+        out = []
+        for lv, counts, total in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                out.append(f"{self.name}_bucket{_labels(self.labels, lv, [('le', _fmt(bound))])} {running}")
+            out.append(f"{self.name}_sum{_labels(self.labels, lv)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labels, lv)} {running}")
+        return out
+
+
+def register_collector(fn):
+    """
+    fn() -> iterable of (name, kind, help, [(labels dict, value), ...]), evaluated on
+    every scrape; for values that already live elsewhere (model timings, cache size).
+    """
+    _COLLECTORS.append(fn)
+    return fn
+
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    for metric in _REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.lines())
+    for fn in _COLLECTORS:
+        for name, kind, help, samples in fn():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------------------------------
+# Metrics recorded by the serving path
+# -------------------------------------------------
+REQUEST_SECONDS = Histogram(
+    "cattle_request_seconds", "End-to-end request latency.", ("route", "method", "status")
+)
+HTTP_STAGE_SECONDS = Histogram(
+    "cattle_http_stage_seconds",
+    "Request body parsing, endpoint and response validation/serialisation time.",
+    ("route", "stage"),
+)
+STAGE_SECONDS = Histogram(
+    "cattle_stage_seconds",
+    "Time per prediction stage (read, cache, decode, forward, softmax, postprocess).",
+    ("model", "stage"),
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "cattle_queue_wait_seconds", "Time an image waited in the micro-batcher queue.", ("model",)
+)
+BATCH_SECONDS = Histogram(
+    "cattle_batch_seconds", "Wall time of one batched model call.", ("model",)
+)
+BATCH_SIZE = Histogram(
+    "cattle_batch_size", "Images per batched model call.", ("model",), buckets=SIZE_BUCKETS
+)
+ADMISSION_REJECTED = Counter(
+    "cattle_admission_rejected_total", "Requests shed by admission control.", ("model", "lane", "reason")
+)
+CACHE_LOOKUPS = Counter(
+    "cattle_cache_lookups_total", "Prediction cache lookups by result.", ("model", "result")
+)
+CASCADE_IMAGES = Counter(
+    "cattle_cascade_images_total",
+    "Breed images answered by the cascade's student or escalated to the full model.",
+    ("outcome",),
+)
+SHADOW_RESULTS = Counter(
+    "cattle_shadow_results_total",
+    "Mirrored requests by agreement of the shadow version with the active one.",
+    ("model", "version", "outcome"),
+)
+VIDEO_FRAMES = Counter(
+    "cattle_video_frames_total",
+    "Video frames analysed, or skipped as sampled out, unchanged, corrupt or dropped behind the models.",
+    ("outcome",),
+)
+SHADOW_SECONDS = Histogram(
+    "cattle_shadow_seconds", "Model time of mirrored requests, active vs shadow.", ("model", "role")
+)
+
+
+# -------------------------------------------------
+# Per-request timings (Server-Timing)
+# -------------------------------------------------
+class RequestTimings:
+    __slots__ = ("route", "entries", "handler_start", "endpoint_end")
+
+    def __init__(self):
+        self.route = "unmatched"
+        self.entries = []
+        self.handler_start = None
+        self.endpoint_end = None
+
+    def add(self, name, seconds):
+        self.entries.append((name, seconds))
+
+    def header(self):
+        # repeated stages (e.g. one decode per image on /batch) are summed into one entry
+        totals, counts = {}, {}
+        for name, seconds in self.entries:
+            totals[name] = totals.get(name, 0.0) + seconds
+            counts[name] = counts.get(name, 0) + 1
+        parts = []
+        for name, seconds in totals.items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if counts[name] > 1:
+                part += f';desc="x{counts[name]}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("cattle_request_timings", default=None)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def detach():
+    """Stop attributing timings to a request; for long-lived tasks started inside one."""
+    _current.set(None)
+
+
+def add_timing(name, seconds):
+    """Server-Timing entry only (no histogram)."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def record(model, stage, seconds):
+    STAGE_SECONDS.observe(seconds, model, stage)
+    add_timing(f"{model}-{stage}", seconds)
+
+
+@contextmanager
+def stage(model, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(model, name, time.perf_counter() - start)
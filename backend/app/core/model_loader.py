@@ -1,7 +1,27 @@
 # backend/app/core/model_loader.py
+import asyncio
+import contextvars
+import logging
 import os
-from app import cattle_model
-from tensorflow.keras.models import load_model as load_tf_model
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from app import cascade
+from app import embeddings
+from app import quantization
+from app import weights
+from app.core import admission, config, cpu, metrics, profiling, registry
+from app.core.batcher import MicroBatcher
+from app.core.cache import PredictionCache
+from app.preprocessing import BatchBuffer, decode_for_models, disease_image_array
+from app.utils import preprocess_disease, predict_disease_batch
+
+# torch/torchvision and tensorflow are imported inside load_breed / load_disease,
+# so a breed-only pod never pays for TF (and vice versa)
+
+logger = logging.getLogger("uvicorn.error")
 
 # -------------------------------------------------
 # Resolve backend/ directory safely
@@ -13,34 +33,604 @@ BASE_DIR = os.path.dirname(
 )
 # BASE_DIR -> reva/backend
 
+# defaults to BASE_DIR/models, overridable with CATTLE_MODEL_DIR
 BREED_MODEL_PATH = os.path.join(
-    BASE_DIR, "models", "best_enhanced_model.pth"
+    config.MODEL_DIR, "best_enhanced_model.pth"
 )
 
 DISEASE_MODEL_PATH = os.path.join(
-    BASE_DIR, "models", "custom_model.h5"
+    config.MODEL_DIR, "custom_model.h5"
 )
 
+# per-thread batch arrays: the breed, disease and shadow threads each stack their
+# batches into one reused array instead of allocating a new one per forward pass
+_buffers = threading.local()
+
+
+def _buffer(name):
+    buffer = getattr(_buffers, name, None)
+    if buffer is None:
+        buffer = BatchBuffer()
+        setattr(_buffers, name, buffer)
+    return buffer
+
+
+def _stack_tensors(tensors):
+    # (C, H, W) tensors -> one (N, C, H, W) tensor over this thread's buffer
+    import torch
+    out = _buffer("breed").take(len(tensors), tensors[0].shape)
+    return torch.stack(tensors, out=torch.from_numpy(out))
+
+
+def _stack_arrays(arrays):
+    # (1, H, W, C) arrays -> one (N, H, W, C) array in this thread's buffer
+    out = _buffer("disease").take(len(arrays), arrays[0].shape[1:])
+    return np.concatenate(arrays, axis=0, out=out)
+
+
+def _by_version(items, forward):
+    # items are (ModelVersion, input) or (ModelVersion, input, forward); a swap while
+    # images are queued can leave one batch holding two versions (and embedding items
+    # can share a batch with predictions), each group gets its own forward pass
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault((item[0], item[2] if len(item) > 2 else forward), []).append(i)
+    results = [None] * len(items)
+    for (mv, fn), idx in groups.items():
+        for i, result in zip(idx, fn(mv, [items[i][1] for i in idx])):
+            results[i] = result
+    return results
+
 class Models:
     def __init__(self):
-        self._breed = None
-        self._breed_device = None
-        self._breed_transform = None
-        self._disease = None
-        self._disease_input_shape = None
+        # versioned checkpoints per task; requests pin the active version at their start
+        self.breed = registry.TaskRegistry("breed", self._load_breed, self._warm_breed, version=_breed_version)
+        self.disease = registry.TaskRegistry("disease", self._load_disease, self._warm_disease)
+        self.timings = {"breed": {}, "disease": {}}
+        self.ready = False
+        self.cache = PredictionCache(
+            max_entries=config.CACHE_MAX_ENTRIES,
+            ttl_s=config.CACHE_TTL_S,
+            disk_path=config.CACHE_DISK_PATH or None,
+            disk_max_entries=config.CACHE_DISK_MAX_ENTRIES or None,
+        )
+        self.startup_error = None
+        # each model runs on one dedicated thread, so it never runs on the event loop,
+        # never competes with itself for its runtime's intra-op pool, and can be pinned
+        # to its own cores (see app/core/cpu.py)
+        self.breed_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="breed", initializer=cpu.pin, initargs=("breed",)
+        )
+        self.breed_batcher = MicroBatcher(
+            self._predict_breed_batch,
+            max_batch_size=config.BREED_MAX_BATCH_SIZE,
+            max_wait_ms=config.BREED_MAX_WAIT_MS,
+            executor=self.breed_executor,
+            name="breed",
+        )
+        self.disease_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="disease", initializer=cpu.pin, initargs=("disease",)
+        )
+        self.disease_batcher = MicroBatcher(
+            self._predict_disease_batch,
+            max_batch_size=config.DISEASE_MAX_BATCH_SIZE,
+            max_wait_ms=config.DISEASE_MAX_WAIT_MS,
+            executor=self.disease_executor,
+            name="disease",
+        )
+        # new versions load and warm here, and shadow versions run here, so neither
+        # ever holds up the serving threads; one of each per task, pinned to that
+        # task's cores (threads inherit the startup thread's decode affinity otherwise)
+        self.loader_executors = {
+            task: ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"{task}-load", initializer=cpu.pin, initargs=(task,)
+            )
+            for task in ("breed", "disease")
+        }
+        self.shadow_executors = {
+            task: ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"{task}-shadow", initializer=cpu.pin, initargs=(task,)
+            )
+            for task in ("breed", "disease")
+        }
+        self._background = set()
+        self.admission = {
+            "breed": admission.controller_for("breed", self.breed_batcher),
+            "disease": admission.controller_for("disease", self.disease_batcher),
+        }
+
+    def task_registry(self, task):
+        return self.breed if task == "breed" else self.disease
 
     def load_breed(self):
-        if self._breed is None:
-            self._breed, self._breed_device, self._breed_transform = (
-                cattle_model.load_model(BREED_MODEL_PATH)
-            )
-        return self._breed, self._breed_device, self._breed_transform
+        """
+        The active breed ModelVersion; handle is (backend, device, transform, cascade or
+        None, (eager model, embedding version) or None).
+        """
+        return self.breed.ensure(BREED_MODEL_PATH, self.timings["breed"])
+
+    def _load_breed(self, path, timings):
+        with profiling.span("breed-load"):
+            start = time.perf_counter()
+            import torch
+            from app import breed_backends, cattle_model
+            timings["import_s"] = time.perf_counter() - start
+            cpu.configure_torch()
+            start = time.perf_counter()
+            if config.WEIGHTS_FORMAT == "mmap":
+                # read-only shared mapping: workers on one node share the weight pages
+                model, device, transform = cattle_model.load_model(
+                    os.path.splitext(path)[0] + ".safetensors"
+                )
+            else:
+                model, device, transform = cattle_model.load_model(path)
+            if config.BREED_QUANTIZATION != "none":
+                # INT8 artifacts are CPU-only TorchScript and must pass their calibration report
+                artifact = quantization.breed_artifact_path(path, config.BREED_QUANTIZATION)
+                report = quantization.check_report(artifact, config.QUANT_MIN_AGREEMENT, source_path=path)
+                timings["quantization"] = report
+                device = torch.device("cpu")
+                model = model.cpu()
+                backend = breed_backends.TorchBackend(
+                    quantization.load_breed_int8(artifact), f"int8_{config.BREED_QUANTIZATION}"
+                )
+            else:
+                backend = breed_backends.build_backend(
+                    config.BREED_BACKEND, model, device,
+                    onnx_path=os.path.splitext(path)[0] + ".onnx",
+                    source_path=path,
+                    threads=cpu.threads("breed") or 0,
+                )
+            if config.BREED_BACKEND != "eager" and config.BREED_QUANTIZATION == "none":
+                drift = breed_backends.parity_check(model, backend, device, atol=config.BREED_PARITY_ATOL)
+                timings["parity_max_diff"] = drift
+            timings["backend"] = getattr(backend, "name", config.BREED_BACKEND)
+            gate = None
+            if config.BREED_CASCADE:
+                # the student answers first; the backend above only sees escalations
+                gate, report = cascade.load_cascade(path, device, config.BREED_CASCADE_THRESHOLD)
+                expected = [row for row in report["curve"] if row["threshold"] == gate.threshold]
+                timings["cascade"] = {
+                    "threshold": gate.threshold,
+                    "expected": expected[0] if expected else None,
+                }
+            # embeddings need the backbone's pooled features, which no backend exposes;
+            # for the eager backend this is the same module, so it costs nothing extra.
+            # They are versioned by this checkpoint alone, as the CLI stamps them.
+            features = (model, embeddings.embedding_version(path)) if config.EMBEDDINGS_ENABLED else None
+            timings["load_s"] = time.perf_counter() - start
+        return backend, device, transform, gate, features
+
+    def _lookup(self, model, image_bytes, version):
+        with metrics.stage(model, "cache"):
+            key, hit = self.cache.lookup(image_bytes, version)
+        metrics.CACHE_LOOKUPS.inc(model, "miss" if hit is None else "hit")
+        return key, hit
+
+    @staticmethod
+    def _breed_forward(mv, tensors):
+        from app import cattle_model
+        backend, device, _, gate, _ = mv.handle
+        x = _stack_tensors(tensors)
+        if gate is not None:
+            return gate(backend, device, x)
+        return cattle_model.predict_tensors(backend, device, x)
+
+    def _predict_breed_batch(self, items):
+        return _by_version(items, self._breed_forward)
+
+    async def predict_breed(self, image_bytes):
+        """(label, confidence, probs, model version) for one image."""
+        # decode in the caller's thread, then share one forward pass with concurrent requests
+        mv = await run_in_threadpool(self.load_breed)
+        from app import cattle_model
+        key, hit = await run_in_threadpool(self._lookup, "breed", image_bytes, mv.version)
+        if hit is not None:
+            return (*hit, mv.version)
+        start = time.perf_counter()
+        x = await run_in_threadpool(cattle_model.preprocess_bytes, mv.handle[2], image_bytes)
+        result = await self._run_breed(mv, x)
+        self._mirror(self.breed, image_bytes, result, time.perf_counter() - start)
+        await run_in_threadpool(self.cache.put, key, result)
+        return (*result, mv.version)
+
+    async def _run_breed(self, mv, x, priority=None, forward=None):
+        if profiling.current() is not None:
+            # profiled requests get a forward pass of their own, outside the shared batch
+            return (await self._on_breed_thread(forward or self._breed_forward, mv, [x]))[0]
+        return await self.breed_batcher.submit((mv, x) if forward is None else (mv, x, forward), priority)
+
+    async def predict_breed_many(self, images, priority=None):
+        """
+        Decode all images concurrently and classify them through the breed batcher
+        (passes of up to BREED_MAX_BATCH_SIZE images), all on one version. priority
+        defaults to the current request's lane, so bulk scans queue behind app requests.
+        """
+        mv = await run_in_threadpool(self.load_breed)
+        from app import cattle_model
+        lookups = await asyncio.gather(*[
+            run_in_threadpool(self._lookup, "breed", b, mv.version) for b in images
+        ])
+        results = [hit for _, hit in lookups]
+        # the same parent image often appears in many pairings: only run cache misses
+        misses = [i for i, hit in enumerate(results) if hit is None]
+        tensors = await asyncio.gather(*[
+            run_in_threadpool(cattle_model.preprocess_bytes, mv.handle[2], images[i]) for i in misses
+        ])
+        preds = await asyncio.gather(*[self._run_breed(mv, x, priority) for x in tensors])
+        for i, pred in zip(misses, preds):
+            results[i] = pred
+        await run_in_threadpool(self.cache.put_many, [(lookups[i][0], results[i]) for i in misses])
+        return [(*result, mv.version) for result in results]
+
+    @staticmethod
+    def _embed_forward(mv, tensors):
+        # one (embedding, prediction) per tensor, the shape the batcher hands back
+        from app import cattle_model
+        _, device, _, _, features = mv.handle
+        if features is None:
+            raise RuntimeError("Embeddings are disabled (CATTLE_EMBEDDINGS=0)")
+        vectors, results = cattle_model.embed_tensors(features[0], device, _stack_tensors(tensors))
+        return list(zip(vectors, results))
+
+    async def embed_many(self, images, priority=None):
+        """
+        Backbone embeddings of images as one L2-normalised float32 (N, D) array, the
+        breed predictions made from them in the same passes (eager model, no cascade,
+        not cached) and the embedding version of the checkpoint they came from.
+        """
+        mv = await run_in_threadpool(self.load_breed)
+        if mv.handle[4] is None:
+            raise RuntimeError("Embeddings are disabled (CATTLE_EMBEDDINGS=0)")
+        version = mv.handle[4][1]
+        from app import cattle_model
+        tensors = await asyncio.gather(*[
+            run_in_threadpool(cattle_model.preprocess_bytes, mv.handle[2], b) for b in images
+        ])
+        # through the breed batcher, so embedding passes take their turn by priority
+        # and count towards admission's queue-wait estimate
+        rows = await asyncio.gather(*[
+            self._run_breed(mv, x, priority, forward=self._embed_forward) for x in tensors
+        ])
+        preds = [(*result, version) for _, result in rows]
+        return np.stack([vector for vector, _ in rows]), preds, version
 
     def load_disease(self):
-        if self._disease is None:
-            self._disease = load_tf_model(DISEASE_MODEL_PATH)
-            _, H, W, C = self._disease.input_shape
-            self._disease_input_shape = (H, W, C)
-        return self._disease, self._disease_input_shape
+        """The active disease ModelVersion; handle is (model, predict fn, (H, W, C))."""
+        return self.disease.ensure(DISEASE_MODEL_PATH, self.timings["disease"])
+
+    def _load_disease(self, path, timings):
+        with profiling.span("disease-load"):
+            start = time.perf_counter()
+            import tensorflow as tf
+            from tensorflow.keras.models import load_model as load_tf_model
+            timings["import_s"] = time.perf_counter() - start
+            cpu.configure_tf()
+            start = time.perf_counter()
+            if config.WEIGHTS_FORMAT == "mmap":
+                model = weights.load_keras_flat(path)
+            else:
+                model = load_tf_model(path)
+            _, H, W, C = model.input_shape
+            if config.DISEASE_QUANTIZATION == "tflite_int8":
+                artifact = quantization.disease_artifact_path(path)
+                report = quantization.check_report(artifact, config.QUANT_MIN_AGREEMENT, source_path=path)
+                timings["quantization"] = report
+                # one preallocated interpreter per warm-up batch size
+                fn = quantization.TFLiteRunner(
+                    artifact, num_threads=cpu.threads("disease"), max_batch=config.DISEASE_MAX_BATCH_SIZE
+                )
+            elif config.DISEASE_QUANTIZATION == "none":
+                # direct call instead of Model.predict: no per-call data adapter setup,
+                # and a None batch dim so coalesced batches of any size reuse one trace
+                fn = tf.function(
+                    lambda x: model(x, training=False),
+                    input_signature=[tf.TensorSpec([None, H, W, C], tf.float32)],
+                )
+            else:
+                raise ValueError(f"Unknown disease quantisation {config.DISEASE_QUANTIZATION!r}")
+            timings["load_s"] = time.perf_counter() - start
+        return model, fn, (H, W, C)
+
+    @staticmethod
+    def _warm_breed(handle, timings, batch_sizes=None, passes=None):
+        import torch
+        from app import cattle_model
+        model, device, _, gate, _ = handle
+        batch_sizes = config.BREED_WARMUP_BATCH_SIZES if batch_sizes is None else batch_sizes
+        passes = _warmup_passes() if passes is None else passes
+        start = time.perf_counter()
+        for n in batch_sizes:
+            x = [torch.zeros(3, 300, 300) for _ in range(n)]
+            for _ in range(passes):
+                cattle_model.predict_tensors(model, device, x)
+                if gate is not None:
+                    cattle_model.predict_tensors(gate.student, device, x, name="breed-student")
+        timings["warmup_s"] = time.perf_counter() - start
+        timings["warmup_batch_sizes"] = list(batch_sizes)
+
+    @staticmethod
+    def _warm_disease(handle, timings, batch_sizes=None, passes=None):
+        _, fn, (H, W, C) = handle
+        batch_sizes = config.DISEASE_WARMUP_BATCH_SIZES if batch_sizes is None else batch_sizes
+        passes = _warmup_passes() if passes is None else passes
+        start = time.perf_counter()
+        for n in batch_sizes:
+            x = np.zeros((n, H, W, C), dtype="float32")
+            for _ in range(passes):
+                fn(x)
+        timings["warmup_s"] = time.perf_counter() - start
+        timings["warmup_batch_sizes"] = list(batch_sizes)
+
+    def warmup_breed(self, batch_sizes, passes):
+        self._warm_breed(self.load_breed().handle, self.timings["breed"], batch_sizes, passes)
+
+    def warmup_disease(self, batch_sizes, passes):
+        self._warm_disease(self.load_disease().handle, self.timings["disease"], batch_sizes, passes)
+
+    async def warm_start(self):
+        """
+        Load the models this role serves in parallel, run dummy passes at every batch
+        size the batchers can produce, then flip the ready flag used by /readyz.
+        """
+        loop = asyncio.get_running_loop()
+        passes = _warmup_passes()
+        start = time.perf_counter()
+        jobs = []
+        # warm-up runs on the thread that will serve each model
+        if config.serves("breed"):
+            jobs.append(loop.run_in_executor(
+                self.breed_executor,
+                self.warmup_breed, config.BREED_WARMUP_BATCH_SIZES, passes,
+            ))
+        if config.serves("disease"):
+            jobs.append(loop.run_in_executor(
+                self.disease_executor,
+                self.warmup_disease, config.DISEASE_WARMUP_BATCH_SIZES, passes,
+            ))
+        try:
+            await asyncio.gather(*jobs)
+        except Exception as e:
+            self.startup_error = str(e)
+            raise
+        self.timings["startup_s"] = time.perf_counter() - start
+        self.ready = True
+        logger.info("Startup report: %s", self.startup_report())
+
+    def startup_report(self):
+        """One line per model: import, load and warm-up seconds for this role."""
+        parts = [f"role={config.SERVING_ROLE}"]
+        for name in ("breed", "disease"):
+            t = self.timings[name]
+            if t:
+                parts.append(
+                    f"{name}: import {t.get('import_s', 0):.2f}s, load {t.get('load_s', 0):.2f}s, "
+                    f"warmup {t.get('warmup_s', 0):.2f}s"
+                )
+        if config.CPU_PARTITION:
+            parts.append("cores " + ", ".join(
+                f"{share} {len(cores)}" for share, cores in cpu.current_plan().items() if cores
+            ))
+        parts.append(f"total {self.timings.get('startup_s', 0):.2f}s")
+        return "; ".join(parts)
+
+    async def load_version(self, task, path, activate=False, shadow_rate=None):
+        """
+        Load and warm the checkpoint at path in the background, then optionally make
+        it the active version or start mirroring shadow_rate of traffic to it.
+        Progress is reported under the task registry's "loads".
+        """
+        reg = self.task_registry(task)
+        reg.loads[path] = {"state": "loading", "started": time.time()}
+        loop = asyncio.get_running_loop()
+        try:
+            mv = await loop.run_in_executor(self.loader_executors[task], reg.load, path)
+            if activate:
+                reg.activate(mv.version)
+            elif shadow_rate:
+                reg.set_shadow(mv.version, shadow_rate)
+        except Exception as e:
+            logger.exception("Loading %s model %s failed", task, path)
+            reg.loads[path] = {"state": "failed", "error": str(e), "finished": time.time()}
+            return None
+        reg.loads.pop(path, None)
+        # the previous version's cached predictions stay valid for it but are never
+        # looked up again; the memory LRU and the disk tier's size cap reclaim them
+        return mv
+
+    def start_load(self, task, path, activate=False, shadow_rate=None):
+        job = asyncio.get_running_loop().create_task(self.load_version(task, path, activate, shadow_rate))
+        self._background.add(job)
+        job.add_done_callback(self._background.discard)
+
+    def _mirror(self, reg, image_bytes, result, active_s):
+        # shadow traffic is sampled from requests the active version actually computed
+        shadow = reg.sample_shadow()
+        if shadow is None:
+            return
+        mv, stats = shadow
+        stats.mirrored += 1
+        if stats.in_flight >= config.SHADOW_MAX_PENDING:
+            stats.dropped += 1
+            return
+        stats.in_flight += 1
+        job = asyncio.get_running_loop().create_task(self._shadow(mv, stats, image_bytes, result, active_s))
+        self._background.add(job)
+        job.add_done_callback(self._background.discard)
+
+    async def _shadow(self, mv, stats, image_bytes, result, active_s):
+        # plain run_in_executor: the shadow pass must not show up in the live request's timings
+        loop = asyncio.get_running_loop()
+        try:
+            label, shadow_s = await loop.run_in_executor(
+                self.shadow_executors[mv.task], self._shadow_predict, mv, image_bytes
+            )
+        except Exception:
+            logger.exception("Shadow %s model %s failed", mv.task, mv.version)
+            stats.record_error()
+        else:
+            stats.record(result[0], label, active_s, shadow_s)
+        finally:
+            stats.in_flight -= 1
+
+    def _shadow_predict(self, mv, image_bytes):
+        start = time.perf_counter()
+        if mv.task == "breed":
+            from app import cattle_model
+            result = self._breed_forward(mv, [cattle_model.preprocess_bytes(mv.handle[2], image_bytes)])[0]
+        else:
+            result = self._disease_forward(mv, [preprocess_disease(image_bytes, mv.handle[2])])[0]
+        return result[0], time.perf_counter() - start
+
+    @staticmethod
+    def _disease_forward(mv, arrays):
+        _, fn, _ = mv.handle
+        return predict_disease_batch(lambda x: np.asarray(fn(x)), _stack_arrays(arrays))
+
+    def _predict_disease_batch(self, items):
+        return _by_version(items, self._disease_forward)
+
+    @staticmethod
+    async def _on_thread(executor, fn, *args):
+        # run_in_executor doesn't carry contextvars over; copy them so metrics and
+        # profiling still see the calling request
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(executor, ctx.run, fn, *args)
+
+    async def _on_breed_thread(self, fn, *args):
+        return await self._on_thread(self.breed_executor, fn, *args)
+
+    async def _on_disease_thread(self, fn, *args):
+        return await self._on_thread(self.disease_executor, fn, *args)
+
+    async def predict_disease(self, img_bytes):
+        """(label, confidence, probs, model version) for one image."""
+        mv = await run_in_threadpool(self.load_disease)
+        key, hit = await run_in_threadpool(self._lookup, "disease", img_bytes, mv.version)
+        if hit is not None:
+            return (*hit, mv.version)
+        start = time.perf_counter()
+        arr = await run_in_threadpool(preprocess_disease, img_bytes, mv.handle[2])
+        result = await self._run_disease(mv, arr)
+        self._mirror(self.disease, img_bytes, result, time.perf_counter() - start)
+        await run_in_threadpool(self.cache.put, key, result)
+        return (*result, mv.version)
+
+    async def _run_disease(self, mv, arr):
+        if profiling.current() is not None:
+            return (await self._on_disease_thread(self._disease_forward, mv, [arr]))[0]
+        return await self.disease_batcher.submit((mv, arr))
+
+    async def analyze(self, image_bytes):
+        """
+        Breed and disease for one image: a single decode feeds both models, whose
+        forward passes then run at the same time on their own executors.
+        Returns (breed result, disease result), each with its model version.
+        """
+        breed_mv, disease_mv = await asyncio.gather(
+            run_in_threadpool(self.load_breed), run_in_threadpool(self.load_disease)
+        )
+        (breed_key, breed), (disease_key, disease) = await asyncio.gather(
+            run_in_threadpool(self._lookup, "breed", image_bytes, breed_mv.version),
+            run_in_threadpool(self._lookup, "disease", image_bytes, disease_mv.version),
+        )
+        transform, input_shape = breed_mv.handle[2], disease_mv.handle[2]
+        if breed is None and disease is None and hasattr(transform, "array"):
+            start = time.perf_counter()
+            x, arr = await run_in_threadpool(self._decode_both, transform, image_bytes, input_shape)
+            breed, disease = await asyncio.gather(
+                self._run_breed(breed_mv, x), self._run_disease(disease_mv, arr)
+            )
+            elapsed = time.perf_counter() - start
+            self._mirror(self.breed, image_bytes, breed, elapsed)
+            self._mirror(self.disease, image_bytes, disease, elapsed)
+            await run_in_threadpool(self.cache.put_many, [(breed_key, breed), (disease_key, disease)])
+            return (*breed, breed_mv.version), (*disease, disease_mv.version)
+        # at most one model left to run (or a reference transform without a shared
+        # decode path): the single-model paths decode for themselves
+        breed, disease = await asyncio.gather(
+            self._finish(breed, breed_mv, self.predict_breed, image_bytes),
+            self._finish(disease, disease_mv, self.predict_disease, image_bytes),
+        )
+        return breed, disease
+
+    async def input_size(self, task):
+        """(W, H) of task's model input."""
+        if task == "breed":
+            transform = (await run_in_threadpool(self.load_breed)).handle[2]
+            size = getattr(transform, "size", 300)
+            return size, size
+        H, W, _ = (await run_in_threadpool(self.load_disease)).handle[2]
+        return W, H
+
+    async def predict_images(self, task, images):
+        """
+        (label, confidence, probs, model version) for already decoded RGB PIL images,
+        through the task's batcher and without the cache (video frames never repeat
+        byte for byte, and would only evict uploads that do).
+        """
+        if task == "breed":
+            mv = await run_in_threadpool(self.load_breed)
+            # BreedPreprocessor and the torchvision reference both take PIL images
+            xs = await run_in_threadpool(lambda: [mv.handle[2](img) for img in images])
+            results = await asyncio.gather(*[self._run_breed(mv, x) for x in xs])
+        else:
+            mv = await run_in_threadpool(self.load_disease)
+            xs = await run_in_threadpool(
+                lambda: [np.expand_dims(disease_image_array(img, mv.handle[2]), 0) for img in images]
+            )
+            results = await asyncio.gather(*[self._run_disease(mv, x) for x in xs])
+        return [(*result, mv.version) for result in results]
+
+    @staticmethod
+    async def _finish(hit, mv, predict, image_bytes):
+        return (*hit, mv.version) if hit is not None else await predict(image_bytes)
+
+    @staticmethod
+    def _decode_both(transform, image_bytes, input_shape):
+        import torch
+        with metrics.stage("analyze", "decode"):
+            x, arr = decode_for_models(image_bytes, transform, input_shape)
+        return torch.from_numpy(x), np.expand_dims(arr, 0)
+
+def _breed_version(path):
+    # a cascade answers with two checkpoints and a threshold: all three name the version
+    if config.BREED_CASCADE:
+        return cascade.cascade_version(path, config.BREED_CASCADE_THRESHOLD)
+    return registry.file_version(path)
+
+def _warmup_passes():
+    return config.WARMUP_PASSES if config.WARMUP_ENABLED else 0
 
 models = Models()
+
+
+@metrics.register_collector
+def _model_metrics():
+    phases = [
+        ({"model": name, "phase": phase[:-2]}, models.timings[name][phase])
+        for name in ("breed", "disease")
+        for phase in ("import_s", "load_s", "warmup_s")
+        if phase in models.timings[name]
+    ]
+    yield "cattle_model_load_seconds", "gauge", "Model import, load and warm-up time.", phases
+    yield "cattle_ready", "gauge", "1 once warm start has finished.", [({}, int(models.ready))]
+    yield "cattle_model_active", "gauge", "1 for the version serving each model.", [
+        ({"model": reg.task, "version": reg.active.version}, 1)
+        for reg in (models.breed, models.disease)
+        if reg.active is not None
+    ]
+    lanes = [
+        ({"model": name, "lane": lane}, state)
+        for name, controller in models.admission.items()
+        for lane, state in controller.info().items()
+    ]
+    yield "cattle_queue_depth", "gauge", "Images waiting in the micro-batcher by lane.", [
+        (labels, state["queued_images"]) for labels, state in lanes
+    ]
+    yield "cattle_admission_pending", "gauge", "Admitted requests in flight by lane.", [
+        (labels, state["pending"]) for labels, state in lanes
+    ]
+    info = models.cache.info()
+    yield "cattle_cache_entries", "gauge", "Prediction cache entries in memory.", [({}, info["entries"])]
+    yield "cattle_cache_evictions_total", "counter", "Prediction cache evictions.", [({}, info["evictions"])]
@@ -0,0 +1,349 @@
+# backend/app/core/profiling.py
+"""
+On-demand profiling of individual requests, available while CATTLE_PROFILE_TOKEN
+is set (CATTLE_PROFILING=0 turns it off). The hooks are always mounted and cost a
+lock and a counter check per request until profiling is armed.
+
+A request is profiled when it carries an X-Cattle-Profile header with the token,
+when it is one of the next N requests armed through
+POST /debug/profiling, or when it falls in the sampled fraction set there. One
+request is profiled at a time; others run normally meanwhile. Each profile is a
+directory under CATTLE_PROFILE_DIR:
+
+    python.trace.json    sampled Python stacks of every thread, plus spans (model
+                         load, forward passes)
+    torch-N.trace.json   torch.profiler trace of each breed forward pass
+    tf/                  TF profiler logdir of the disease forward passes (TensorBoard)
+    meta.json            route, status, duration, trigger and the files above
+
+The .trace.json files are Chrome traces (ui.perfetto.dev, chrome://tracing).
+Profiled requests skip the micro-batchers, so their forward passes are their own.
+"""
+import contextvars
+import hmac
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from app.core import config
+
+settings = {"sample_rate": config.PROFILE_SAMPLE_RATE, "next": 0}
+_settings_lock = threading.Lock()
+_busy = threading.Lock()
+_current = contextvars.ContextVar("cattle_profile", default=None)
+_PROFILE_ID = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+
+
+def authorized(value):
+    # no token configured means nobody is authorised, not everybody
+    if not value or not config.PROFILE_TOKEN:
+        return False
+    return hmac.compare_digest(value.encode(), config.PROFILE_TOKEN.encode())
+
+
+def configure(sample_rate=None, next=None):
+    with _settings_lock:
+        if sample_rate is not None:
+            settings["sample_rate"] = min(max(float(sample_rate), 0.0), 1.0)
+        if next is not None:
+            settings["next"] = max(int(next), 0)
+        return dict(settings)
+
+
+def should_profile(header_value):
+    """Trigger for one request: explicit header, an armed 'next N' slot, or sampling."""
+    if header_value is not None:
+        return authorized(header_value)
+    with _settings_lock:
+        if settings["next"] > 0:
+            settings["next"] -= 1
+            return True
+        rate = settings["sample_rate"]
+    return rate > 0 and random.random() < rate
+
+
+# -------------------------------------------------
+# Python sampling profiler
+# -------------------------------------------------
+class StackSampler:
+    """
+    Samples every thread's stack each interval and turns runs of identical frames
+    into Chrome-trace duration events, i.e. a sampled flame chart per thread.
+    """
+
+    def __init__(self, t0, interval_s, max_s=120.0):
+        self.t0, self.interval, self.max_s = t0, interval_s, max_s
+        self.events = []
+        self._open = {}  # thread id -> [(code, start)] from the root frame down
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.events
+
+    def _run(self):
+        own = threading.get_ident()
+        now = time.perf_counter()
+        while not self._stop.wait(self.interval) and now - self.t0 < self.max_s:
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for tid, frame in frames.items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                self._update(tid, stack, now)
+            for tid in [t for t in self._open if t not in frames]:
+                self._update(tid, [], now)
+        end = time.perf_counter()
+        for tid in list(self._open):
+            self._update(tid, [], end)
+
+    def _update(self, tid, stack, now):
+        prev = self._open.get(tid, [])
+        n = 0
+        while n < len(prev) and n < len(stack) and prev[n][0] is stack[n]:
+            n += 1
+        for code, start in reversed(prev[n:]):
+            self.events.append({
+                "name": getattr(code, "co_qualname", code.co_name),
+                "cat": "python",
+                "ph": "X",
+                "ts": (start - self.t0) * 1e6,
+                "dur": (now - start) * 1e6,
+                "pid": 0,
+                "tid": tid,
+                "args": {"file": f"{code.co_filename}:{code.co_firstlineno}"},
+            })
+        self._open[tid] = prev[:n] + [(code, now) for code in stack[n:]]
+
+
+# -------------------------------------------------
+# One profiled request
+# -------------------------------------------------
+class Profile:
+    def __init__(self, route, method, trigger):
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.dir = os.path.join(config.PROFILE_DIR, self.id)
+        self.t0 = time.perf_counter()
+        self.meta = {
+            "id": self.id,
+            "route": route,
+            "method": method,
+            "trigger": trigger,
+            "started": time.time(),
+            "files": [],
+            "notes": [],
+        }
+        self.spans = []
+        self._lock = threading.Lock()
+        self._torch_passes = 0
+        self.sampler = StackSampler(self.t0, config.PROFILE_INTERVAL_MS / 1000.0)
+        self.token = None
+
+    def path(self, name):
+        with self._lock:
+            if name not in self.meta["files"]:
+                self.meta["files"].append(name)
+        return os.path.join(self.dir, name)
+
+    def note(self, message):
+        with self._lock:
+            self.meta["notes"].append(message)
+
+    def add_span(self, name, start, end, args):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "cat": "span",
+                "ph": "X",
+                "ts": (start - self.t0) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 1,
+                "tid": threading.get_ident(),
+                "args": args,
+            })
+
+    def next_torch_path(self):
+        with self._lock:
+            self._torch_passes += 1
+            n = self._torch_passes
+        return self.path(f"torch-{n}.trace.json")
+
+
+def current():
+    return _current.get()
+
+
+def begin(route, method, trigger):
+    """Start profiling the current request; None if another profile is running."""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        profile = Profile(route, method, trigger)
+        os.makedirs(profile.dir, exist_ok=True)
+        profile.sampler.start()
+    except Exception:
+        _busy.release()
+        raise
+    profile.token = _current.set(profile)
+    return profile
+
+
+def detach(profile):
+    _current.reset(profile.token)
+
+
+def finish(profile, status):
+    """Write the Python trace and meta.json; blocking, run it off the event loop."""
+    try:
+        events = profile.sampler.stop()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        metadata = [
+            {"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "python (sampled)"}},
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "spans"}},
+        ]
+        for tid in {e["tid"] for e in events + profile.spans}:
+            for pid in (0, 1):
+                metadata.append({
+                    "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                    "args": {"name": names.get(tid, str(tid))},
+                })
+        with open(profile.path("python.trace.json"), "w") as f:
+            json.dump({"traceEvents": metadata + profile.spans + events, "displayTimeUnit": "ms"}, f)
+        profile.meta["status"] = status
+        profile.meta["duration_ms"] = round((time.perf_counter() - profile.t0) * 1000.0, 3)
+        with open(os.path.join(profile.dir, "meta.json"), "w") as f:
+            json.dump(profile.meta, f, indent=2)
+        prune()
+    finally:
+        _busy.release()
+
+
+def busy():
+    return _busy.locked()
+
+
+# -------------------------------------------------
+# Hooks for the serving path (no-ops unless the current request is profiled)
+# -------------------------------------------------
+@contextmanager
+def span(name, **args):
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, start, time.perf_counter(), args)
+
+
+@contextmanager
+def torch_profile(name):
+    """torch.profiler around a breed forward pass, exported as a Chrome trace."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    import torch
+    from torch.profiler import ProfilerActivity, record_function
+    from torch.profiler import profile as torch_profiler
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    with span(name), torch_profiler(activities=activities, record_shapes=True) as prof:
+        with record_function(name):
+            yield
+    prof.export_chrome_trace(profile.next_torch_path())
+
+
+@contextmanager
+def tf_profile(name):
+    """TF profiler around a disease forward pass, written to <profile>/tf."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    import tensorflow as tf
+
+    try:
+        tf.profiler.experimental.start(profile.path("tf"))
+    except Exception as e:  # e.g. a profiler session already running in this process
+        profile.note(f"tf profiler not started: {e}")
+        with span(name):
+            yield
+        return
+    try:
+        with span(name):
+            yield
+    finally:
+        tf.profiler.experimental.stop()
+
+
+# -------------------------------------------------
+# Stored profiles
+# -------------------------------------------------
+def list_profiles():
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(config.PROFILE_DIR):
+        meta = get_profile(name)
+        if meta is not None:
+            profiles.append(meta)
+    return sorted(profiles, key=lambda m: m.get("started", 0), reverse=True)
+
+
+def get_profile(profile_id):
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(config.PROFILE_DIR, profile_id, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # missing, or still being written
+
+
+def file_path(profile_id, name):
+    """Absolute path of a file inside a profile, or None if it is outside it or missing."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    root = os.path.realpath(os.path.join(config.PROFILE_DIR, profile_id))
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def files(profile_id):
+    root = os.path.join(config.PROFILE_DIR, profile_id)
+    out = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            full = os.path.join(dirpath, filename)
+            out.append({"path": os.path.relpath(full, root), "bytes": os.path.getsize(full)})
+    return sorted(out, key=lambda f: f["path"])
+
+
+def prune():
+    profiles = list_profiles()
+    for meta in profiles[max(config.PROFILE_MAX_TRACES, 1):]:
+        shutil.rmtree(os.path.join(config.PROFILE_DIR, meta["id"]), ignore_errors=True)
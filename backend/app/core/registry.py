@@ -0,0 +1,222 @@
+# backend/app/core/registry.py
+"""
+Versioned model registry.
+
+Each task (breed, disease) holds a few loaded versions, one of them active. A
+version is named after its checkpoint (file name, mtime and size), and that name
+is part of every prediction cache key and response, so results from different
+weights never mix.
+
+    load       deserialise and warm a checkpoint off the serving threads
+    activate   atomic swap: requests already in flight finish on the version they
+               started with, new requests get the new one
+    shadow     mirror a sampled share of live traffic to another version and
+               compare its answers and latency; shadow results are never returned
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from app.core import config, metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def file_version(path):
+    # cheap identity for a checkpoint: name + mtime + size, so a replaced file never
+    # serves predictions cached for the old weights
+    st = os.stat(path)
+    return f"{os.path.basename(path)}@{int(st.st_mtime)}-{st.st_size}"
+
+
+class ModelVersion:
+    """One loaded checkpoint; handle is whatever the task's loader returned."""
+
+    def __init__(self, task, version, path, handle, timings):
+        self.task = task
+        self.version = version
+        self.path = path
+        self.handle = handle
+        self.timings = timings
+        self.loaded_at = time.time()
+
+    def info(self):
+        return {"path": self.path, "loaded_at": self.loaded_at, "timings": self.timings}
+
+
+class ShadowStats:
+    """
+    Agreement and latency of a shadow version against the active one. Active
+    latency covers decode, queueing and the batched forward pass of the live
+    request; shadow latency covers decode and an unbatched forward pass.
+    """
+
+    def __init__(self, task, version, rate):
+        self.task, self.version, self.rate = task, version, rate
+        self.started = time.time()
+        self.mirrored = self.compared = self.agreed = self.errors = self.dropped = 0
+        self.in_flight = 0
+        self.active_seconds = self.shadow_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, active_label, shadow_label, active_s, shadow_s):
+        agreed = active_label == shadow_label
+        with self._lock:
+            self.compared += 1
+            self.agreed += agreed
+            self.active_seconds += active_s
+            self.shadow_seconds += shadow_s
+        metrics.SHADOW_RESULTS.inc(self.task, self.version, "agree" if agreed else "disagree")
+        metrics.SHADOW_SECONDS.observe(active_s, self.task, "active")
+        metrics.SHADOW_SECONDS.observe(shadow_s, self.task, "shadow")
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+        metrics.SHADOW_RESULTS.inc(self.task, self.version, "error")
+
+    def info(self):
+        n = self.compared
+        return {
+            "version": self.version,
+            "rate": self.rate,
+            "started": self.started,
+            "mirrored": self.mirrored,
+            "compared": n,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "agreement": self.agreed / n if n else None,
+            "active_mean_ms": 1000.0 * self.active_seconds / n if n else None,
+            "shadow_mean_ms": 1000.0 * self.shadow_seconds / n if n else None,
+        }
+
+
+class TaskRegistry:
+    """
+    Loaded versions of one task. loader(path, timings) returns a handle and
+    warmup(handle, timings) runs dummy passes through it; both block. version(path)
+    names what loading path would serve (default: the checkpoint file itself).
+    """
+
+    def __init__(self, task, loader, warmup, max_versions=None, version=file_version):
+        self.task = task
+        self._loader = loader
+        self._warmup = warmup
+        self._version = version
+        self.max_versions = max(1, max_versions or config.MODEL_MAX_VERSIONS)
+        self.versions = OrderedDict()
+        self.active = None
+        self.previous = None
+        # (ModelVersion, ShadowStats) swapped as one reference, so a sampled request
+        # never pairs one version with another's stats
+        self._shadow = None
+        # background loads by path: {"state": "loading" | "failed", ...}
+        self.loads = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def get(self, version):
+        mv = self.versions.get(version)
+        if mv is None:
+            raise KeyError(f"No {self.task} version {version!r} loaded")
+        return mv
+
+    def ensure(self, path, timings=None):
+        """The active version, loading path (unwarmed) on first use."""
+        mv = self.active
+        if mv is None:
+            with self._load_lock:
+                if self.active is None:
+                    self._add(path, timings if timings is not None else {})
+            mv = self.active
+        return mv
+
+    def load(self, path, activate=False, warm=True):
+        """Load (or reuse) the checkpoint at path; returns its ModelVersion."""
+        with self._load_lock:
+            mv = self.versions.get(self._version(path))
+            if mv is None:
+                timings = {}
+                mv = self._add(path, timings, warm)
+        if activate:
+            self.activate(mv.version)
+        return mv
+
+    def _add(self, path, timings, warm=False):
+        version = self._version(path)
+        handle = self._loader(path, timings)
+        if warm:
+            self._warmup(handle, timings)
+        mv = ModelVersion(self.task, version, path, handle, timings)
+        with self._lock:
+            self.versions[version] = mv
+            if self.active is None:
+                self.active = mv
+        # the caller is about to activate or shadow what it just loaded
+        self._prune(keep=mv)
+        logger.info("Loaded %s model %s", self.task, version)
+        return mv
+
+    def activate(self, version):
+        mv = self.get(version)
+        with self._lock:
+            if mv is not self.active:
+                self.previous, self.active = self.active, mv
+            if self._shadow is not None and self._shadow[0] is mv:
+                self._shadow = None
+        self._prune()
+        logger.info("Activated %s model %s", self.task, version)
+        return mv
+
+    def set_shadow(self, version, rate):
+        """Mirror rate of live traffic to version; version None stops shadowing."""
+        if version is None:
+            self._shadow = None
+            return None
+        mv = self.get(version)
+        if mv is self.active:
+            raise ValueError(f"{version} is the active {self.task} version")
+        stats = ShadowStats(self.task, version, rate)
+        self._shadow = (mv, stats)
+        self._prune()
+        return stats
+
+    def sample_shadow(self):
+        """(ModelVersion, ShadowStats) when this request should be mirrored, else None."""
+        shadow = self._shadow
+        if shadow is None or random.random() >= shadow[1].rate:
+            return None
+        return shadow
+
+    def retire(self, version):
+        mv = self.get(version)
+        with self._lock:
+            if mv is self.active or (self._shadow is not None and self._shadow[0] is mv):
+                raise ValueError(f"{version} is in use as the active or shadow {self.task} version")
+            del self.versions[version]
+            if self.previous is mv:
+                self.previous = None
+        # requests still holding mv finish on it; the weights go with the last reference
+
+    def _prune(self, keep=None):
+        with self._lock:
+            in_use = {self.active, self._shadow[0] if self._shadow else None, keep}
+            for version in [v for v, mv in self.versions.items() if mv not in in_use]:
+                if len(self.versions) <= self.max_versions:
+                    break
+                if self.previous is self.versions[version]:
+                    self.previous = None
+                del self.versions[version]
+
+    def info(self):
+        shadow = self._shadow
+        return {
+            "active": self.active.version if self.active else None,
+            "previous": self.previous.version if self.previous else None,
+            "versions": {v: mv.info() for v, mv in list(self.versions.items())},
+            "shadow": shadow[1].info() if shadow else None,
+            "loads": dict(self.loads),
+        }
@@ -0,0 +1,186 @@
+# backend/app/crossbreed_engine.py
+"""
+Crossbreed lookups over breed_cross_info.json, indexed by breed class id.
+
+The table is loaded once into dense, symmetric (K, K) arrays aligned with
+cattle_model.CLASS_NAMES: numeric columns as float arrays, categorical columns as
+integer codes into a per-column vocabulary. Expected hybrid traits are
+probability-weighted over both parents' full softmax vectors, so a single pair is
+pa @ M @ pb and N x M pairs are one matrix product.
+"""
+import json
+import re
+import threading
+
+import numpy as np
+
+from .core import config
+from .static_data import BREED_CLASS_NAMES, BREED_STATIC_DATA
+
+NUMERIC_FIELDS = ["estimated_milk_yield_l_per_year"]
+CATEGORICAL_FIELDS = ["disease_resistance", "calf_size", "calf_temperament", "recommended_use_case"]
+# ordinal scores let categorical traits be optimised as numbers (see herd mating)
+ORDINAL_SCORES = {
+    "disease_resistance": {"Low": 0.0, "Medium": 0.5, "High": 1.0},
+    "calf_size": {"Small": 0.0, "Medium": 0.5, "Medium-Large": 0.75, "Large": 1.0},
+}
+
+
+def _norm(name):
+    return re.sub(r"[^a-z]", "", name.lower())
+
+
+def _aliases(class_name):
+    # model labels ("ayshire", "RedDane") and table names ("Ayrshire", "Red Dane",
+    # "Holstein") differ; match on the label and on the static display name
+    names = {_norm(class_name)}
+    display = BREED_STATIC_DATA.get(class_name.lower(), {}).get("breed")
+    if display:
+        names.add(_norm(display))
+        names.add(_norm(display.split()[0]))
+    return names
+
+
+def _parse_number(value):
+    if value is None:
+        return np.nan
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return np.nan
+
+
+class CrossbreedEngine:
+    def __init__(self, table, class_names=BREED_CLASS_NAMES):
+        self.class_names = list(class_names)
+        K = len(self.class_names)
+        lookup = {}
+        for idx, name in enumerate(self.class_names):
+            for alias in _aliases(name):
+                lookup[alias] = idx
+        self.class_index = lookup
+
+        self.numeric = {f: np.full((K, K), np.nan) for f in NUMERIC_FIELDS}
+        self.vocab = {f: [] for f in CATEGORICAL_FIELDS}
+        self.codes = {f: np.full((K, K), -1, dtype=np.int64) for f in CATEGORICAL_FIELDS}
+        self.rows = [[None] * K for _ in range(K)]
+
+        for key, info in table.items():
+            parents = info.get("parents") or [p.strip() for p in key.split(" x ")]
+            try:
+                i, j = (lookup[_norm(p)] for p in parents)
+            except KeyError:
+                continue  # pair for a breed the model doesn't predict
+            self.rows[i][j] = info
+            for f in NUMERIC_FIELDS:
+                self.numeric[f][i, j] = _parse_number(info.get(f))
+            for f in CATEGORICAL_FIELDS:
+                value = info.get(f)
+                if value is None:
+                    continue
+                if value not in self.vocab[f]:
+                    self.vocab[f].append(value)
+                self.codes[f][i, j] = self.vocab[f].index(value)
+
+        self._symmetrize()
+        # one-hot (K, K, V) per categorical column for vectorised distributions
+        self.onehot = {}
+        for f in CATEGORICAL_FIELDS:
+            V = len(self.vocab[f])
+            onehot = np.zeros((K, K, V))
+            ii, jj = np.nonzero(self.codes[f] >= 0)
+            onehot[ii, jj, self.codes[f][ii, jj]] = 1.0
+            self.onehot[f] = onehot
+        self.ordinal = {}
+        for f, scores in ORDINAL_SCORES.items():
+            table_scores = np.array([scores.get(v, np.nan) for v in self.vocab[f]] or [np.nan])
+            self.ordinal[f] = np.where(
+                self.codes[f] >= 0, table_scores[np.clip(self.codes[f], 0, None)], np.nan
+            )
+
+    def _symmetrize(self):
+        for f, m in self.numeric.items():
+            both = ~np.isnan(m) & ~np.isnan(m.T)
+            avg = np.where(both, (m + m.T) / 2.0, np.where(np.isnan(m), m.T, m))
+            self.numeric[f] = avg
+        for f, c in self.codes.items():
+            self.codes[f] = np.where(c >= 0, c, c.T)
+        K = len(self.class_names)
+        for i in range(K):
+            for j in range(K):
+                if self.rows[i][j] is None:
+                    self.rows[i][j] = self.rows[j][i]
+
+    # -------------------------------------------------
+    # Lookups
+    # -------------------------------------------------
+    def index(self, label):
+        return self.class_index.get(_norm(label))
+
+    def pair_info(self, a, b):
+        """Table row for two class ids (or labels); None when the pair isn't in the table."""
+        i = a if isinstance(a, int) else self.index(a)
+        j = b if isinstance(b, int) else self.index(b)
+        if i is None or j is None:
+            return None
+        return self.rows[i][j]
+
+    @staticmethod
+    def _weighted(matrix, pa, pb):
+        # probability mass on pairs with no value is dropped and the rest renormalised
+        mask = ~np.isnan(matrix)
+        values = np.where(mask, matrix, 0.0)
+        num = pa @ values @ pb.T
+        den = pa @ mask.astype(float) @ pb.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(den > 0, num / den, np.nan)
+
+    def expected_numeric(self, field, probs_a, probs_b):
+        """(N, K) x (M, K) parent probabilities -> (N, M) expected value of a numeric column."""
+        pa = np.atleast_2d(np.asarray(probs_a, dtype=float))
+        pb = np.atleast_2d(np.asarray(probs_b, dtype=float))
+        return self._weighted(self.numeric[field], pa, pb)
+
+    def expected_ordinal(self, field, probs_a, probs_b):
+        """(N, M) expected 0..1 score of an ordinal categorical column."""
+        pa = np.atleast_2d(np.asarray(probs_a, dtype=float))
+        pb = np.atleast_2d(np.asarray(probs_b, dtype=float))
+        return self._weighted(self.ordinal[field], pa, pb)
+
+    def distribution(self, field, probs_a, probs_b):
+        """(N, M, V) probability of each vocabulary value of a categorical column."""
+        pa = np.atleast_2d(np.asarray(probs_a, dtype=float))
+        pb = np.atleast_2d(np.asarray(probs_b, dtype=float))
+        return np.einsum("ni,ijv,mj->nmv", pa, self.onehot[field], pb)
+
+    def expected_traits(self, probs_a, probs_b):
+        """Probability-weighted hybrid traits for one pair of softmax vectors."""
+        traits = {}
+        for f in NUMERIC_FIELDS:
+            value = float(self.expected_numeric(f, probs_a, probs_b)[0, 0])
+            traits[f"expected_{f}"] = None if np.isnan(value) else round(value, 1)
+        for f in CATEGORICAL_FIELDS:
+            dist = self.distribution(f, probs_a, probs_b)[0, 0]
+            traits[f"{f}_distribution"] = {
+                v: round(float(p), 4) for v, p in zip(self.vocab[f], dist) if p > 0
+            }
+            traits[f"most_likely_{f}"] = self.vocab[f][int(dist.argmax())] if dist.sum() > 0 else None
+        return traits
+
+
+# -------------------------------------------------
+# Shared instance
+# -------------------------------------------------
+_engine = None
+_lock = threading.Lock()
+
+
+def get_engine(path=None):
+    """Load breed_cross_info.json once per process."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                with open(path or config.CROSS_INFO_PATH, encoding="utf-8") as f:
+                    _engine = CrossbreedEngine(json.load(f))
+    return _engine
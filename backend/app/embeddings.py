@@ -0,0 +1,552 @@
+# backend/app/embeddings.py
+"""
+Similarity index over breed-model embeddings.
+
+The breed model's EfficientNet backbone ends in a pooled feature vector (1536-d
+for B3) that the classifier head consumes; cattle_model.embed_tensors returns it
+L2-normalised, together with the breed prediction from the same pass. The index
+stores those vectors compactly and answers top-k cosine queries for duplicate
+uploads, near-identical burst shots and re-identification of animals seen before.
+
+An index is a directory:
+    index.json          dim, dtype, row count, capacity, model version, generation
+    vectors.<gen>.bin   rows of float16, or int8 with a float32 scale per row in scales.<gen>.bin
+    ids.<gen>.jsonl     one [id, metadata] line per row
+    ivf.<gen>.npz       coarse centroids and their row ranges, once `build` has run
+The row files are memory-mapped: the page cache keeps the hot rows, and every
+worker process on a node shares them. Rows are appended in place (files grow by
+doubling); writers across processes are serialised with a lock file, and
+index.json is replaced last, so readers only ever see whole rows.
+
+Until `build` runs, a query scans every row (about 50-90 ms at 200k x 1536).
+build clusters the rows around 4 * sqrt(N) centroids and stores them grouped by
+centroid; a query then scans the nprobe nearest groups (about 1% of the rows with
+the defaults) plus the rows added since the build (about 12-15 ms at 200k). The
+server starts a build in the background once CATTLE_EMBED_AUTO_BUILD_ROWS rows are
+enrolled and again whenever over a quarter of the rows are unindexed; info()
+reports "built" and "unindexed".
+
+    cd backend
+    python -m app.embeddings enroll --index /data/herd-index /data/herd-photos
+    python -m app.embeddings build --index /data/herd-index
+    python -m app.embeddings search --index /data/herd-index photo.jpg -k 5
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from app.core import config
+from app.core.registry import file_version
+from app.quantization import _image_files, _read
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads in this process are serialised
+    fcntl = None
+
+logger = logging.getLogger("uvicorn.error")
+
+DTYPES = {"float16": np.float16, "int8": np.int8}
+# rows decoded to float32 per matrix product when scanning
+BLOCK_ROWS = 32768
+# sampled rows per centroid when training the coarse quantiser
+SAMPLES_PER_CENTROID = 32
+
+HEADER = "index.json"
+LOCK = "index.lock"
+
+_View = namedtuple("_View", "count indexed vectors scales ids centroids offsets model_version")
+
+
+def _due(header, min_rows):
+    # a build pays off once the brute-force tail is a sizeable share of the rows;
+    # rebuilding at each 4/3 growth keeps the total build work linear in the rows
+    count = header["count"] if header else 0
+    return bool(min_rows) and count >= min_rows and 4 * (count - header["indexed"]) > count
+
+
+def embedding_version(checkpoint):
+    """
+    Index stamp for embeddings from checkpoint. Only the backbone's own file names
+    it: a cascade student, its threshold or an INT8 backend change the served breed
+    version but not a single embedding.
+    """
+    return file_version(checkpoint)
+
+
+def normalize(vectors):
+    """Rows scaled to unit length, as float32 (N, D)."""
+    v = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+
+
+def _quantize(vectors, dtype):
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    # symmetric per-row scale: a row's dot product is its int8 dot product times its scale
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    rows = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return rows, scales.astype(np.float32)
+
+
+def _merge(best, rows, scores, k):
+    # best: (rows, scores) of the k highest so far; keeps the k highest of both
+    rows = np.concatenate([best[0], rows])
+    scores = np.concatenate([best[1], scores])
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[top], scores[top]
+    return rows, scores
+
+
+def _nearest(x, centroids):
+    return np.concatenate([
+        np.argmax(x[i:i + BLOCK_ROWS] @ centroids.T, axis=1) for i in range(0, len(x), BLOCK_ROWS)
+    ]) if len(x) else np.empty(0, dtype=np.int64)
+
+
+def _kmeans(x, k, iters, rng):
+    """Spherical k-means: unit-length centroids, assignment by cosine similarity."""
+    centroids = x[rng.choice(len(x), size=k, replace=False)]
+    for _ in range(iters):
+        assign = _nearest(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        sums = np.empty_like(centroids)
+        filled = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums[filled] = np.add.reduceat(x[order], starts, axis=0)
+        # an empty cluster restarts from a random row
+        sums[~filled] = x[rng.choice(len(x), size=int((~filled).sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def _check_version(held, given):
+    # embeddings of different checkpoints live in different spaces and never compare
+    if None not in (held, given) and held != given:
+        raise ValueError(f"Index holds embeddings of {held}, not {given}; re-enroll into a new index")
+
+
+def first_duplicates(vectors, threshold):
+    """
+    For each row, the index of the first earlier row it is a near-duplicate of
+    (cosine >= threshold, followed through chains so a burst maps to its first
+    shot), or -1. One matrix product over the batch.
+    """
+    v = normalize(vectors)
+    n = len(v)
+    if n < 2:
+        return np.full(n, -1)
+    sims = v @ v.T
+    sims[np.triu_indices(n)] = -np.inf
+    best = np.argmax(sims, axis=1)
+    dup = np.where(sims[np.arange(n), best] >= threshold, best, -1)
+    for i in range(n):
+        if dup[i] >= 0 and dup[dup[i]] >= 0:
+            dup[i] = dup[dup[i]]
+    return dup
+
+
+class SimilarityIndex:
+    """
+    Append-only top-k cosine index in a directory (created on the first add).
+    Vectors are normalised on the way in, so scores are cosine similarities.
+    Every vector must come from the model version the index was started with.
+    """
+
+    def __init__(self, path, dtype="float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown index dtype {dtype!r}, expected one of {tuple(DTYPES)}")
+        self.path = path
+        self.dtype = dtype
+        self.header = None
+        self._stamp = None
+        self._ids = []
+        self._ids_offset = 0
+        self._view = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def _file(self, name, generation=None):
+        if generation is None:
+            return os.path.join(self.path, name)
+        stem, ext = os.path.splitext(name)
+        return os.path.join(self.path, f"{stem}.{generation}{ext}")
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._file(LOCK), "a") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # another process may have appended or rebuilt since we last looked
+                    self.refresh()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---------------------------------------------
+    # Reading
+    # ---------------------------------------------
+    def refresh(self):
+        """Pick up rows written by other processes (one stat when nothing changed)."""
+        try:
+            st = os.stat(self._file(HEADER))
+        except FileNotFoundError:
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            with open(self._file(HEADER)) as f:
+                header = json.load(f)
+            self._stamp = stamp
+            self._open(header)
+
+    def _open(self, header):
+        gen = header["generation"]
+        if self.header is None or self.header["generation"] != gen:
+            # a rebuild reorders every row: read the ids again from the start
+            self._ids, self._ids_offset = [], 0
+        self.header = header
+        self.dtype = header["dtype"]
+        count, capacity, dim = header["count"], header["capacity"], header["dim"]
+        vectors = scales = None
+        if capacity:
+            # read-only maps as plain arrays: memmap's own indexing adds per-call overhead
+            vectors = np.asarray(np.memmap(self._file("vectors.bin", gen), dtype=DTYPES[self.dtype],
+                                           mode="r", shape=(capacity, dim)))
+            if self.dtype == "int8":
+                scales = np.asarray(np.memmap(self._file("scales.bin", gen), dtype=np.float32,
+                                              mode="r", shape=(capacity,)))
+        # only the first count lines are committed; a crashed writer may have left more
+        with open(self._file("ids.jsonl", gen), "rb") as f:
+            f.seek(self._ids_offset)
+            while len(self._ids) < count:
+                self._ids.append(json.loads(f.readline()))
+            self._ids_offset = f.tell()
+        centroids = offsets = None
+        if header["indexed"]:
+            with np.load(self._file("ivf.npz", gen)) as ivf:
+                centroids, offsets = ivf["centroids"], ivf["offsets"]
+        # one reference swap: concurrent searches see the old view or the new one
+        self._view = _View(count, header["indexed"], vectors, scales, self._ids,
+                           centroids, offsets, header["model_version"])
+
+    def __len__(self):
+        view = self._view
+        return view.count if view else 0
+
+    def _scores(self, view, lo, hi, queries):
+        # (Q, hi - lo) cosine similarities of queries against rows [lo, hi)
+        scores = queries @ np.asarray(view.vectors[lo:hi], dtype=np.float32).T
+        if view.scales is not None:
+            scores *= view.scales[lo:hi]
+        return scores
+
+    def _scan(self, view, lo, hi, queries, best, k):
+        for start in range(lo, hi, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, hi)
+            scores = self._scores(view, start, stop, queries)
+            rows = np.arange(start, stop)
+            for j in range(len(queries)):
+                best[j] = _merge(best[j], rows, scores[j], k)
+
+    def search(self, queries, k=10, nprobe=None, model_version=None):
+        """
+        Top-k rows per query: a list (one per query) of {"id", "score", "metadata"},
+        best first. nprobe centroid groups are scanned once the index is built.
+        """
+        self.refresh()
+        view = self._view
+        queries = normalize(queries)
+        if view is None or view.count == 0 or k <= 0:
+            return [[] for _ in queries]
+        _check_version(view.model_version, model_version)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        best = [empty] * len(queries)
+        # rows added since the last build are always scanned in full
+        self._scan(view, view.indexed, view.count, queries, best, k)
+        if view.indexed:
+            nprobe = min(nprobe or config.EMBED_NPROBE, len(view.centroids))
+            coarse = queries @ view.centroids.T
+            probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+            for j, groups in enumerate(probes):
+                # the probed groups are contiguous row ranges: gather them for one product
+                rows = np.concatenate([np.arange(view.offsets[c], view.offsets[c + 1]) for c in groups])
+                if len(rows):
+                    best[j] = _merge(best[j], rows, self._decoded(view, rows) @ queries[j], k)
+        results = []
+        for rows, scores in best:
+            order = np.argsort(-scores)
+            results.append([
+                {"id": view.ids[r][0], "score": float(s), "metadata": view.ids[r][1]}
+                for r, s in zip(rows[order].tolist(), scores[order].tolist())
+            ])
+        return results
+
+    # ---------------------------------------------
+    # Writing
+    # ---------------------------------------------
+    def _write_header(self, header):
+        tmp = self._file(HEADER + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(header, f)
+        os.replace(tmp, self._file(HEADER))
+
+    def _grow(self, header, capacity):
+        # growing never moves existing rows, so maps held by running searches stay valid
+        gen = header["generation"]
+        itemsize = np.dtype(DTYPES[header["dtype"]]).itemsize
+        files = [(self._file("vectors.bin", gen), header["dim"] * itemsize)]
+        if header["dtype"] == "int8":
+            files.append((self._file("scales.bin", gen), 4))
+        for path, row_bytes in files:
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        header["capacity"] = capacity
+
+    def add(self, ids, vectors, metadata=None, model_version=None):
+        """Append rows; ids need not be unique (e.g. several photos of one animal)."""
+        vectors = normalize(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} vectors")
+        metadata = metadata if metadata is not None else [None] * len(ids)
+        with self._write_lock():
+            header = dict(self.header) if self.header else {
+                "dim": vectors.shape[1], "dtype": self.dtype, "count": 0, "capacity": 0,
+                "indexed": 0, "nlist": 0, "generation": 0, "model_version": model_version,
+            }
+            if vectors.shape[1] != header["dim"]:
+                raise ValueError(f"Index holds {header['dim']}-d vectors, got {vectors.shape[1]}-d")
+            _check_version(header["model_version"], model_version)
+            gen, start = header["generation"], header["count"]
+            stop = start + len(vectors)
+            if stop > header["capacity"]:
+                self._grow(header, max(stop, 2 * header["capacity"], 1024))
+            rows, scales = _quantize(vectors, header["dtype"])
+            out = np.memmap(self._file("vectors.bin", gen), dtype=DTYPES[header["dtype"]],
+                            mode="r+", shape=(header["capacity"], header["dim"]))
+            out[start:stop] = rows
+            out.flush()
+            if scales is not None:
+                out = np.memmap(self._file("scales.bin", gen), dtype=np.float32,
+                                mode="r+", shape=(header["capacity"],))
+                out[start:stop] = scales
+                out.flush()
+            with open(self._file("ids.jsonl", gen), "ab") as f:
+                # drop lines a crashed writer left past the committed rows
+                f.truncate(self._ids_offset)
+                f.writelines(
+                    (json.dumps([i, m]) + "\n").encode() for i, m in zip(ids, metadata)
+                )
+            header["count"] = stop
+            self._write_header(header)
+            self._stamp = None
+            self.refresh()
+        return stop
+
+    @staticmethod
+    def _decoded(view, rows):
+        # rows: a slice or an index array; float32 vectors as stored (up to rounding)
+        out = np.asarray(view.vectors[rows], dtype=np.float32)
+        return out * view.scales[rows][:, None] if view.scales is not None else out
+
+    def build(self, nlist=None, iters=10, seed=0, min_rows=None):
+        """
+        Cluster every row around nlist centroids (default 4 * sqrt(N)) and rewrite the
+        rows grouped by centroid under a new generation. Searches keep running on
+        the old files until the new header is in place; adds wait. With min_rows,
+        only builds if one is still due once the lock is held (another process may
+        just have built).
+        """
+        with self._write_lock():
+            view = self._view
+            if view is None or view.count == 0:
+                raise ValueError(f"Index {self.path} is empty")
+            if min_rows is not None and not _due(self.header, min_rows):
+                return self.info()
+            header = dict(self.header)
+            n, dim = view.count, header["dim"]
+            nlist = max(1, min(nlist or int(round(4 * np.sqrt(n))), n))
+            rng = np.random.default_rng(seed)
+            sample = np.sort(rng.choice(n, size=min(n, nlist * SAMPLES_PER_CENTROID), replace=False))
+            centroids = _kmeans(normalize(self._decoded(view, sample)), nlist, iters, rng)
+            assign = np.concatenate([
+                _nearest(normalize(self._decoded(view, slice(lo, min(lo + BLOCK_ROWS, n)))), centroids)
+                for lo in range(0, n, BLOCK_ROWS)
+            ])
+            order = np.argsort(assign, kind="stable")
+            offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+
+            gen = header["generation"] + 1
+            header.update(generation=gen, capacity=0, indexed=n, nlist=nlist)
+            self._grow(header, max(n, 1024))
+            vectors = np.memmap(self._file("vectors.bin", gen), dtype=DTYPES[header["dtype"]],
+                                mode="r+", shape=(header["capacity"], dim))
+            scales = None
+            if view.scales is not None:
+                scales = np.memmap(self._file("scales.bin", gen), dtype=np.float32,
+                                   mode="r+", shape=(header["capacity"],))
+            for lo in range(0, n, BLOCK_ROWS):
+                rows = order[lo:lo + BLOCK_ROWS]
+                vectors[lo:lo + len(rows)] = view.vectors[rows]
+                if scales is not None:
+                    scales[lo:lo + len(rows)] = view.scales[rows]
+            vectors.flush()
+            if scales is not None:
+                scales.flush()
+            with open(self._file("ids.jsonl", gen), "w") as f:
+                f.writelines(json.dumps(view.ids[r]) + "\n" for r in order.tolist())
+            np.savez(self._file("ivf.npz", gen), centroids=centroids.astype(np.float32), offsets=offsets)
+            self._write_header(header)
+            self._stamp = None
+            self.refresh()
+            for name in ("vectors.bin", "scales.bin", "ids.jsonl", "ivf.npz"):
+                # readers still mapping the old files keep them until they let go (POSIX)
+                with contextlib.suppress(OSError):
+                    os.remove(self._file(name, gen - 1))
+        return self.info()
+
+    def needs_build(self, min_rows):
+        self.refresh()
+        return _due(self.header, min_rows)
+
+    def info(self):
+        header = dict(self.header or {})
+        header["built"] = bool(header.get("nlist"))
+        header["unindexed"] = header.get("count", 0) - header.get("indexed", 0)
+        header["path"] = self.path
+        header["bytes"] = sum(
+            os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path)
+        ) if os.path.isdir(self.path) else 0
+        return header
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_index():
+    """The server's index at CATTLE_EMBED_INDEX_DIR, opened once per process."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = SimilarityIndex(config.EMBED_INDEX_DIR, config.EMBED_INDEX_DTYPE)
+    return _shared
+
+
+_building = threading.Lock()
+
+
+def build_when_due(index, min_rows=None):
+    """
+    Start index.build on a background thread when one is due (see _due) and none is
+    running in this process; True if one was started. Adds wait for it, searches don't.
+    """
+    min_rows = config.EMBED_AUTO_BUILD_ROWS if min_rows is None else min_rows
+    if not index.needs_build(min_rows) or not _building.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            info = index.build(min_rows=min_rows)
+            logger.info("Built embedding index %s: %s rows, %s groups", index.path, info["count"], info["nlist"])
+        except Exception:
+            logger.exception("Building embedding index %s failed", index.path)
+        finally:
+            _building.release()
+
+    threading.Thread(target=run, name="embed-index-build", daemon=True).start()
+    return True
+
+
+# -------------------------------------------------
+# Command line
+# -------------------------------------------------
+def _embed_paths(model, device, paths, batch_size):
+    import torch
+    from app import cattle_model
+    from app.preprocessing import BatchBuffer, BreedPreprocessor
+
+    pre = BreedPreprocessor(size=300)
+    buffer = BatchBuffer()
+    out = []
+    for i in range(0, len(paths), batch_size):
+        chunk = paths[i:i + batch_size]
+        x = pre.batch([_read(p) for p in chunk], out=buffer.take(len(chunk), (3, pre.size, pre.size)))
+        out.append(cattle_model.embed_tensors(model, device, torch.from_numpy(x))[0])
+    return np.concatenate(out)
+
+
+def main(argv=None):
+    from app import cattle_model
+    from app.core.model_loader import BREED_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Enroll, build and query a breed-embedding similarity index")
+    parser.add_argument("--index", default=config.EMBED_INDEX_DIR, help="index directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enroll = sub.add_parser("enroll", help="embed a folder of images and add them (id = path under the folder)")
+    enroll.add_argument("images")
+    enroll.add_argument("--dtype", choices=tuple(DTYPES), default=config.EMBED_INDEX_DTYPE,
+                        help="storage for a new index")
+    search = sub.add_parser("search", help="nearest enrolled images to each query image")
+    search.add_argument("images", nargs="+")
+    search.add_argument("-k", type=int, default=5)
+    search.add_argument("--nprobe", type=int, default=None)
+    build = sub.add_parser("build", help="cluster the rows so queries scan only the closest groups")
+    build.add_argument("--nlist", type=int, default=None, help="centroids (default 4 * sqrt of the row count)")
+    build.add_argument("--iters", type=int, default=10)
+    sub.add_parser("info", help="print the index header")
+    for cmd in (enroll, search):
+        cmd.add_argument("--checkpoint", default=BREED_MODEL_PATH, help="breed model")
+        cmd.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    if args.command in ("build", "info"):
+        index = SimilarityIndex(args.index)
+        if not len(index):
+            parser.error(f"no index at {args.index}")
+        info = index.build(args.nlist, args.iters) if args.command == "build" else index.info()
+        print(json.dumps(info, indent=2))
+        return 0
+
+    model, device, _ = cattle_model.load_model(args.checkpoint)
+    version = embedding_version(args.checkpoint)
+    if args.command == "enroll":
+        paths = _image_files(args.images, 0)
+        if not paths:
+            parser.error(f"no images found under {args.images}")
+        index = SimilarityIndex(args.index, args.dtype)
+        for i in range(0, len(paths), 1024):
+            chunk = paths[i:i + 1024]
+            index.add(
+                [os.path.relpath(p, args.images) for p in chunk],
+                _embed_paths(model, device, chunk, args.batch_size),
+                model_version=version,
+            )
+            print(f"{len(index)} rows", file=sys.stderr)
+        print(json.dumps(index.info(), indent=2))
+    else:
+        index = SimilarityIndex(args.index)
+        hits = index.search(_embed_paths(model, device, args.images, args.batch_size),
+                            args.k, args.nprobe, model_version=version)
+        for path, found in zip(args.images, hits):
+            print(json.dumps({"image": path, "neighbors": found}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# backend/app/herd_scan.py
+"""
+Offline herd scan: classify every image under a directory tree (or listed in a
+manifest) without going through the HTTP API.
+
+Pipeline: decoder processes -> bounded in-flight window -> batched inference in
+this process -> writer thread. Progress is checkpointed to <output>.done so an
+interrupted run picks up where it stopped.
+
+    cd backend
+    python -m app.herd_scan /data/camera_dump -o audit.jsonl --task both --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.preprocessing import BatchBuffer, BreedPreprocessor, disease_array
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+FIELDS = [
+    "path",
+    "breed_class",
+    "breed_confidence",
+    "disease_class",
+    "disease_confidence",
+    "error",
+]
+
+
+# -------------------------------------------------
+# Inputs
+# -------------------------------------------------
+def iter_paths(inputs):
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name.lower())[1] in IMAGE_EXTENSIONS:
+                        yield os.path.join(root, name)
+        elif item.lower().endswith((".txt", ".lst", ".manifest")):
+            # manifest: one image path per line, relative paths resolved against the manifest
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        yield line if os.path.isabs(line) else os.path.join(base, line)
+        else:
+            yield item
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+# -------------------------------------------------
+# Decode stage (runs in worker processes)
+# -------------------------------------------------
+_breed_pre = None
+
+
+def _decode_one(path, want_breed, disease_shape):
+    global _breed_pre
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        breed = None
+        disease = None
+        if want_breed:
+            if _breed_pre is None:
+                _breed_pre = BreedPreprocessor(size=300)
+            breed = _breed_pre.from_bytes(data)
+        if disease_shape is not None:
+            disease = disease_array(data, disease_shape)
+        return path, breed, disease, None
+    except Exception as e:
+        return path, None, None, f"decode failed: {e}"
+
+
+def decoded(paths, executor, window, want_breed, disease_shape):
+    # at most `window` images are in flight or waiting, whatever the input size
+    pending = deque()
+    for path in paths:
+        pending.append(executor.submit(_decode_one, path, want_breed, disease_shape))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# -------------------------------------------------
+# Writer stage
+# -------------------------------------------------
+class Writer(threading.Thread):
+    def __init__(self, output, fmt, checkpoint_path, max_pending=8):
+        super().__init__(daemon=True)
+        self.output = output
+        self.fmt = fmt
+        self.checkpoint_path = checkpoint_path
+        self.rows = queue.Queue(maxsize=max_pending)
+        self.error = None
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.error = e
+            # keep draining so the producer never blocks on a dead writer
+            while self.rows.get() is not None:
+                pass
+
+    def _run(self):
+        done = open(self.checkpoint_path, "a")
+        part = 0
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            os.makedirs(self.output, exist_ok=True)
+            part = len([n for n in os.listdir(self.output) if n.endswith(".parquet")])
+            out = None
+        else:
+            exists = os.path.exists(self.output) and os.path.getsize(self.output) > 0
+            out = open(self.output, "a", newline="")
+            writer = csv.DictWriter(out, fieldnames=FIELDS) if self.fmt == "csv" else None
+            if writer is not None and not exists:
+                writer.writeheader()
+        try:
+            while True:
+                batch = self.rows.get()
+                if batch is None:
+                    break
+                if self.fmt == "parquet":
+                    table = pa.Table.from_pylist(batch)
+                    pq.write_table(table, os.path.join(self.output, f"part-{part:05d}.parquet"))
+                    part += 1
+                elif writer is not None:
+                    writer.writerows(batch)
+                else:
+                    out.writelines(json.dumps(row) + "\n" for row in batch)
+                if out is not None:
+                    out.flush()
+                # checkpoint only after the rows are on disk
+                done.writelines(row["path"] + "\n" for row in batch)
+                done.flush()
+        finally:
+            done.close()
+            if out is not None:
+                out.close()
+
+
+# -------------------------------------------------
+# Inference stage
+# -------------------------------------------------
+def _load_models(task, breed_checkpoint, disease_checkpoint, breed_backend="eager"):
+    breed = disease = None
+    if task in ("breed", "both"):
+        from app import breed_backends, cattle_model
+        model, device, _ = cattle_model.load_model(breed_checkpoint)
+        backend = breed_backends.build_backend(
+            breed_backend, model, device,
+            onnx_path=os.path.splitext(breed_checkpoint)[0] + ".onnx",
+            source_path=breed_checkpoint,
+        )
+        breed = (backend, device)
+    if task in ("disease", "both"):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model as load_tf_model
+        model = load_tf_model(disease_checkpoint)
+        _, H, W, C = model.input_shape
+        fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec([None, H, W, C], tf.float32)],
+        )
+        disease = (lambda x: fn(x).numpy(), (H, W, C))
+    return breed, disease
+
+
+# decoded images arrive from the worker processes one array each; batches are stacked
+# into these reused arrays (inference runs on the main thread only)
+_batches = {"breed": BatchBuffer(), "disease": BatchBuffer()}
+
+
+def _stack(name, arrays):
+    return np.stack(arrays, out=_batches[name].take(len(arrays), arrays[0].shape))
+
+
+def infer_batch(items, breed, disease):
+    rows = []
+    ok = [item for item in items if item[3] is None]
+    breed_preds = disease_preds = [None] * len(ok)
+    if ok and breed is not None:
+        import torch
+        from app import cattle_model
+        model, device = breed
+        breed_preds = cattle_model.predict_tensors(
+            model, device, torch.from_numpy(_stack("breed", [item[1] for item in ok]))
+        )
+    if ok and disease is not None:
+        from app.utils import predict_disease_batch
+        disease_preds = predict_disease_batch(disease[0], _stack("disease", [item[2] for item in ok]))
+    results = {item[0]: (b, d) for item, b, d in zip(ok, breed_preds, disease_preds)}
+    for path, _, _, error in items:
+        row = dict.fromkeys(FIELDS)
+        row["path"] = path
+        row["error"] = error
+        if error is None:
+            b, d = results[path]
+            if b is not None:
+                row["breed_class"], row["breed_confidence"] = b[0], round(b[1], 6)
+            if d is not None:
+                row["disease_class"], row["disease_confidence"] = d[0], round(d[1], 6)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    from app.core.model_loader import BREED_MODEL_PATH, DISEASE_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("inputs", nargs="+", help="image directories, manifest files (.txt) or image paths")
+    parser.add_argument("-o", "--output", required=True, help="output file (.jsonl/.csv) or directory (parquet)")
+    parser.add_argument("--format", choices=["jsonl", "csv", "parquet"], default=None)
+    parser.add_argument("--task", choices=["breed", "disease", "both"], default="breed")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--queue-size", type=int, default=None, help="max decoded images in flight")
+    parser.add_argument("--breed-checkpoint", default=BREED_MODEL_PATH)
+    parser.add_argument("--disease-checkpoint", default=DISEASE_MODEL_PATH)
+    parser.add_argument("--breed-backend", default="eager", help="eager, eager_opt, torchscript or onnx")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and rescan everything")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    checkpoint_path = args.output.rstrip("/\\") + ".done"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    done = load_checkpoint(checkpoint_path)
+    paths = (p for p in iter_paths(args.inputs) if p not in done)
+
+    breed, disease = _load_models(
+        args.task, args.breed_checkpoint, args.disease_checkpoint, args.breed_backend
+    )
+    disease_shape = disease[1] if disease is not None else None
+    window = args.queue_size or args.batch_size * 4
+
+    writer = Writer(args.output, fmt, checkpoint_path)
+    writer.start()
+    start = last_report = time.perf_counter()
+    count = errors = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            batch = []
+            stream = decoded(paths, executor, window, breed is not None, disease_shape)
+            for item in stream:
+                batch.append(item)
+                if len(batch) < args.batch_size:
+                    continue
+                rows = infer_batch(batch, breed, disease)
+                writer.rows.put(rows)
+                count += len(rows)
+                errors += sum(1 for r in rows if r["error"])
+                batch = []
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    last_report = now
+                    print(
+                        f"[herd_scan] {count} images, {count / (now - start):.1f} img/s, {errors} errors",
+                        file=sys.stderr,
+                    )
+            if batch:
+                rows = infer_batch(batch, breed, disease)
+                writer.rows.put(rows)
+                count += len(rows)
+                errors += sum(1 for r in rows if r["error"])
+    finally:
+        writer.rows.put(None)
+        writer.join()
+
+    if writer.error is not None:
+        raise writer.error
+    elapsed = time.perf_counter() - start
+    print(
+        f"[herd_scan] done: {count} images in {elapsed:.1f}s "
+        f"({count / elapsed if elapsed else 0:.1f} img/s), {errors} errors, "
+        f"{len(done)} skipped from checkpoint",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,504 @@
+# backend/app/jobs.py
+"""
+Durable scan jobs: POST /jobs queues every image of a manifest or archive in a
+local SQLite database, and worker processes lease batches of items, run them
+through the breed / disease models and write results back. No broker needed.
+
+    cd backend
+    python -m app.jobs worker --processes 4        # alongside the API
+    python -m app.jobs status <job id>
+
+Crash safety: a lease that isn't completed within CATTLE_JOBS_LEASE_S goes back
+to the queue, and an item is failed once it has been leased CATTLE_JOBS_MAX_ATTEMPTS
+times. Results are stored per (model, checkpoint version, image digest), so an image
+already classified (in this job or any earlier one) is never run again.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import uuid
+
+from app.core import config, cpu
+from app.preprocessing import BatchBuffer
+
+logger = logging.getLogger("uvicorn.error")
+
+TASKS = ("breed", "disease", "both")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    task TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    deduplicated INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    digest TEXT,
+    result TEXT,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS items_queue ON items (state, lease_until);
+CREATE TABLE IF NOT EXISTS results (
+    model TEXT NOT NULL,
+    version TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    label TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    PRIMARY KEY (model, version, digest)
+);
+"""
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def models_for(task):
+    return ("breed", "disease") if task == "both" else (task,)
+
+
+class JobStore:
+    """All job state lives in one SQLite file (WAL), shared by the API and the workers."""
+
+    def __init__(self, path=None):
+        self.path = path or config.JOBS_DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # autocommit; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _write(self):
+        # serialises writers across processes before any rows are read
+        self._db.execute("BEGIN IMMEDIATE")
+        return self._db
+
+    # -------------------------------------------------
+    # API side
+    # -------------------------------------------------
+    def create(self, job_id, task, items):
+        """items: [(name, path)] in result order."""
+        now = time.time()
+        db = self._write()
+        try:
+            db.execute(
+                "INSERT INTO jobs (id, task, status, total, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, task, "queued" if items else "done", len(items), now, now),
+            )
+            db.executemany(
+                "INSERT INTO items (job_id, seq, name, path) VALUES (?, ?, ?, ?)",
+                [(job_id, seq, name, path) for seq, (name, path) in enumerate(items)],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return self.get(job_id)
+
+    def get(self, job_id):
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = round(job["done"] / job["total"], 4) if job["total"] else 1.0
+        return job
+
+    def list(self, limit=50):
+        rows = self._db.execute("SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get(row["id"]) for row in rows]
+
+    def results(self, job_id, offset=0, limit=100):
+        """Items seq offset .. offset+limit-1 in upload order, with results where finished."""
+        rows = self._db.execute(
+            "SELECT seq, name, state, result FROM items WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+            (job_id, offset, limit),
+        ).fetchall()
+        return [
+            {"seq": r["seq"], "name": r["name"], "state": r["state"], **json.loads(r["result"] or "{}")}
+            for r in rows
+        ]
+
+    # -------------------------------------------------
+    # Worker side
+    # -------------------------------------------------
+    def lease(self, limit, lease_s, max_attempts):
+        """
+        Claim up to `limit` runnable items of the oldest job that has any: pending ones,
+        or leased ones whose lease ran out. Returns (job, [(seq, name, path)]) or None.
+        """
+        now = time.time()
+        db = self._write()
+        try:
+            finished = self._fail_exhausted(db, now, max_attempts)
+            row = db.execute(
+                "SELECT i.job_id FROM items i JOIN jobs j ON j.id = i.job_id "
+                "WHERE i.state = 'pending' OR (i.state = 'leased' AND i.lease_until < ?) "
+                "ORDER BY j.created LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                self._cleanup(finished)
+                return None
+            job_id = row["job_id"]
+            items = db.execute(
+                "SELECT seq, name, path FROM items WHERE job_id = ? "
+                "AND (state = 'pending' OR (state = 'leased' AND lease_until < ?)) ORDER BY seq LIMIT ?",
+                (job_id, now, limit),
+            ).fetchall()
+            db.executemany(
+                "UPDATE items SET state = 'leased', lease_until = ?, attempts = attempts + 1 "
+                "WHERE job_id = ? AND seq = ?",
+                [(now + lease_s, job_id, item["seq"]) for item in items],
+            )
+            db.execute(
+                "UPDATE jobs SET status = 'running', updated = ? WHERE id = ? AND status = 'queued'",
+                (now, job_id),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._cleanup(finished)
+        return self.get(job_id), [(r["seq"], r["name"], r["path"]) for r in items]
+
+    def _fail_exhausted(self, db, now, max_attempts):
+        rows = db.execute(
+            "SELECT job_id, seq, attempts FROM items WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+            (now, max_attempts),
+        ).fetchall()
+        finished = []
+        for row in rows:
+            error = {"error": f"gave up after {row['attempts']} attempts (worker crashed or timed out)"}
+            if self._finish_items(db, row["job_id"], [(row["seq"], None, error)], now):
+                finished.append(row["job_id"])
+        return finished
+
+    def known(self, model, version, digests):
+        """digest -> (label, confidence) for images this model version already classified."""
+        out = {}
+        digests = list(digests)
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            rows = self._db.execute(
+                "SELECT digest, label, confidence FROM results WHERE model = ? AND version = ? "
+                f"AND digest IN ({','.join('?' * len(chunk))})",
+                (model, version, *chunk),
+            ).fetchall()
+            out.update({r["digest"]: (r["label"], r["confidence"]) for r in rows})
+        return out
+
+    def complete(self, job_id, rows, new_results):
+        """
+        rows: [(seq, digest, result dict)] for leased items; new_results:
+        [(model, version, digest, label, confidence)]. One transaction.
+        """
+        now = time.time()
+        db = self._write()
+        try:
+            db.executemany(
+                "INSERT OR IGNORE INTO results (model, version, digest, label, confidence) VALUES (?, ?, ?, ?, ?)",
+                new_results,
+            )
+            finished = self._finish_items(db, job_id, rows, now)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if finished:
+            self._cleanup([job_id])
+
+    def _finish_items(self, db, job_id, rows, now):
+        done = errors = deduplicated = 0
+        for seq, item_digest, result in rows:
+            # only items still leased count: a late worker whose lease expired can't double count
+            cur = db.execute(
+                "UPDATE items SET state = ?, digest = ?, result = ?, lease_until = NULL "
+                "WHERE job_id = ? AND seq = ? AND state = 'leased'",
+                ("error" if result.get("error") else "done", item_digest, json.dumps(result), job_id, seq),
+            )
+            if cur.rowcount:
+                done += 1
+                errors += bool(result.get("error"))
+                deduplicated += bool(result.get("deduplicated"))
+        db.execute(
+            "UPDATE jobs SET done = done + ?, errors = errors + ?, deduplicated = deduplicated + ?, updated = ? "
+            "WHERE id = ?",
+            (done, errors, deduplicated, now, job_id),
+        )
+        cur = db.execute(
+            "UPDATE jobs SET status = 'done', finished = ? WHERE id = ? AND done >= total AND status != 'done'",
+            (now, job_id),
+        )
+        return bool(cur.rowcount)
+
+    @staticmethod
+    def _cleanup(job_ids):
+        # uploaded images are no longer needed once every result is committed
+        for job_id in job_ids:
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+
+
+def job_dir(job_id):
+    return os.path.join(config.JOBS_DIR, "spool", job_id)
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def manifest_paths(text):
+    """
+    Server-side image paths from a manifest (one per line, # comments). Only allowed
+    when CATTLE_JOBS_MANIFEST_ROOT is set, and every path must resolve under it.
+    """
+    if not config.JOBS_MANIFEST_ROOT:
+        raise ValueError("Manifests are disabled; set CATTLE_JOBS_MANIFEST_ROOT to allow them.")
+    root = os.path.realpath(config.JOBS_MANIFEST_ROOT)
+    paths = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        path = os.path.realpath(os.path.join(root, line))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Manifest path outside {config.JOBS_MANIFEST_ROOT}: {line}")
+        paths.append((line, path))
+    return paths
+
+
+# -------------------------------------------------
+# Worker
+# -------------------------------------------------
+class Worker:
+    """Leases batches from the store and classifies them; models load on first use."""
+
+    def __init__(self, store, batch_size=None, breed_checkpoint=None, disease_checkpoint=None,
+                 breed_backend="eager", threads=None):
+        from app.core.model_loader import BREED_MODEL_PATH, DISEASE_MODEL_PATH
+
+        self.store = store
+        # intra-op threads for both runtimes; None leaves them at their defaults
+        self.threads = threads
+        self.batch_size = batch_size or config.JOBS_BATCH_SIZE
+        self.checkpoints = {
+            "breed": breed_checkpoint or BREED_MODEL_PATH,
+            "disease": disease_checkpoint or DISEASE_MODEL_PATH,
+        }
+        self.breed_backend = breed_backend
+        self._models = {}
+        self.versions = {}
+        self._buffer = BatchBuffer()
+
+    def _model(self, name):
+        if name not in self._models:
+            from app.core.registry import file_version
+            from app.herd_scan import _load_models
+
+            if self.threads:
+                # before the first forward pass (torch) or model load (TF)
+                (cpu.configure_torch if name == "breed" else cpu.configure_tf)(self.threads)
+            breed, disease = _load_models(
+                name, self.checkpoints["breed"], self.checkpoints["disease"], self.breed_backend
+            )
+            self._models[name] = breed if name == "breed" else disease
+            self.versions[name] = file_version(self.checkpoints[name])
+        return self._models[name]
+
+    def _shape(self, name):
+        return (3, 300, 300) if name == "breed" else self._model("disease")[1]
+
+    def _preprocess(self, name, data, out):
+        from app.preprocessing import BreedPreprocessor, disease_array
+
+        if name == "breed":
+            if "breed_pre" not in self._models:
+                self._models["breed_pre"] = BreedPreprocessor(size=300)
+            return self._models["breed_pre"].from_bytes(data, out=out)
+        return disease_array(data, self._model("disease")[1], out=out)
+
+    def _infer(self, name, batch):
+        # batch: consecutive rows of the worker's decode buffer
+        if name == "breed":
+            import torch
+            from app import cattle_model
+
+            backend, device = self._model("breed")
+            return cattle_model.predict_tensors(backend, device, torch.from_numpy(batch))
+        from app.utils import predict_disease_batch
+
+        fn, _ = self._model("disease")
+        return predict_disease_batch(fn, batch)
+
+    def process(self, task, items):
+        """[(seq, name, path)] -> (rows for JobStore.complete, new results)."""
+        wanted = models_for(task)
+        for name in wanted:
+            self._model(name)
+        datas, digests, errors = {}, {}, {}
+        for seq, _, path in items:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                errors[seq] = f"read failed: {e}"
+                continue
+            digests[seq] = digest(data)
+            datas.setdefault(digests[seq], data)
+
+        known, fresh, failed = {}, {}, {}
+        for name in wanted:
+            version = self.versions[name]
+            for d, value in self.store.known(name, version, datas).items():
+                known[(name, d)] = value
+            # every image of the lease is decoded into one reused array, no copy per image
+            arrays, todo = self._buffer.take(len(datas), self._shape(name)), []
+            for d, data in datas.items():
+                if (name, d) in known or d in failed:
+                    continue
+                try:
+                    self._preprocess(name, data, out=arrays[len(todo)])
+                    todo.append(d)
+                except Exception as e:
+                    failed[d] = f"decode failed: {e}"
+            for start in range(0, len(todo), self.batch_size):
+                preds = self._infer(name, arrays[start:min(start + self.batch_size, len(todo))])
+                for d, (label, conf, _) in zip(todo[start:start + self.batch_size], preds):
+                    fresh[(name, d)] = (label, float(conf))
+
+        rows, seen = [], set()
+        for seq, _, _ in items:
+            d = digests.get(seq)
+            error = errors.get(seq) or failed.get(d)
+            result = {"error": error}
+            if error is None:
+                for name in wanted:
+                    label, conf = known.get((name, d)) or fresh[(name, d)]
+                    result[f"{name}_class"], result[f"{name}_confidence"] = label, round(conf, 6)
+                # served from earlier results, or a repeat of an image earlier in this batch
+                result["deduplicated"] = d in seen or all((name, d) in known for name in wanted)
+                seen.add(d)
+            rows.append((seq, d, result))
+        new_results = [(name, self.versions[name], d, label, conf) for (name, d), (label, conf) in fresh.items()]
+        return rows, new_results
+
+    def run_once(self):
+        """Process one leased batch; False when the queue is empty."""
+        leased = self.store.lease(self.batch_size, config.JOBS_LEASE_S, config.JOBS_MAX_ATTEMPTS)
+        if leased is None:
+            return False
+        job, items = leased
+        rows, new_results = self.process(job["task"], items)
+        self.store.complete(job["id"], rows, new_results)
+        return True
+
+    def run(self, stop=None, idle_s=1.0):
+        while stop is None or not stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                # the lease expires and the batch is retried (up to JOBS_MAX_ATTEMPTS)
+                logger.exception("Job worker batch failed")
+                busy = False
+            if not busy:
+                if stop is not None:
+                    stop.wait(idle_s)
+                else:
+                    time.sleep(idle_s)
+
+
+def worker_main(stop=None, cores=None):
+    # one process per worker, sized (and with CATTLE_CPU_PIN pinned) to its own cores
+    if cores:
+        cpu.assign(cores)
+    store = JobStore()
+    try:
+        Worker(store, threads=len(cores) if cores else None).run(stop)
+    finally:
+        store.close()
+
+
+def start_workers(n, cores=None):
+    """
+    Spawn n worker processes on slices of cores; returns (processes, stop event).
+    Default: the jobs share of this process's CPU plan, so workers started by the API
+    never compete with its models and decode threads (every core when partitioning
+    is off).
+    """
+    import multiprocessing as mp
+
+    if cores is None:
+        cores = cpu.current_plan()["jobs"] if config.CPU_PARTITION else cpu.available_cores()
+    ctx = mp.get_context("spawn")
+    stop = ctx.Event()
+    procs = [
+        ctx.Process(target=worker_main, args=(stop, part), name=f"job-worker-{i}", daemon=True)
+        for i, part in enumerate(cpu.slices(cores, n))
+    ]
+    for p in procs:
+        p.start()
+    return procs, stop
+
+
+def stop_workers(procs, stop, timeout=30.0):
+    stop.set()
+    deadline = time.monotonic() + timeout
+    for p in procs:
+        p.join(max(0.0, deadline - time.monotonic()))
+        if p.is_alive():
+            p.terminate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Durable scan job queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run worker processes until interrupted")
+    worker.add_argument("--processes", type=int, default=max(1, config.JOBS_WORKERS))
+    status = sub.add_parser("status", help="print a job (or the latest jobs) as JSON")
+    status.add_argument("job_id", nargs="?")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        store = JobStore()
+        print(json.dumps(store.get(args.job_id) if args.job_id else store.list(), indent=2))
+        return 0
+
+    logging.basicConfig(level=logging.INFO)
+    # a standalone worker owns every core it may run on (see taskset / cpusets)
+    if args.processes == 1:
+        worker_main()
+        return 0
+    procs, stop = start_workers(args.processes, cpu.available_cores())
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        stop_workers(procs, stop)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
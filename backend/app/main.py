@@ -11,19 +11,97 @@ if str(ROOT) not in sys.path:
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api import breed, disease, crossbreed
+import asyncio
+
+import anyio
+
+from . import jobs as job_queue
+from .api import (
+    admission, analyze, breed, disease, crossbreed, embeddings, health, jobs, metrics, profiling, registry, video,
+)
+from .core import config, cpu
+from .core.model_loader import models
 
 
 app = FastAPI(title="Cattle Vision API")
 
+# admitted or shed per model before the upload is read; added before CORS so that
+# 429/503 responses still carry the CORS headers
+app.add_middleware(
+    admission.AdmissionMiddleware,
+    routes={
+        "/predict_breed": "breed",
+        "/predict_crossbreed": "breed",
+        "/embeddings": "breed",
+        "/predict_disease": "disease",
+        "/analyze": ("breed", "disease"),
+        "/video": tuple(m for m in ("breed", "disease") if config.serves(m)),
+    },
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # let browser clients read timings, profile ids and back-off hints cross-origin
+    expose_headers=["Server-Timing", "X-Cattle-Profile-Id", "Retry-After"],
 )
+# always mounted, so profiling can be armed at runtime; idle unless a token is set
+app.add_middleware(profiling.ProfilingMiddleware)
+# outermost, so the total includes CORS handling and every route is counted
+app.add_middleware(metrics.MetricsMiddleware)
+
+# routers are light; the frameworks behind them load only for the roles served here
+if config.serves("breed"):
+    app.include_router(breed.router, prefix="/predict_breed", tags=["breed"])
+    app.include_router(crossbreed.router, prefix="/predict_crossbreed", tags=["crossbreed"])
+    if config.EMBEDDINGS_ENABLED:
+        app.include_router(embeddings.router, prefix="/embeddings", tags=["embeddings"])
+if config.serves("disease"):
+    app.include_router(disease.router, prefix="/predict_disease", tags=["disease"])
+if config.serves("breed") and config.serves("disease"):
+    app.include_router(analyze.router, prefix="/analyze", tags=["analyze"])
+app.include_router(video.router, prefix="/video", tags=["video"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(health.router, tags=["health"])
+app.include_router(metrics.router, tags=["metrics"])
+app.include_router(profiling.router, prefix="/debug", tags=["profiling"])
+if config.MODEL_ADMIN_ENABLED:
+    app.include_router(registry.router, prefix="/models", tags=["models"])
+
+
+@app.on_event("startup")
+async def startup():
+    # bounds the decode / cache / bulk work queued on the shared threadpool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.THREADPOOL_SIZE
+    # request threads (and the model threads, until they pin themselves) inherit this
+    cpu.pin("decode")
+    # load + warm in the background so /healthz answers while /readyz reports 503
+    app.state.warm_start = asyncio.get_running_loop().create_task(models.warm_start())
+    app.state.job_workers = job_queue.start_workers(config.JOBS_WORKERS) if config.JOBS_WORKERS else None
+    app.state.cache_purge = (
+        asyncio.get_running_loop().create_task(_purge_cache()) if config.CACHE_TTL_S > 0 else None
+    )
+
+
+async def _purge_cache():
+    # expired entries are never read again; drop them from memory and the disk tier
+    # instead of waiting for the size caps to push them out
+    while True:
+        await asyncio.sleep(max(config.CACHE_TTL_S, 60.0))
+        await anyio.to_thread.run_sync(models.cache.purge_expired)
+
 
-app.include_router(breed.router, prefix="/predict_breed", tags=["breed"])
-app.include_router(disease.router, prefix="/predict_disease", tags=["disease"])
-app.include_router(crossbreed.router, prefix="/predict_crossbreed", tags=["crossbreed"])
+@app.on_event("shutdown")
+async def shutdown():
+    if app.state.cache_purge is not None:
+        app.state.cache_purge.cancel()
+    await models.breed_batcher.close()
+    await models.disease_batcher.close()
+    models.breed_executor.shutdown(wait=False)
+    models.disease_executor.shutdown(wait=False)
+    for executor in (*models.loader_executors.values(), *models.shadow_executors.values()):
+        executor.shutdown(wait=False)
+    if app.state.job_workers is not None:
+        await asyncio.get_running_loop().run_in_executor(None, job_queue.stop_workers, *app.state.job_workers)
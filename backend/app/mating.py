@@ -0,0 +1,310 @@
+# backend/app/mating.py
+"""
+Herd-scale sire/dam assignment.
+
+Scores are one (N dams, M sires) matrix built from batched breed probabilities and
+the crossbreed engine's class-id arrays (see crossbreed_engine.py). Each dam gets
+exactly one sire; with a max-dams-per-sire limit the assignment is solved with an
+eps-scaling auction over sire slots, which stops once the objective is provably
+within a tolerance of the optimum (the dual value is an upper bound). Tens of
+thousands of dams against hundreds of sires take seconds.
+"""
+import numpy as np
+
+# objective name -> (engine accessor, normalise to 0..1 using the table range)
+OBJECTIVES = {
+    "milk_yield": ("numeric", "estimated_milk_yield_l_per_year"),
+    "disease_resistance": ("ordinal", "disease_resistance"),
+    "calf_size": ("ordinal", "calf_size"),
+}
+
+_DUMMY = -2           # slot holder id for the zero-score padding dams
+_SAMPLE_MIN = 4000    # herds above this size are warm-started from a sample
+_SAMPLE_FACTOR = 8
+_CANDIDATES = 16      # best sires remembered per dam between full rescans
+_SINGLE_BIDS = 8      # below this many bidders, bid one dam at a time
+
+
+def parse_objective(text):
+    """
+    "milk_yield" or "milk_yield:0.7,disease_resistance:0.3" -> {name: weight}.
+    """
+    weights = {}
+    for part in (text or "milk_yield").split(","):
+        name, _, weight = part.strip().partition(":")
+        if name not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {name!r}, expected one of {sorted(OBJECTIVES)}")
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+def score_matrix(engine, dam_probs, sire_probs, weights):
+    """(N, K) dam and (M, K) sire probabilities -> (N, M) weighted objective, higher is better."""
+    total = 0.0
+    for name, weight in weights.items():
+        kind, field = OBJECTIVES[name]
+        if kind == "numeric":
+            values = engine.expected_numeric(field, dam_probs, sire_probs)
+            table = engine.numeric[field]
+            lo, hi = np.nanmin(table), np.nanmax(table)
+            values = (values - lo) / (hi - lo) if hi > lo else values * 0.0
+        else:
+            values = engine.expected_ordinal(field, dam_probs, sire_probs)
+        total = total + weight * np.nan_to_num(values, nan=0.0)
+    return np.asarray(total, dtype=float)
+
+
+def assign(scores, max_per_sire=None, tol=1e-3, max_steps=1000000):
+    """
+    Maximise scores[dam, sire] summed over dams, each dam to one sire, each sire to at
+    most max_per_sire dams. Returns (sire index per dam, info dict).
+
+    Stops once the objective is within tol (relative) of the dual upper bound;
+    info["gap"] is that certified distance from the best possible assignment.
+    """
+    scores = np.asarray(scores, dtype=float)
+    N, M = scores.shape
+    if N == 0:
+        return np.zeros(0, dtype=np.int64), {"objective": 0.0, "upper_bound": 0.0, "gap": 0.0, "steps": 0}
+    if M == 0:
+        raise ValueError("At least one sire is required")
+    rows = np.arange(N)
+    if max_per_sire is None or max_per_sire >= N:
+        # unconstrained: every dam simply takes its best sire
+        choice = scores.argmax(axis=1)
+        objective = float(scores[rows, choice].sum())
+        return choice, {"objective": objective, "upper_bound": objective, "gap": 0.0, "steps": 0}
+    cap = int(max_per_sire)
+    if cap * M < N:
+        raise ValueError(f"{M} sires x {cap} dams each cannot cover {N} dams")
+
+    auction, done, bound = _solve(scores, cap, tol, max_steps)
+
+    owner = auction.owner.copy()
+    if not done:
+        # step limit hit: place the remaining dams greedily on sires with free slots
+        counts = np.bincount(owner[owner >= 0], minlength=M)
+        for d in np.nonzero(owner < 0)[0]:
+            open_sires = np.nonzero(counts < cap)[0]
+            j = open_sires[scores[d, open_sires].argmax()]
+            owner[d] = j
+            counts[j] += 1
+
+    objective = float(scores[rows, owner].sum())
+    return owner, {
+        "objective": objective,
+        "upper_bound": float(bound),
+        "gap": float(bound - objective),
+        "steps": auction.steps,
+    }
+
+
+def _solve(scores, cap, tol, max_steps):
+    N = scores.shape[0]
+    span = max(float(scores.max() - scores.min()), 1e-9)
+    auction = _Auction(scores, cap)
+    # eps-scaling: coarse phases settle prices quickly, later phases only refine them
+    eps = span / 8.0
+    if N > _SAMPLE_MIN:
+        # large herds: prices solved on a random 1/8 of the dams (with 1/8 of the
+        # slots) are close to the final ones, so the full auction starts near the
+        # answer instead of every dam first crowding onto the same few sires
+        sample = np.random.default_rng(0).choice(N, N // _SAMPLE_FACTOR, replace=False)
+        sub, _, _ = _solve(scores[sample], -(-cap // _SAMPLE_FACTOR), tol * 10, max_steps)
+        auction.price[:] = sub.price.mean(axis=1)[:, None]
+        eps = span / 256.0
+    done, bound = _refine(auction, scores, eps, tol, max_steps)
+    return auction, done, bound
+
+
+def _refine(auction, scores, eps, tol, max_steps):
+    """Run eps phases until the certified gap is within tol; (finished, upper bound)."""
+    rows = np.arange(scores.shape[0])
+    span = max(float(scores.max() - scores.min()), 1e-9)
+    while auction.run(eps, max_steps):
+        objective = float(scores[rows, auction.owner].sum())
+        bound = auction.upper_bound()
+        if bound - objective <= tol * max(abs(objective), span) or eps < span * 1e-7:
+            return True, bound
+        eps /= 8.0
+    return False, np.inf
+
+
+
+class _Auction:
+    """
+    Forward auction over sire slots: every sire has `cap` slots, each with its own
+    price, and a dam bids for the cheapest slot of its best sire. Each sire's slot
+    prices are kept sorted, so the cheapest and second-cheapest are columns 0 and 1.
+
+    Free slots are taken by implicit dummy dams that score 0 everywhere, which makes
+    the problem square so prices can be carried between eps phases. Dummies are
+    identical, so they always sit on the cheapest slots and are moved as one group
+    instead of bidding each other up eps at a time.
+
+    Prices never fall, so each dam keeps its best few sires plus an upper bound on
+    the rest and only rescans its full row once the bound is crossed. Large rounds
+    are Jacobi (all bidders at once); the short eviction chains at the end of a phase
+    are run one bid at a time.
+    """
+
+    def __init__(self, scores, cap):
+        self.scores = scores
+        N, M = scores.shape
+        self.cap = cap
+        self.price = np.zeros((M, cap))
+        self.holder = np.full((M, cap), -1, dtype=np.int64)
+        self.owner = np.full(N, -1, dtype=np.int64)
+        self.min_price = self.price[:, 0]
+        self.second_price = self.price[:, 1] if cap > 1 else np.full(M, np.inf)
+        self.n_candidates = min(M, _CANDIDATES)
+        self.candidates = np.zeros((N, self.n_candidates), dtype=np.int64)
+        self.bound = np.full(N, np.inf)
+        self.steps = 0
+
+    def run(self, eps, max_steps):
+        # every dam and dummy bids again at the finer eps; prices are kept
+        self.holder.fill(-1)
+        self.owner.fill(-1)
+        bidders = np.arange(self.scores.shape[0])
+        free = self.holder.size - bidders.size
+        while bidders.size or free:
+            if self.steps >= max_steps:
+                return False
+            if bidders.size > _SINGLE_BIDS:
+                self.steps += 1
+                bidders, evicted = self._round(bidders, eps)
+            else:
+                bidders, evicted = self._chain(bidders.tolist(), eps, max_steps)
+            free += evicted
+            if free:
+                bidders = np.concatenate([bidders, self._place_dummies(free, eps)])
+                free = 0
+        return True
+
+    def upper_bound(self):
+        """Dual value at the current prices: no assignment can score more."""
+        scores = self.scores
+        dummies = self.price.size - scores.shape[0]
+        return float(
+            (scores - self.min_price).max(axis=1).sum()
+            - dummies * self.min_price.min()
+            + self.price.sum()
+        )
+
+    # -------------------------------------------------
+    # Bids
+    # -------------------------------------------------
+    def _rescan(self, dams):
+        values = self.scores[dams] - self.min_price
+        L = self.n_candidates
+        if L < values.shape[1]:
+            part = np.argpartition(-values, L, axis=1)
+            self.candidates[dams] = part[:, :L]
+            self.bound[dams] = values[np.arange(dams.size), part[:, L]]
+        else:
+            self.candidates[dams] = np.arange(L)
+            self.bound[dams] = -np.inf
+
+    def _best_two(self, dams):
+        """Best sire, its score, and the value of the best alternative slot per dam."""
+        cand = self.candidates[dams]
+        values = self.scores[dams[:, None], cand] - self.min_price[cand]
+        n = np.arange(dams.size)
+        top = values.argmax(axis=1)
+        best = cand[n, top]
+        own = self.scores[dams, best]
+        values[n, top] = -np.inf
+        second = np.maximum(values.max(axis=1), own - self.second_price[best])
+        stale = second < self.bound[dams]
+        if stale.any():
+            self._rescan(dams[stale])
+            best[stale], own[stale], second[stale] = self._best_two(dams[stale])
+        return best, own, second
+
+    def _round(self, bidders, eps):
+        """Jacobi round: per sire, the highest bids take the cheapest slots."""
+        best, own, second = self._best_two(bidders)
+        bids = own - second + eps
+        order = np.lexsort((-bids, best))
+        sires = best[order]
+        rank = np.arange(order.size) - np.searchsorted(sires, sires, side="left")
+        keep = rank < self.cap
+        order, sires, rank = order[keep], sires[keep], rank[keep]
+        accept = bids[order] > self.price[sires, rank]
+        won, sires, slots = order[accept], sires[accept], rank[accept]
+
+        evicted = self.holder[sires, slots]
+        self.holder[sires, slots] = bidders[won]
+        self.price[sires, slots] = bids[won]
+        self.owner[bidders[won]] = sires
+        self._resort(np.unique(sires))
+
+        lost = np.ones(bidders.size, dtype=bool)
+        lost[won] = False
+        outbid = evicted[evicted >= 0]
+        self.owner[outbid] = -1
+        return np.concatenate([bidders[lost], outbid]), int((evicted == _DUMMY).sum())
+
+    def _chain(self, queue, eps, max_steps):
+        """
+        Gauss-Seidel bids, one dam at a time, for the short eviction chains at the
+        end of a phase where a whole Jacobi round would be mostly overhead.
+        """
+        scores, candidates, bound = self.scores, self.candidates, self.bound
+        min_price, second_price = self.min_price, self.second_price
+        while queue and len(queue) <= _SINGLE_BIDS and self.steps < max_steps:
+            self.steps += 1
+            dam = queue.pop()
+            while True:
+                cand = candidates[dam]
+                values = scores[dam, cand] - min_price[cand]
+                top = values.argmax()
+                sire = cand[top]
+                own = scores[dam, sire]
+                values[top] = -np.inf
+                second = max(values.max(), own - second_price[sire])
+                if second >= bound[dam]:
+                    break
+                self._rescan(np.array([dam]))
+            bid = own - second + eps
+            price, holder = self.price[sire], self.holder[sire]
+            evicted = int(holder[0])
+            # the cheapest slot is replaced: shift cheaper slots down to keep the row sorted
+            pos = int(price.searchsorted(bid)) - 1
+            price[:pos] = price[1:pos + 1]
+            holder[:pos] = holder[1:pos + 1]
+            price[pos], holder[pos] = bid, dam
+            self.owner[dam] = sire
+            if evicted >= 0:
+                self.owner[evicted] = -1
+                queue.append(evicted)
+            elif evicted == _DUMMY:
+                return np.array(queue, dtype=np.int64), 1
+        return np.array(queue, dtype=np.int64), 0
+
+    def _place_dummies(self, count, eps):
+        """
+        Put `count` unplaced dummies on the cheapest slots not held by a dummy, and
+        price every dummy slot at the cheapest remaining slot + eps, so each dummy
+        stays within eps of its best (cheapest) choice.
+        """
+        price, holder = self.price.ravel(), self.holder.ravel()
+        open_slots = np.nonzero(holder != _DUMMY)[0]
+        part = np.argpartition(price[open_slots], count)
+        chosen = open_slots[part[:count]]
+        level = price[open_slots[part[count:]]].min() + eps
+        evicted = holder[chosen]
+        holder[chosen] = _DUMMY
+        dummies = holder == _DUMMY
+        price[dummies] = np.maximum(price[dummies], level)
+        self._resort(np.unique(np.nonzero(dummies)[0] // self.cap))
+        outbid = evicted[evicted >= 0]
+        self.owner[outbid] = -1
+        return outbid
+
+    def _resort(self, sires):
+        # rows are a few sorted runs after an update, which a stable sort merges quickly
+        order = np.argsort(self.price[sires], axis=1, kind="stable")
+        self.price[sires] = np.take_along_axis(self.price[sires], order, axis=1)
+        self.holder[sires] = np.take_along_axis(self.holder[sires], order, axis=1)
@@ -0,0 +1,148 @@
+# backend/app/preprocessing.py
+# Shared image decode + preprocessing for the breed (PyTorch) and disease (Keras) models.
+import io
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+try:  # optional libjpeg-turbo decoder; PIL is used when it isn't installed
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype="float32")
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype="float32")
+
+_JPEG_MAGIC = b"\xff\xd8"
+
+
+def decode_image(image_bytes: bytes, min_size: Tuple[int, int]) -> Image.Image:
+    """
+    Decode to RGB, letting the JPEG decoder downscale by 1/2, 1/4 or 1/8 as long as
+    the result stays at least min_size (W, H). A 12 MP photo headed for a 300px
+    model is decoded at ~1/8 scale instead of full resolution.
+    """
+    W, H = min_size
+    if simplejpeg is not None and image_bytes[:2] == _JPEG_MAGIC:
+        try:
+            arr = simplejpeg.decode_jpeg(image_bytes, colorspace="RGB", min_width=W, min_height=H)
+            return Image.fromarray(arr)
+        except Exception:
+            pass  # unusual JPEG variants (CMYK, progressive quirks): fall back to PIL
+    img = Image.open(io.BytesIO(image_bytes))
+    if img.format == "JPEG":
+        img.draft("RGB", (W, H))
+    return img.convert("RGB")
+
+
+class BreedPreprocessor:
+    """
+    Fused equivalent of Resize(size) -> CenterCrop(size) -> ToTensor -> Normalize.
+
+    The crop is applied as the resize source box, so only pixels that survive the
+    crop are resampled, and normalisation is one vectorised multiply-add written
+    straight into a float32 CHW buffer.
+    """
+
+    def __init__(self, size=300, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.size = size
+        std = np.asarray(std, dtype="float32")
+        self._scale = (1.0 / (255.0 * std)).reshape(3, 1, 1)
+        self._bias = (-np.asarray(mean, dtype="float32") / std).reshape(3, 1, 1)
+
+    def _crop_box(self, w, h):
+        # mirror torchvision: shorter side -> size (longer side truncated), then centred crop
+        size = self.size
+        if w <= h:
+            rw, rh = size, int(size * h / w)
+        else:
+            rw, rh = int(size * w / h), size
+        left = int(round((rw - size) / 2.0))
+        top = int(round((rh - size) / 2.0))
+        sx, sy = w / rw, h / rh
+        return (left * sx, top * sy, (left + size) * sx, (top + size) * sy)
+
+    def array(self, img: Image.Image, out=None) -> np.ndarray:
+        """Return a normalised (3, size, size) float32 array, written into out if given."""
+        size = self.size
+        img = img.resize((size, size), Image.BILINEAR, box=self._crop_box(*img.size))
+        hwc = np.asarray(img, dtype=np.uint8)
+        if out is None:
+            out = np.empty((3, size, size), dtype="float32")
+        np.multiply(hwc.transpose(2, 0, 1), self._scale, out=out, casting="unsafe")
+        out += self._bias
+        return out
+
+    def from_bytes(self, image_bytes: bytes, out=None) -> np.ndarray:
+        return self.array(decode_image(image_bytes, (self.size, self.size)), out=out)
+
+    def batch(self, images, out=None) -> np.ndarray:
+        """(N, 3, size, size) array of encoded images, each decoded straight into its row of out."""
+        if out is None:
+            out = np.empty((len(images), 3, self.size, self.size), dtype="float32")
+        for i, image_bytes in enumerate(images):
+            self.from_bytes(image_bytes, out=out[i])
+        return out
+
+    def __call__(self, img: Image.Image):
+        # drop-in for the torchvision pipeline on an already decoded PIL image
+        import torch
+        return torch.from_numpy(self.array(img.convert("RGB")))
+
+
+def disease_array(image_bytes: bytes, input_shape: Tuple[int, int, int], out=None) -> np.ndarray:
+    """
+    Decode, resize to the Keras input shape (H, W, C) and scale to [0, 1].
+    Returns an (H, W, C) float32 array, written into out if given.
+    """
+    H, W, C = input_shape
+    return disease_image_array(decode_image(image_bytes, (W, H)), input_shape, out=out)
+
+
+def disease_image_array(img: Image.Image, input_shape: Tuple[int, int, int], out=None) -> np.ndarray:
+    """disease_array for an already decoded RGB image."""
+    H, W, C = input_shape
+    img = img.resize((W, H))
+    if out is None:
+        out = np.empty((H, W, C), dtype="float32")
+    np.multiply(np.asarray(img, dtype=np.uint8), np.float32(1.0 / 255.0), out=out, casting="unsafe")
+    return out
+
+
+def disease_batch(images, input_shape: Tuple[int, int, int], out=None) -> np.ndarray:
+    """(N, H, W, C) array of encoded images, each decoded straight into its row of out."""
+    if out is None:
+        out = np.empty((len(images), *input_shape), dtype="float32")
+    for i, image_bytes in enumerate(images):
+        disease_array(image_bytes, input_shape, out=out[i])
+    return out
+
+
+class BatchBuffer:
+    """
+    A float32 batch array reused from one call to the next by a single thread, so a
+    batch loop writes its rows in place instead of allocating a new array per image
+    and another per batch. take() only reallocates when the batch grows or the row
+    shape changes; what it returns is overwritten by the next take().
+    """
+
+    def __init__(self):
+        self._array = None
+
+    def take(self, n: int, shape) -> np.ndarray:
+        shape = tuple(shape)
+        if self._array is None or self._array.shape[1:] != shape or len(self._array) < n:
+            self._array = np.empty((n, *shape), dtype="float32")
+        return self._array[:n]
+
+
+def decode_for_models(image_bytes: bytes, breed: "BreedPreprocessor", disease_shape: Tuple[int, int, int]):
+    """
+    One decode feeding both models: (breed (3, S, S) array, disease (H, W, C) array).
+    The JPEG is drafted down only as far as the larger of the two inputs allows, and
+    both model inputs are resampled from that one image.
+    """
+    H, W, _ = disease_shape
+    img = decode_image(image_bytes, (max(breed.size, W), max(breed.size, H)))
+    return breed.array(img), disease_image_array(img, disease_shape)
@@ -0,0 +1,302 @@
+# backend/app/quantization.py
+"""
+INT8 serving artifacts for the breed and disease models, with an accuracy report.
+
+    cd backend
+    python -m app.quantization --images /data/calibration --task both --breed-mode static
+
+writes, next to the float checkpoints:
+    best_enhanced_model.int8-<mode>.pt   TorchScript INT8 breed model (dynamic or static)
+    custom_model.int8.tflite             TFLite INT8 disease model (float in/out)
+and a <artifact>.report.json with top-1 agreement and confidence drift vs. the float
+model. The server only loads an artifact whose report passes CATTLE_QUANT_MIN_AGREEMENT.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+
+import numpy as np
+
+from app.preprocessing import BatchBuffer, BreedPreprocessor, disease_array, disease_batch
+
+BREED_MODES = ("dynamic", "static")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+# -------------------------------------------------
+# Artifact paths + guardrail
+# -------------------------------------------------
+def breed_artifact_path(checkpoint_path, mode):
+    return f"{os.path.splitext(checkpoint_path)[0]}.int8-{mode}.pt"
+
+
+def disease_artifact_path(checkpoint_path):
+    return f"{os.path.splitext(checkpoint_path)[0]}.int8.tflite"
+
+
+def report_path(artifact_path):
+    return artifact_path + ".report.json"
+
+
+def check_report(artifact_path, min_agreement, source_path=None):
+    """Return the calibration report, or raise RuntimeError if the artifact may not be served."""
+    path = report_path(artifact_path)
+    if not os.path.exists(artifact_path) or not os.path.exists(path):
+        raise RuntimeError(
+            f"Quantised model {artifact_path} has no calibration report; run python -m app.quantization"
+        )
+    if source_path is not None and os.path.getmtime(artifact_path) < os.path.getmtime(source_path):
+        raise RuntimeError(
+            f"Quantised model {artifact_path} is older than {source_path}; re-run calibration"
+        )
+    with open(path) as f:
+        report = json.load(f)
+    if report["top1_agreement"] < min_agreement:
+        raise RuntimeError(
+            f"Refusing to serve {os.path.basename(artifact_path)}: top-1 agreement "
+            f"{report['top1_agreement']:.4f} < required {min_agreement:.4f}"
+        )
+    return report
+
+
+def compare(ref_probs, q_probs):
+    ref_probs = np.asarray(ref_probs, dtype="float64")
+    q_probs = np.asarray(q_probs, dtype="float64")
+    ref_top = ref_probs.argmax(axis=1)
+    q_top = q_probs.argmax(axis=1)
+    rows = np.arange(len(ref_top))
+    drift = np.abs(ref_probs[rows, ref_top] - q_probs[rows, ref_top])
+    return {
+        "n": int(len(ref_top)),
+        "top1_agreement": float((ref_top == q_top).mean()) if len(ref_top) else 0.0,
+        "mean_conf_drift": float(drift.mean()) if len(drift) else 0.0,
+        "max_conf_drift": float(drift.max()) if len(drift) else 0.0,
+        "max_prob_diff": float(np.abs(ref_probs - q_probs).max()) if len(drift) else 0.0,
+    }
+
+
+# -------------------------------------------------
+# Breed (PyTorch)
+# -------------------------------------------------
+def quantize_breed(model, mode, calib_batches):
+    """Return an INT8 TorchScript module. calib_batches: iterable of NCHW float tensors."""
+    import torch
+    import torch.nn as nn
+    from app.breed_backends import fold_classifier_bn, INPUT_SIZE
+
+    model = fold_classifier_bn(model.cpu().eval())
+    example = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE)
+    if mode == "dynamic":
+        # weights INT8, activations quantised on the fly: only the Linear head changes
+        qmodel = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    elif mode == "static":
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+        torch.backends.quantized.engine = "x86"
+        prepared = prepare_fx(model, get_default_qconfig_mapping("x86"), (example,))
+        with torch.no_grad():
+            for x in calib_batches:
+                prepared(x)
+        qmodel = convert_fx(prepared)
+    else:
+        raise ValueError(f"Unknown breed quantisation mode {mode!r}, expected one of {BREED_MODES}")
+    with torch.no_grad():
+        return torch.jit.freeze(torch.jit.trace(qmodel.eval(), example))
+
+
+def load_breed_int8(artifact_path):
+    import torch
+    return torch.jit.load(artifact_path, map_location="cpu").eval()
+
+
+# -------------------------------------------------
+# Disease (TensorFlow Lite)
+# -------------------------------------------------
+def convert_disease_tflite(keras_model, calib_arrays):
+    """Full INT8 weights and activations with float input/output, calibrated on calib_arrays."""
+    import tensorflow as tf
+
+    def representative_dataset():
+        for arr in calib_arrays:
+            yield [arr[None].astype("float32")]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    return converter.convert()
+
+
+class TFLiteRunner:
+    """
+    Callable (N, H, W, C) float32 -> (N, classes) probabilities. Not thread safe;
+    the server only calls it from the dedicated disease thread.
+
+    Resizing an interpreter reallocates its tensors, and the micro-batcher changes
+    the batch size almost every call. So there is one interpreter per bucket (the
+    powers of two up to max_batch, plus max_batch itself), each allocated once; a
+    batch is zero-padded up to its bucket and the padding sliced off the output.
+    Larger inputs run in max_batch chunks.
+    """
+
+    def __init__(self, model_path, num_threads=None, max_batch=16):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.buckets = []
+        n = 1
+        while n < max_batch:
+            self.buckets.append(n)
+            n *= 2
+        self.buckets.append(max(1, max_batch))
+        self._interpreters = {}
+
+    def _interpreter(self, bucket, shape):
+        entry = self._interpreters.get(bucket)
+        if entry is None:
+            import tensorflow as tf
+
+            interpreter = tf.lite.Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+            input_index = interpreter.get_input_details()[0]["index"]
+            interpreter.resize_tensor_input(input_index, [bucket, *shape])
+            interpreter.allocate_tensors()
+            entry = (interpreter, input_index, interpreter.get_output_details()[0]["index"])
+            self._interpreters[bucket] = entry
+        return entry
+
+    def _run(self, x):
+        n = x.shape[0]
+        bucket = next(b for b in self.buckets if b >= n)
+        if bucket != n:
+            x = np.concatenate([x, np.zeros((bucket - n, *x.shape[1:]), dtype=x.dtype)])
+        interpreter, input_index, output_index = self._interpreter(bucket, x.shape[1:])
+        interpreter.set_tensor(input_index, x)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)[:n].copy()
+
+    def __call__(self, x):
+        x = np.ascontiguousarray(x, dtype="float32")
+        step = self.buckets[-1]
+        if x.shape[0] <= step:
+            return self._run(x)
+        return np.concatenate([self._run(x[i:i + step]) for i in range(0, x.shape[0], step)])
+
+
+# -------------------------------------------------
+# Calibration command
+# -------------------------------------------------
+def _image_files(folder, limit):
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name.lower())[1] in IMAGE_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return paths[:limit] if limit else paths
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_report(artifact_path, report):
+    with open(report_path(artifact_path), "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def calibrate_breed(checkpoint, mode, calib_paths, eval_paths, batch_size):
+    import torch
+    from app import cattle_model
+
+    pre = BreedPreprocessor(size=300)
+    buffer = BatchBuffer()
+
+    def batches(paths):
+        # each batch is decoded into the same array; nothing keeps a batch past its pass
+        for i in range(0, len(paths), batch_size):
+            chunk = paths[i:i + batch_size]
+            out = buffer.take(len(chunk), (3, pre.size, pre.size))
+            yield torch.from_numpy(pre.batch([_read(p) for p in chunk], out=out))
+
+    model, _, _ = cattle_model.load_model(checkpoint)
+    model = model.cpu()
+    qmodel = quantize_breed(copy.deepcopy(model), mode, batches(calib_paths))
+
+    ref, got = [], []
+    with torch.no_grad():
+        for x in batches(eval_paths):
+            ref.append(torch.softmax(model(x), dim=1).numpy())
+            got.append(torch.softmax(qmodel(x), dim=1).numpy())
+    report = compare(np.concatenate(ref), np.concatenate(got))
+    report.update({"model": "breed", "mode": mode, "checkpoint": os.path.basename(checkpoint)})
+
+    artifact = breed_artifact_path(checkpoint, mode)
+    torch.jit.save(qmodel, artifact)
+    _write_report(artifact, report)
+    return artifact, report
+
+
+def calibrate_disease(checkpoint, calib_paths, eval_paths, batch_size):
+    from tensorflow.keras.models import load_model as load_tf_model
+
+    model = load_tf_model(checkpoint)
+    _, H, W, C = model.input_shape
+    # the converter replays these, so they live in one array rather than one per image
+    calib = np.empty((len(calib_paths), H, W, C), dtype="float32")
+    for i, p in enumerate(calib_paths):
+        disease_array(_read(p), (H, W, C), out=calib[i])
+
+    artifact = disease_artifact_path(checkpoint)
+    with open(artifact, "wb") as f:
+        f.write(convert_disease_tflite(model, calib))
+    runner = TFLiteRunner(artifact, max_batch=batch_size)
+
+    ref, got = [], []
+    buffer = BatchBuffer()
+    for i in range(0, len(eval_paths), batch_size):
+        chunk = eval_paths[i:i + batch_size]
+        x = disease_batch([_read(p) for p in chunk], (H, W, C), out=buffer.take(len(chunk), (H, W, C)))
+        ref.append(np.asarray(model(x, training=False)))
+        got.append(runner(x))
+    report = compare(np.concatenate(ref), np.concatenate(got))
+    report.update({"model": "disease", "mode": "tflite_int8", "checkpoint": os.path.basename(checkpoint)})
+    _write_report(artifact, report)
+    return artifact, report
+
+
+def main(argv=None):
+    from app.core.model_loader import BREED_MODEL_PATH, DISEASE_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Build INT8 models and an accuracy report")
+    parser.add_argument("--images", required=True, help="folder of sample images for calibration")
+    parser.add_argument("--eval-images", default=None, help="folder used for the report (default: --images)")
+    parser.add_argument("--limit", type=int, default=200, help="max calibration images")
+    parser.add_argument("--task", choices=["breed", "disease", "both"], default="both")
+    parser.add_argument("--breed-mode", choices=BREED_MODES, default="static")
+    parser.add_argument("--breed-checkpoint", default=BREED_MODEL_PATH)
+    parser.add_argument("--disease-checkpoint", default=DISEASE_MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    calib_paths = _image_files(args.images, args.limit)
+    eval_paths = _image_files(args.eval_images, 0) if args.eval_images else calib_paths
+    if not calib_paths:
+        parser.error(f"no images found under {args.images}")
+
+    if args.task in ("breed", "both"):
+        artifact, report = calibrate_breed(
+            args.breed_checkpoint, args.breed_mode, calib_paths, eval_paths, args.batch_size
+        )
+        print(f"{artifact}\n{json.dumps(report, indent=2)}")
+    if args.task in ("disease", "both"):
+        artifact, report = calibrate_disease(
+            args.disease_checkpoint, calib_paths, eval_paths, args.batch_size
+        )
+        print(f"{artifact}\n{json.dumps(report, indent=2)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
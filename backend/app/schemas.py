@@ -1,9 +1,36 @@
 # backend/app/schemas.py
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class PredictionResponse(BaseModel):
     filename: str
     predicted_class: str
     confidence: float
     static_data: Dict[str, Any]
+    model_version: Optional[str] = None
+
+class ModelPrediction(BaseModel):
+    predicted_class: str
+    confidence: float
+    static_data: Dict[str, Any]
+    model_version: Optional[str] = None
+
+class AnalyzeResponse(BaseModel):
+    filename: str
+    breed: ModelPrediction
+    disease: ModelPrediction
+
+class Neighbor(BaseModel):
+    id: str
+    score: float
+    metadata: Optional[Dict[str, Any]] = None
+
+class EmbeddingResponse(BaseModel):
+    filename: str
+    predicted_class: str
+    confidence: float
+    static_data: Dict[str, Any]
+    model_version: Optional[str] = None
+    neighbors: List[Neighbor] = []
+    duplicate_of: Optional[Neighbor] = None
+    embedding: Optional[List[float]] = None
@@ -121,5 +121,8 @@ DISEASE_STATIC_DATA = {
     },
 }
 
+# model output order for the breed classifier (keys match BREED_STATIC_DATA case-insensitively)
+BREED_CLASS_NAMES = ["ayshire", "brown_swiss", "holstein", "jersey", "RedDane"]
+
 # maintain consistent order for disease class names
 DISEASE_CLASS_NAMES = ["IBK", "FMD", "LSD"]
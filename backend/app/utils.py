@@ -1,17 +1,34 @@
 # backend/app/utils.py
-from PIL import Image
-import io
 import numpy as np
 from typing import Tuple
 
+from .core import metrics, profiling
+from .preprocessing import disease_array
+from .static_data import DISEASE_CLASS_NAMES
+
 def preprocess_disease(img_bytes: bytes, input_shape: Tuple[int,int,int]):
     """
     Resize and normalize image to model input shape.
     input_shape: (H, W, C)
     """
-    H, W, C = input_shape
-    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-    img = img.resize((W, H))
-    arr = np.array(img).astype("float32") / 255.0
+    with metrics.stage("disease", "decode"):
+        arr = disease_array(img_bytes, input_shape)
     # expand batch dim
     return np.expand_dims(arr, 0)
+
+def predict_disease_batch(predict_fn, arrays):
+    """
+    Run the disease model once over a list of (1, H, W, C) arrays, or one (N, H, W, C)
+    array. Returns one (label, confidence, probs) tuple per input, like
+    cattle_model.predict_bytes.
+    """
+    with profiling.tf_profile("disease-forward"), metrics.stage("disease", "forward"):
+        x = arrays if isinstance(arrays, np.ndarray) else np.concatenate(arrays, axis=0)
+        preds = np.asarray(predict_fn(x))
+    with metrics.stage("disease", "postprocess"):
+        results = []
+        for pred in preds:
+            class_id = int(np.argmax(pred))
+            label = DISEASE_CLASS_NAMES[class_id] if class_id < len(DISEASE_CLASS_NAMES) else str(class_id)
+            results.append((label, float(pred[class_id]), pred.tolist()))
+    return results
@@ -0,0 +1,402 @@
+# backend/app/video.py
+"""
+Video and camera-stream ingestion for the breed and disease models.
+
+A FramePipeline decodes a source on its own thread and keeps only the frames
+worth a forward pass:
+
+    sampling         at most sample_fps frames per second of video are looked at
+    change detection a frame whose 32x32 grey thumbnail differs from the last
+                     analysed one by less than threshold (mean absolute difference,
+                     0..1) is skipped, unless max_gap_s have passed since
+    hand-over        kept frames wait in a bounded queue for the event loop, which
+                     submits them to the models' batchers in batches
+
+The queue decouples the source's frame rate from model throughput. For files,
+decoding waits when the queue is full, so no kept frame is lost. For live sources,
+the oldest waiting frame is dropped instead, so the models stay on current frames.
+segments() aggregates the predictions per segment_s of video time. Each class's
+probability is averaged over the analysed frames. Frame counts say how many frames
+were skipped and why; frames that fail to decode are counted as corrupt.
+
+Sources: MJPEG (concatenated JPEGs, or multipart/x-mixed-replace camera feeds) is
+split in pure Python; other containers and RTSP need PyAV (pip install av). A
+file played back with realtime=True stands in for a live camera.
+"""
+import asyncio
+import threading
+import time
+import urllib.request
+from collections import Counter, namedtuple
+
+import numpy as np
+from PIL import Image
+
+from app.core import metrics
+from app.preprocessing import decode_image
+from app.static_data import BREED_CLASS_NAMES, DISEASE_CLASS_NAMES
+
+CLASS_NAMES = {"breed": BREED_CLASS_NAMES, "disease": DISEASE_CLASS_NAMES}
+THUMBNAIL = (32, 32)
+MJPEG_SUFFIXES = (".mjpeg", ".mjpg")
+
+_SOI, _EOI = b"\xff\xd8", b"\xff\xd9"
+
+Frame = namedtuple("Frame", "t segment image")
+
+
+# -------------------------------------------------
+# Sources: iterables of (timestamp s, JPEG bytes or PIL image)
+# -------------------------------------------------
+def mjpeg_frames(stream, fps=None, chunk_size=1 << 16):
+    """
+    Frames of an MJPEG byte stream, cut at the JPEG start/end markers, so the part
+    headers of a multipart camera feed are skipped (frames carrying an embedded EXIF
+    thumbnail would be cut short; camera MJPEG doesn't have them). Timestamps are
+    frame index / fps, or wall-clock seconds since the first frame when fps is None.
+    """
+    buf = bytearray()
+    scan = 0
+    index, t0 = 0, None
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            return
+        buf += data
+        while True:
+            soi = buf.find(_SOI)
+            if soi < 0:
+                # keep a trailing 0xff in case the marker is split across reads
+                del buf[:max(len(buf) - 1, 0)]
+                scan = 0
+                break
+            eoi = buf.find(_EOI, max(soi + 2, scan))
+            if eoi < 0:
+                del buf[:soi]
+                scan = max(len(buf) - 1, 0)
+                break
+            frame = bytes(buf[soi:eoi + 2])
+            del buf[:eoi + 2]
+            scan = 0
+            if fps:
+                t = index / fps
+            else:
+                now = time.monotonic()
+                t0 = now if t0 is None else t0
+                t = now - t0
+            index += 1
+            yield t, frame
+
+
+def av_frames(source, options=None):
+    """Decoded frames of any container or stream FFmpeg reads (file object, path or URL)."""
+    # checked here rather than on the first frame, so callers can reject the request
+    try:
+        import av
+    except ImportError:
+        raise ValueError("Only MJPEG is decoded natively; other formats and RTSP need PyAV (pip install av)")
+    return _av_frames(av, source, options)
+
+
+def _av_frames(av, source, options):
+    with av.open(source, options=options or {}) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        for frame in container.decode(stream):
+            yield float(frame.time or 0.0), frame.to_image()
+
+
+def paced(frames):
+    """Yield frames no faster than their timestamps: a file played back like a camera."""
+    start = time.monotonic()
+    for t, frame in frames:
+        delay = start + t - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield t, frame
+
+
+def _closing(frames, resource):
+    try:
+        yield from frames
+    finally:
+        resource.close()
+
+
+def _is_mjpeg(head):
+    # a bare JPEG, or a multipart part header ("--boundary\r\nContent-Type: image/jpeg")
+    return head.startswith(_SOI) or (head.startswith(b"--") and b"image/jpeg" in head.lower())
+
+
+def open_upload(fileobj, fps):
+    """Frames of an uploaded video file (seekable)."""
+    head = fileobj.read(256)
+    fileobj.seek(0)
+    if _is_mjpeg(head):
+        return mjpeg_frames(fileobj, fps)
+    return av_frames(fileobj)
+
+
+def open_source(source, fps, realtime=False):
+    """
+    Frames of a server-side path or a camera URL (http(s) MJPEG feed, rtsp:// or
+    anything else PyAV opens). Local files are paced when realtime is set.
+    """
+    if source.startswith(("http://", "https://")):
+        response = urllib.request.urlopen(source, timeout=10)
+        content_type = response.headers.get("Content-Type", "")
+        if "multipart/x-mixed-replace" in content_type or "image/jpeg" in content_type:
+            # a camera feed has no timestamps of its own: frames are timed on arrival
+            return _closing(mjpeg_frames(response), response)
+        response.close()
+        return av_frames(source)
+    if source.startswith("rtsp://"):
+        return av_frames(source, {"rtsp_transport": "tcp"})
+    if source.lower().endswith(MJPEG_SUFFIXES):
+        f = open(source, "rb")
+        frames = _closing(mjpeg_frames(f, fps), f)
+    else:
+        frames = av_frames(source)
+    return paced(frames) if realtime else frames
+
+
+# -------------------------------------------------
+# Change detection
+# -------------------------------------------------
+def thumbnail(img):
+    """Grey THUMBNAIL-sized float32 array in 0..1 for change detection."""
+    small = img.convert("L").resize(THUMBNAIL, Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32) * np.float32(1.0 / 255.0)
+
+
+def difference(a, b):
+    """Mean absolute difference of two thumbnails (0 = identical, 1 = inverted)."""
+    return float(np.abs(a - b).mean())
+
+
+# -------------------------------------------------
+# Pipeline
+# -------------------------------------------------
+class SegmentCounts:
+    """What happened to the frames of each segment; written by the decode thread."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, segment, outcome):
+        with self._lock:
+            self._counts.setdefault(segment, Counter())[outcome] += 1
+        if outcome != "frames":
+            metrics.VIDEO_FRAMES.inc(outcome)
+
+    def pop_before(self, segment):
+        """(index, counts) of every segment before segment, oldest first."""
+        with self._lock:
+            done = sorted(s for s in self._counts if s < segment)
+            return [(s, self._counts.pop(s)) for s in done]
+
+
+class FramePipeline:
+    """
+    Runs frames (an iterable of (t, JPEG bytes or PIL image)) through sampling and
+    change detection on a background thread; batches() hands the kept frames to
+    the event loop. JPEGs are decoded (drafted down) to at least min_size (W, H).
+    """
+
+    def __init__(self, frames, min_size, sample_fps, threshold, max_gap_s, segment_s,
+                 live=False, queue_size=32):
+        self.frames = frames
+        self.min_size = min_size
+        self.interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        self.threshold = threshold
+        self.max_gap_s = max_gap_s
+        self.segment_s = segment_s
+        self.live = live
+        self.queue_size = max(1, queue_size)
+        self.counts = SegmentCounts()
+        self.last_t = 0.0
+        self._stop = threading.Event()
+        self._slots = threading.Semaphore(self.queue_size)
+        self._queue = None
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._thread = threading.Thread(target=self._run, name="video-decode", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # the thread notices before its next frame; a blocked network read ends with the stream
+        self._stop.set()
+
+    def _run(self):
+        end = None
+        try:
+            self._decode()
+        except Exception as e:
+            end = e
+        finally:
+            close = getattr(self.frames, "close", None)
+            if close is not None:
+                close()
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, end)
+
+    def _decode(self):
+        next_t = 0.0
+        last, last_t = None, None
+        for t, frame in self.frames:
+            if self._stop.is_set():
+                return
+            segment = int(t // self.segment_s)
+            self.counts.add(segment, "frames")
+            self.last_t = t
+            if t < next_t:
+                self.counts.add(segment, "sampled_out")
+                continue
+            next_t = max(next_t + self.interval, t)
+            with metrics.stage("video", "decode"):
+                try:
+                    if isinstance(frame, (bytes, bytearray)):
+                        img = decode_image(frame, self.min_size)
+                    else:
+                        img = frame.convert("RGB")
+                except OSError:
+                    # a torn frame from a camera shouldn't end the stream
+                    self.counts.add(segment, "corrupt")
+                    continue
+                thumb = thumbnail(img)
+            if (last is not None and t - last_t < self.max_gap_s
+                    and difference(thumb, last) < self.threshold):
+                self.counts.add(segment, "unchanged")
+                continue
+            last, last_t = thumb, t
+            self._hand_over(Frame(t, segment, img))
+
+    def _hand_over(self, frame):
+        if self.live:
+            self._loop.call_soon_threadsafe(self._put_latest, frame)
+            return
+        # files: wait for room, so decoding runs at most queue_size frames ahead
+        while not self._slots.acquire(timeout=0.25):
+            if self._stop.is_set():
+                return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, frame)
+
+    def _put_latest(self, frame):
+        # live sources: a full queue sheds its oldest frame, never the newest (the end
+        # marker is always queued last, so the oldest item is a frame)
+        if self._queue.qsize() >= self.queue_size:
+            self.counts.add(self._queue.get_nowait().segment, "dropped")
+        self._queue.put_nowait(frame)
+
+    async def batches(self, max_batch):
+        """Lists of up to max_batch Frames, as soon as any are waiting; raises decode errors at the end."""
+        end = done = None
+        while not done:
+            batch = []
+            item = await self._queue.get()
+            while True:
+                if not isinstance(item, Frame):
+                    # the thread's last item: None, or the exception that stopped it
+                    done, end = True, item
+                    break
+                batch.append(item)
+                if not self.live:
+                    self._slots.release()
+                if len(batch) >= max_batch or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+            if batch:
+                yield batch
+        if end is not None:
+            raise end
+
+
+class _Segment:
+    def __init__(self, index):
+        self.index = index
+        self.analysed = 0
+        self.errors = Counter()
+        self.sums = {}
+        self.votes = {}
+        self.versions = {}
+
+    def add(self, task, pred):
+        label, _, probs, version = pred
+        probs = np.asarray(probs, dtype=np.float64)
+        self.sums[task] = self.sums[task] + probs if task in self.sums else probs
+        self.votes.setdefault(task, Counter())[label] += 1
+        self.versions[task] = version
+
+    def predictions(self):
+        out = {}
+        for task, total in self.sums.items():
+            mean = total / sum(self.votes[task].values())
+            idx = int(np.argmax(mean))
+            names = CLASS_NAMES[task]
+            out[task] = {
+                "predicted_class": names[idx] if idx < len(names) else str(idx),
+                "confidence": float(mean[idx]),
+                "votes": dict(self.votes[task].most_common()),
+                "model_version": self.versions[task],
+            }
+        return out
+
+
+async def segments(pipeline, predict, tasks, max_batch):
+    """
+    One dict per segment of video time, in order: frame counts plus, per task, the
+    class with the highest mean probability over the segment's analysed frames. A
+    segment with nothing analysed (the scene didn't change) carries the previous
+    predictions over. predict(task, images) returns (label, conf, probs, version) per image.
+    """
+    open_segments = {}
+    carried = {}
+
+    def close(before):
+        nonlocal carried
+        rows = []
+        for index, counts in pipeline.counts.pop_before(before):
+            seg = open_segments.pop(index, None) or _Segment(index)
+            preds = seg.predictions()
+            row = {
+                "segment": index,
+                "start_s": index * pipeline.segment_s,
+                "end_s": (index + 1) * pipeline.segment_s,
+                "frames": counts["frames"],
+                "analysed": seg.analysed,
+                "sampled_out": counts["sampled_out"],
+                "unchanged": counts["unchanged"],
+                "dropped": counts["dropped"],
+                "corrupt": counts["corrupt"],
+            }
+            if seg.errors:
+                row["errors"] = dict(seg.errors)
+            if preds:
+                carried = preds
+            row.update(preds or carried)
+            row["carried_over"] = not preds and bool(carried)
+            rows.append(row)
+        return rows
+
+    async for batch in pipeline.batches(max_batch):
+        images = [frame.image for frame in batch]
+        results = await asyncio.gather(*[predict(task, images) for task in tasks], return_exceptions=True)
+        for frame in batch:
+            open_segments.setdefault(frame.segment, _Segment(frame.segment)).analysed += 1
+        for task, preds in zip(tasks, results):
+            for i, frame in enumerate(batch):
+                seg = open_segments[frame.segment]
+                if isinstance(preds, Exception):
+                    seg.errors[f"{task}: {preds}"] += 1
+                else:
+                    seg.add(task, preds[i])
+        metrics.VIDEO_FRAMES.inc("analysed", amount=len(batch))
+        # frames arrive in order: every segment before this batch's last one is complete
+        for row in close(batch[-1].segment):
+            yield row
+    for row in close(float("inf")):
+        yield row
@@ -0,0 +1,215 @@
+# backend/app/weights.py
+"""
+Memory-mappable weight files so forked/spawned workers share one physical copy.
+
+Breed: safetensors layout (8-byte header length, JSON header, raw tensor bytes),
+mapped read-only with np.memmap; tensors are zero-copy views, so N workers on one
+node share the page cache instead of holding N private copies.
+Disease: architecture JSON + one flat float32 blob. TF copies variables into its
+own buffers, so this only removes the HDF5 parse from cold start; use the TFLite
+INT8 artifact (which the interpreter maps read-only) to share disease weights too.
+
+    cd backend
+    python -m app.weights convert            # write .safetensors / .keras.json + .keras.bin
+    python -m app.weights rss --workers 4    # per-worker RSS/PSS: torch.load vs mmap
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import warnings
+
+import numpy as np
+
+_NP_DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+_DTYPE_NAMES = {np.dtype(v): k for k, v in _NP_DTYPES.items()}
+
+
+# -------------------------------------------------
+# safetensors (PyTorch state dict)
+# -------------------------------------------------
+def save_safetensors(state_dict, path):
+    header, offset, arrays = {}, 0, []
+    for name, tensor in state_dict.items():
+        arr = np.ascontiguousarray(tensor.detach().cpu().numpy())
+        if arr.dtype not in _DTYPE_NAMES:
+            raise ValueError(f"{name}: dtype {arr.dtype} cannot be memory-mapped")
+        header[name] = {
+            "dtype": _DTYPE_NAMES[arr.dtype],
+            "shape": list(arr.shape),
+            "data_offsets": [offset, offset + arr.nbytes],
+        }
+        offset += arr.nbytes
+        arrays.append(arr)
+    raw = json.dumps(header, separators=(",", ":")).encode()
+    raw += b" " * (-len(raw) % 8)  # keep tensor data 8-byte aligned
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        for arr in arrays:
+            f.write(arr.tobytes())
+    os.replace(tmp, path)
+
+
+def load_safetensors(path):
+    """Return {name: torch.Tensor} backed by a shared read-only mapping of path."""
+    import torch
+
+    with open(path, "rb") as f:
+        (n,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(n))
+    header.pop("__metadata__", None)
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    base = 8 + n
+    state_dict = {}
+    with warnings.catch_warnings():
+        # tensors over a read-only map are fine for inference; torch warns about writability
+        warnings.simplefilter("ignore", UserWarning)
+        for name, meta in header.items():
+            start, end = meta["data_offsets"]
+            arr = buf[base + start:base + end].view(_NP_DTYPES[meta["dtype"]]).reshape(meta["shape"])
+            state_dict[name] = torch.from_numpy(arr)
+    return state_dict
+
+
+# -------------------------------------------------
+# Keras: architecture JSON + flat weights blob
+# -------------------------------------------------
+def keras_paths(checkpoint_path):
+    prefix = os.path.splitext(checkpoint_path)[0]
+    return prefix + ".keras.json", prefix + ".keras.bin"
+
+
+def save_keras_flat(model, checkpoint_path):
+    json_path, bin_path = keras_paths(checkpoint_path)
+    weights = [np.ascontiguousarray(w, dtype="float32") for w in model.get_weights()]
+    index, offset = [], 0
+    with open(bin_path, "wb") as f:
+        for w in weights:
+            index.append({"shape": list(w.shape), "offset": offset})
+            f.write(w.tobytes())
+            offset += w.nbytes
+    with open(json_path, "w") as f:
+        json.dump({"architecture": json.loads(model.to_json()), "weights": index}, f)
+    return json_path, bin_path
+
+
+def load_keras_flat(checkpoint_path):
+    import tensorflow as tf
+
+    json_path, bin_path = keras_paths(checkpoint_path)
+    with open(json_path) as f:
+        spec = json.load(f)
+    model = tf.keras.models.model_from_json(json.dumps(spec["architecture"]))
+    blob = np.memmap(bin_path, dtype=np.float32, mode="r")
+    weights = []
+    for entry in spec["weights"]:
+        start = entry["offset"] // 4
+        size = int(np.prod(entry["shape"])) if entry["shape"] else 1
+        weights.append(blob[start:start + size].reshape(entry["shape"]))
+    model.set_weights(weights)
+    return model
+
+
+# -------------------------------------------------
+# Commands
+# -------------------------------------------------
+def convert(breed_checkpoint, disease_checkpoint):
+    import torch
+    from tensorflow.keras.models import load_model as load_tf_model
+
+    ckpt = torch.load(breed_checkpoint, map_location="cpu")
+    state_dict = ckpt["model_state_dict"] if isinstance(ckpt, dict) and "model_state_dict" in ckpt else ckpt
+    out = os.path.splitext(breed_checkpoint)[0] + ".safetensors"
+    save_safetensors(state_dict, out)
+    print(out)
+    for path in save_keras_flat(load_tf_model(disease_checkpoint), disease_checkpoint):
+        print(path)
+
+
+def _memory_stats():
+    # Pss splits shared pages between the processes mapping them, so it shows the real saving
+    stats = {}
+    for name in ("/proc/self/smaps_rollup", "/proc/self/status"):
+        try:
+            with open(name) as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in ("Rss", "Pss", "VmRSS", "RssAnon", "RssFile") and key not in stats:
+                        stats[key] = int(value.split()[0]) // 1024  # MiB
+        except OSError:
+            pass
+    return stats
+
+
+def _rss_worker(checkpoint, mmap, barrier, results):
+    import torch
+    from app import cattle_model
+
+    start = time.perf_counter()
+    model, device, _ = cattle_model.load_model(checkpoint, mmap=mmap)
+    load_s = time.perf_counter() - start
+    with torch.no_grad():
+        model(torch.zeros(1, 3, 300, 300))
+    barrier.wait()  # every worker holds its model while memory is sampled
+    results.put({"mmap": mmap, "load_s": round(load_s, 3), **_memory_stats()})
+    barrier.wait()
+
+
+def measure_rss(breed_checkpoint, workers):
+    import multiprocessing as mp
+
+    ctx = mp.get_context("spawn")
+    mapped = os.path.splitext(breed_checkpoint)[0] + ".safetensors"
+    report = {}
+    for label, checkpoint, mmap in (("torch.load", breed_checkpoint, False), ("mmap", mapped, True)):
+        barrier, results = ctx.Barrier(workers), ctx.Queue()
+        procs = [ctx.Process(target=_rss_worker, args=(checkpoint, mmap, barrier, results)) for _ in range(workers)]
+        for p in procs:
+            p.start()
+        rows = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        report[label] = {
+            "workers": rows,
+            "total_pss_mib": sum(r.get("Pss", 0) for r in rows),
+            "mean_load_s": round(sum(r["load_s"] for r in rows) / len(rows), 3),
+        }
+    return report
+
+
+def main(argv=None):
+    from app.core.model_loader import BREED_MODEL_PATH, DISEASE_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Memory-mappable weight files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="write mmap-able copies next to the checkpoints")
+    conv.add_argument("--breed-checkpoint", default=BREED_MODEL_PATH)
+    conv.add_argument("--disease-checkpoint", default=DISEASE_MODEL_PATH)
+    rss = sub.add_parser("rss", help="compare per-worker memory of torch.load vs mmap loading")
+    rss.add_argument("--breed-checkpoint", default=BREED_MODEL_PATH)
+    rss.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        convert(args.breed_checkpoint, args.disease_checkpoint)
+    else:
+        print(json.dumps(measure_rss(args.breed_checkpoint, args.workers), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,12 @@
 import json
 import os
+import sys
+
+# the crossbreed table is indexed by class id in the backend package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
 from cattle_model import load_model, predict_bytes
+from app.crossbreed_engine import get_engine
 
 # Load the model
 checkpoint_path = "best_enhanced_model.pth"
@@ -9,28 +15,22 @@ model, device, transform = load_model(checkpoint_path)
 # Predict for parentA.jpg
 with open("parentA.jpg", "rb") as f:
     a_bytes = f.read()
-a_label, a_conf, _ = predict_bytes(model, device, transform, a_bytes)
+a_label, a_conf, a_probs = predict_bytes(model, device, transform, a_bytes)
 
 # Predict for parentB.jpg
 with open("parentB.jpg", "rb") as f:
     b_bytes = f.read()
-b_label, b_conf, _ = predict_bytes(model, device, transform, b_bytes)
+b_label, b_conf, b_probs = predict_bytes(model, device, transform, b_bytes)
 
 print(f"Parent A predicted breed: {a_label} (confidence: {a_conf:.2f})")
 print(f"Parent B predicted breed: {b_label} (confidence: {b_conf:.2f})")
 
-# Load cross info
-with open("breed_cross_info.json", "r") as f:
-    cross_info = json.load(f)
-
-# Get the cross info
-key1 = f"{a_label} x {b_label}"
-key2 = f"{b_label} x {a_label}"
-if key1 in cross_info:
-    info = cross_info[key1]
-elif key2 in cross_info:
-    info = cross_info[key2]
-else:
+# Load cross info (parsed once into class-id indexed arrays)
+engine = get_engine(os.path.join(os.path.dirname(os.path.abspath(__file__)), "breed_cross_info.json"))
+
+# Get the cross info for the top-1 labels
+info = engine.pair_info(a_label, b_label)
+if info is None:
     info = {
         "parents": [a_label, b_label],
         "estimated_milk_yield_l_per_year": None,
@@ -43,3 +43,7 @@ else:
 
 print("\nCrossbreeding static info:")
 print(json.dumps(info, indent=2))
+
+# Expected traits weighted over both parents' full probability vectors
+print("\nProbability-weighted hybrid traits:")
+print(json.dumps(engine.expected_traits(a_probs, b_probs), indent=2))